@@ -0,0 +1,86 @@
+"""
+Aho-Corasick automaton for finding many patterns in one pass over a text.
+Used to look up every phrase of a request in a source page with a single
+scan instead of one substring search per phrase.
+"""
+from collections import deque
+
+
+class AhoCorasick:
+    """Character-level Aho-Corasick automaton over a fixed list of patterns"""
+
+    def __init__(self, patterns):
+        """
+        Build the automaton
+
+        Args:
+            patterns: Iterable of non-empty strings; pattern ids are their
+                positions in this sequence
+        """
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                raise ValueError("Aho-Corasick patterns must be non-empty")
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] += (pattern_id,)
+
+        # Breadth-first pass: failure links and outputs inherited from them
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def iter_matches(self, text):
+        """
+        Yield every occurrence of every pattern in text
+
+        Yields:
+            (pattern_id, end) where text[end - len(pattern):end] == pattern
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in output[state]:
+                yield pattern_id, i + 1
+
+    def find_present(self, text):
+        """Return the set of ids of the patterns that occur in text at least once"""
+        goto, fail, output = self._goto, self._fail, self._output
+        hit_states = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                hit_states.add(state)
+
+        present = set()
+        for state in hit_states:
+            present.update(output[state])
+        return present
@@ -0,0 +1,124 @@
+"""
+Analyzed form of one submitted text, built once per check.
+The text is tokenized and segmented a single time; AI detection, search
+query generation and source matching all read the same views, and the
+expensive ones (embeddings, matcher tables) are computed on first use.
+"""
+import bisect
+import re
+import time
+from contextlib import contextmanager
+
+
+class AnalyzedDocument:
+    """Tokens, sentences, phrases and embeddings of a submitted text, with per-stage timings"""
+
+    def __init__(self, text, segment, encode=None, sentences=None, embeddings=None):
+        """
+        Analyze a text
+
+        Args:
+            text: Submitted text
+            segment: Callable splitting whitespace-collapsed text into sentences
+            encode: Callable mapping a list of sentences to an (n x dim) array
+            sentences: Sentences already segmented (e.g. by a batched spaCy pass)
+            embeddings: Embeddings of sentences already computed
+        """
+        self.text = text
+        self.timings = {}
+        self._encode = encode
+        self._embeddings = embeddings
+        self._cache = {}
+
+        with self.timed('tokenize'):
+            # (word, start, end) in text; the same tokens TextMatcher uses
+            self.tokens = [(m.group(), m.start(), m.end()) for m in re.finditer(r'\S+', text)]
+            self.words = [word for word, _, _ in self.tokens]
+            self.normalized = ' '.join(self.words)
+
+        if sentences is None:
+            with self.timed('segment'):
+                sentences = segment(self.normalized)
+        self.sentences = sentences
+
+    @contextmanager
+    def timed(self, stage):
+        """Add the time spent in the block to timings[stage]"""
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.time() - started
+
+    def _lazy(self, name, compute):
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
+
+    @property
+    def lower(self):
+        """Lowercased text"""
+        return self._lazy('lower', self.text.lower)
+
+    @property
+    def lower_words(self):
+        """Lowercased whitespace-separated words"""
+        return self._lazy('lower_words', lambda: [word.lower() for word in self.words])
+
+    @property
+    def query_fragments(self):
+        """
+        Text cut at terminal punctuation, independent of the segmenter
+
+        Search queries are built from these, so query strings (and their query
+        cache keys) do not change with the configured segmenter.
+        """
+        return self._lazy('query_fragments', lambda: re.split(r'[.!?]+', self.text))
+
+    @property
+    def sentence_spans(self):
+        """[start, end) offsets of each sentence in text, or (-1, -1) if it cannot be located"""
+        return self._lazy('sentence_spans', self._locate_sentences)
+
+    def _locate_sentences(self):
+        # Offsets in normalized map back to text through the tokens
+        normalized_starts = []
+        position = 0
+        for word in self.words:
+            normalized_starts.append(position)
+            position += len(word) + 1
+
+        def to_text(offset):
+            i = max(bisect.bisect_right(normalized_starts, offset) - 1, 0)
+            word, start, end = self.tokens[i]
+            return min(start + offset - normalized_starts[i], end)
+
+        spans = []
+        cursor = 0
+        for sentence in self.sentences:
+            found = self.normalized.find(sentence, cursor)
+            if found < 0 or not self.tokens:
+                spans.append((-1, -1))
+                continue
+            cursor = found + len(sentence)
+            spans.append((to_text(found), to_text(cursor)))
+        return spans
+
+    @property
+    def embeddings(self):
+        """Sentence embeddings, encoded on first use"""
+        if self._embeddings is None and self.sentences and self._encode is not None:
+            with self.timed('embed'):
+                self._embeddings = self._encode(self.sentences)
+        return self._embeddings
+
+    def matcher_tables(self, text_matcher):
+        """TextMatcher.prepare output for this text, reusing the document's tokens"""
+        def prepare():
+            with self.timed('match_prepare'):
+                return text_matcher.prepare(self.text, tokens=[(start, end) for _, start, end in self.tokens])
+        return self._lazy('matcher_tables', prepare)
+
+    def timing_summary(self):
+        """Timings as a short log line, e.g. 'tokenize 1ms, segment 35ms'"""
+        return ', '.join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in self.timings.items())
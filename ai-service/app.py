@@ -1,15 +1,30 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
+import json
 from dotenv import load_dotenv
+from job_queue import JobQueue, QueueFullError
+from result_cache import ResultCache
 
 load_dotenv()
 
 USE_SIMPLE_DETECTOR = os.getenv('USE_SIMPLE_DETECTOR', 'false').lower() == 'true'
+# 'full' (Enhanced detector), 'tiered' (local prefilter, then web search) or 'simple'
+DETECTOR_MODE = 'simple' if USE_SIMPLE_DETECTOR else os.getenv('DETECTOR_MODE', 'full').lower()
+ENCODER_BACKEND = os.getenv('ENCODER_BACKEND', 'torch').lower()
+BATCH_MAX_DOCUMENTS = int(os.getenv('BATCH_MAX_DOCUMENTS', '50'))
 
 app = Flask(__name__)
 CORS(app)
 
+# Background worker pool for /check/async (sized by JOB_WORKERS / JOB_QUEUE_SIZE)
+job_queue = JobQueue()
+
+# Cache of results for resubmitted texts (RESULT_CACHE_BACKEND=none disables it)
+result_cache = None
+if os.getenv('RESULT_CACHE_BACKEND', 'memory').lower() != 'none':
+    result_cache = ResultCache(namespace=DETECTOR_MODE)
+
 # Initialize the plagiarism detector
 # Note: Initialization happens at import time, but we'll handle errors gracefully
 detector = None
@@ -21,21 +36,26 @@ def initialize_detector():
         return detector
     
     try:
-        if USE_SIMPLE_DETECTOR:
+        if DETECTOR_MODE == 'simple':
             print("Initializing Simple Plagiarism Detector (low-memory mode)...")
             from simple_plagiarism_detector import SimplePlagiarismDetector
             detector = SimplePlagiarismDetector()
             print("✅ Simple detector initialized")
+        elif DETECTOR_MODE == 'tiered':
+            print("Initializing Tiered Plagiarism Detector...")
+            from tiered_detector import TieredPlagiarismDetector
+            detector = TieredPlagiarismDetector(encoder_backend=ENCODER_BACKEND)
+            print("✅ Tiered Plagiarism Detector initialized successfully")
         else:
             print("Initializing Enhanced Plagiarism Detector...")
             try:
                 from enhanced_plagiarism_detector import EnhancedPlagiarismDetector
-                detector = EnhancedPlagiarismDetector()
+                detector = EnhancedPlagiarismDetector(encoder_backend=ENCODER_BACKEND)
                 print("✅ Enhanced Plagiarism Detector initialized successfully")
             except ImportError:
                 # Fallback to basic detector
                 from plagiarism_detector import PlagiarismDetector
-                detector = PlagiarismDetector()
+                detector = PlagiarismDetector(encoder_backend=ENCODER_BACKEND)
                 print("Plagiarism Detector initialized successfully (basic mode)")
     except Exception as e:
         print(f"⚠️ Failed to initialize Plagiarism Detector: {str(e)}")
@@ -64,12 +84,111 @@ def health():
             'model_loaded': False
         }), 500
     
+    web_searcher = getattr(current_detector, 'web_searcher', None)
     return jsonify({
         'status': 'ok',
         'message': 'AI Plagiarism Detection Service is running',
-        'model_loaded': current_detector.is_model_loaded() if hasattr(current_detector, 'is_model_loaded') else True
+        'model_loaded': current_detector.is_model_loaded() if hasattr(current_detector, 'is_model_loaded') else True,
+        'jobs': job_queue.stats(),
+        'result_cache': result_cache.stats() if result_cache else None,
+        'page_cache': (web_searcher.page_cache.stats()
+                       if web_searcher and web_searcher.page_cache else None),
+        'embedding_cache': (current_detector.embedding_cache.stats()
+                            if getattr(current_detector, 'embedding_cache', None) else None),
+        'encoder': (current_detector.encoder_service.stats()
+                    if getattr(current_detector, 'encoder_service', None) else None),
+        'reference_corpus': (current_detector.reference_corpus.stats()
+                             if getattr(current_detector, 'reference_corpus', None) else None),
+        'wikipedia_index': (current_detector.wikipedia_index.stats()
+                            if getattr(current_detector, 'wikipedia_index', None) else None)
     })
 
+def _validate_text(data):
+    """Validate a request body and return (text, error_response)"""
+    if not data or 'text' not in data:
+        return None, (jsonify({'error': 'Text is required'}), 400)
+    
+    text = data['text']
+    
+    if not isinstance(text, str) or len(text.strip()) == 0:
+        return None, (jsonify({'error': 'Text must be a non-empty string'}), 400)
+    
+    if len(text) > 10000:
+        return None, (jsonify({'error': 'Text is too long. Maximum 10,000 characters allowed.'}), 400)
+    
+    return text, None
+
+def _wants_refresh(data):
+    """True when the client asked to bypass the result cache"""
+    return bool((data or {}).get('refresh')) or request.args.get('refresh', '').lower() == 'true'
+
+def _cached_result(text, refresh):
+    """Return a cached result for text, or None on a miss or forced refresh"""
+    if result_cache is None or refresh:
+        return None
+    cached = result_cache.get(text)
+    if cached is not None:
+        print(f"Result cache hit for text of {len(text)} characters")
+        cached['cached'] = True
+    return cached
+
+def _store_result(text, result):
+    """Store a fresh result in the cache and mark it as uncached"""
+    if result_cache is not None:
+        result_cache.set(text, result)
+    return dict(result, cached=False)
+
+def _run_check(current_detector, text, refresh=False):
+    """Run a plagiarism check and log timing information"""
+    cached = _cached_result(text, refresh)
+    if cached is not None:
+        return cached
+    
+    import time
+    start_time = time.time()
+    print(f"\n{'='*60}")
+    print(f"PLAGIARISM CHECK REQUEST RECEIVED")
+    print(f"Text length: {len(text)} characters")
+    print(f"{'='*60}\n")
+    
+    result = current_detector.detect_plagiarism(text)
+    
+    elapsed_time = time.time() - start_time
+    print(f"\n{'='*60}")
+    print(f"PLAGIARISM CHECK COMPLETED")
+    print(f"Total time: {elapsed_time:.2f} seconds")
+    print(f"Plagiarism percentage: {result.get('plagiarism_percentage', 0):.1f}%")
+    print(f"Matches found: {len(result.get('matches', []))}")
+    print(f"{'='*60}\n")
+    
+    return _store_result(text, result)
+
+def _run_batch_check(current_detector, texts, refresh=False):
+    """Run a batch of plagiarism checks and log timing information"""
+    import time
+    start_time = time.time()
+    print(f"\n{'='*60}")
+    print(f"BATCH PLAGIARISM CHECK REQUEST RECEIVED")
+    print(f"Documents: {len(texts)}")
+    print(f"{'='*60}\n")
+    
+    results = [_cached_result(text, refresh) for text in texts]
+    missing = [i for i, result in enumerate(results) if result is None]
+    print(f"Result cache hits: {len(texts) - len(missing)}, checking {len(missing)} documents")
+    
+    if missing:
+        fresh = current_detector.detect_plagiarism_batch([texts[i] for i in missing])
+        for i, result in zip(missing, fresh):
+            results[i] = _store_result(texts[i], result)
+    
+    elapsed_time = time.time() - start_time
+    print(f"\n{'='*60}")
+    print(f"BATCH PLAGIARISM CHECK COMPLETED")
+    print(f"Total time: {elapsed_time:.2f} seconds")
+    print(f"{'='*60}\n")
+    
+    return {'results': results, 'count': len(results)}
+
 @app.route('/check', methods=['POST'])
 def check_plagiarism():
     """Check text for plagiarism"""
@@ -81,40 +200,105 @@ def check_plagiarism():
             }), 503
         
         data = request.get_json()
+        text, error = _validate_text(data)
+        if error:
+            return error
         
-        if not data or 'text' not in data:
-            return jsonify({'error': 'Text is required'}), 400
+        result = _run_check(current_detector, text, _wants_refresh(data))
         
-        text = data['text']
+        return jsonify(result), 200
         
-        if not isinstance(text, str) or len(text.strip()) == 0:
-            return jsonify({'error': 'Text must be a non-empty string'}), 400
+    except Exception as e:
+        print(f"Error in check_plagiarism: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'error': 'An error occurred while checking plagiarism',
+            'details': str(e)
+        }), 500
+
+@app.route('/check/async', methods=['POST'])
+def check_plagiarism_async():
+    """Queue a plagiarism check and return a job id immediately"""
+    try:
+        current_detector = initialize_detector()
+        if current_detector is None:
+            return jsonify({
+                'error': 'Plagiarism Detector not initialized. Please check the server logs.'
+            }), 503
         
-        if len(text) > 10000:
-            return jsonify({'error': 'Text is too long. Maximum 10,000 characters allowed.'}), 400
+        data = request.get_json()
+        text, error = _validate_text(data)
+        if error:
+            return error
         
-        # Detect plagiarism
-        import time
-        start_time = time.time()
-        print(f"\n{'='*60}")
-        print(f"PLAGIARISM CHECK REQUEST RECEIVED")
-        print(f"Text length: {len(text)} characters")
-        print(f"{'='*60}\n")
+        try:
+            job_id = job_queue.submit(_run_check, current_detector, text, _wants_refresh(data))
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 429
         
-        result = current_detector.detect_plagiarism(text)
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/jobs/{job_id}'
+        }), 202
         
-        elapsed_time = time.time() - start_time
-        print(f"\n{'='*60}")
-        print(f"PLAGIARISM CHECK COMPLETED")
-        print(f"Total time: {elapsed_time:.2f} seconds")
-        print(f"Plagiarism percentage: {result.get('plagiarism_percentage', 0):.1f}%")
-        print(f"Matches found: {len(result.get('matches', []))}")
-        print(f"{'='*60}\n")
+    except Exception as e:
+        print(f"Error in check_plagiarism_async: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'error': 'An error occurred while queueing the plagiarism check',
+            'details': str(e)
+        }), 500
+
+@app.route('/check/batch', methods=['POST'])
+def check_plagiarism_batch():
+    """Check a list of texts, sharing segmentation, embedding and search work"""
+    try:
+        current_detector = initialize_detector()
+        if current_detector is None:
+            return jsonify({
+                'error': 'Plagiarism Detector not initialized. Please check the server logs.'
+            }), 503
         
-        return jsonify(result), 200
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('texts'), list) or len(data['texts']) == 0:
+            return jsonify({'error': 'texts must be a non-empty list'}), 400
+        
+        if len(data['texts']) > BATCH_MAX_DOCUMENTS:
+            return jsonify({
+                'error': f'Too many documents. Maximum {BATCH_MAX_DOCUMENTS} texts per batch.'
+            }), 400
+        
+        texts = []
+        for i, item in enumerate(data['texts']):
+            text, error = _validate_text({'text': item})
+            if error:
+                response, status = error
+                return jsonify({
+                    'error': f"Invalid text at index {i}: {response.get_json()['error']}"
+                }), status
+            texts.append(text)
+        
+        # Large batches can be queued instead of holding the request open
+        if data.get('async'):
+            try:
+                job_id = job_queue.submit(_run_batch_check, current_detector, texts,
+                                           _wants_refresh(data))
+            except QueueFullError as e:
+                return jsonify({'error': str(e)}), 429
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': f'/jobs/{job_id}'
+            }), 202
+        
+        return jsonify(_run_batch_check(current_detector, texts, _wants_refresh(data))), 200
         
     except Exception as e:
-        print(f"Error in check_plagiarism: {str(e)}")
+        print(f"Error in check_plagiarism_batch: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({
@@ -122,6 +306,90 @@ def check_plagiarism():
             'details': str(e)
         }), 500
 
+def _iter_check_events(current_detector, text, refresh=False):
+    """Yield streaming events, falling back to a single summary event"""
+    cached = _cached_result(text, refresh)
+    if cached is not None:
+        yield {'event': 'summary', 'result': cached}
+        return
+    
+    if hasattr(current_detector, 'iter_detect_plagiarism'):
+        events = current_detector.iter_detect_plagiarism(text)
+    else:
+        events = [{'event': 'summary', 'result': current_detector.detect_plagiarism(text)}]
+    
+    for event in events:
+        if event['event'] == 'summary':
+            event = dict(event, result=_store_result(text, event['result']))
+        yield event
+
+@app.route('/check/stream', methods=['POST'])
+def check_plagiarism_stream():
+    """
+    Check text for plagiarism, streaming progress and matches as they are found
+    
+    Responds with newline-delimited JSON by default, or Server-Sent Events when
+    the client accepts text/event-stream or passes ?format=sse.
+    """
+    current_detector = initialize_detector()
+    if current_detector is None:
+        return jsonify({
+            'error': 'Plagiarism Detector not initialized. Please check the server logs.'
+        }), 503
+    
+    data = request.get_json()
+    text, error = _validate_text(data)
+    if error:
+        return error
+    refresh = _wants_refresh(data)
+    
+    use_sse = (request.args.get('format') == 'sse' or
+               'text/event-stream' in request.headers.get('Accept', ''))
+    
+    def generate():
+        try:
+            for event in _iter_check_events(current_detector, text, refresh):
+                payload = json.dumps(event)
+                if use_sse:
+                    yield f"event: {event['event']}\ndata: {payload}\n\n"
+                else:
+                    yield payload + '\n'
+        except Exception as e:
+            print(f"Error in check_plagiarism_stream: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            payload = json.dumps({
+                'event': 'error',
+                'error': 'An error occurred while checking plagiarism',
+                'details': str(e)
+            })
+            yield f"event: error\ndata: {payload}\n\n" if use_sse else payload + '\n'
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return the status, and the result once finished, of a queued check"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    
+    response = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'submitted_at': job['submitted_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+    }
+    if job['status'] == 'finished':
+        response['result'] = job['result']
+    elif job['status'] == 'failed':
+        response['error'] = job['error']
+    
+    return jsonify(response), 200
+
 if __name__ == '__main__':
     # Render automatically sets PORT environment variable
     port = int(os.environ.get('PORT', 8000))
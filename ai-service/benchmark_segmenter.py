@@ -0,0 +1,145 @@
+"""
+Compare the sentence segmenter backends on throughput and boundary accuracy.
+
+Usage:
+    python benchmark_segmenter.py [--backends parser,sentencizer,regex] [--docs 200]
+                                  [--gold gold.jsonl] [--input dir_of_txt_files]
+
+Accuracy is sentence-boundary precision/recall/F1 against gold segmentations:
+a built-in sample, or a JSONL file with {"sentences": [...]} per line. The
+built-in GOLD sample was written alongside the regex rules; HELD_OUT was
+not, and is reported separately so the rules cannot simply confirm themselves.
+Throughput is measured with split_many (nlp.pipe for spaCy) over --input
+documents, or over the gold documents repeated --docs times.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from segmenter import BACKENDS, RegexSegmenter, SpacySegmenter
+
+GOLD = [
+    ["Dr. Smith arrived in Washington on Jan. 5.", "He met the committee the next day.",
+     "The hearing lasted three hours."],
+    ["Photosynthesis converts light energy into chemical energy.",
+     "Most plants, algae, and cyanobacteria perform photosynthesis, e.g. in their leaves.",
+     "The process releases oxygen as a by-product."],
+    ["\"Is it true?\" she asked.", "Nobody answered.", "The room was silent for a long time!"],
+    ["The U.S. economy grew by 3.5 percent in 2019.", "Analysts at XYZ Corp. expected less.",
+     "Prices rose, however, in most sectors."],
+    ["J. R. R. Tolkien wrote The Hobbit.", "It was published in 1937 by Allen & Unwin.",
+     "A sequel followed years later."],
+    ["The French Revolution began in 1789.", "It ended with the coup of 18 Brumaire.",
+     "Its ideas shaped modern democracy (see Fig. 2 for a timeline).", "Historians still debate its causes."],
+    ["Hypertension affects about 1.28 billion adults worldwide.",
+     "Many of them, i.e. nearly half, are unaware of it.", "Treatment reduces the risk of stroke."],
+    ["What causes tides?", "The gravitational pull of the Moon and the Sun.",
+     "Prof. Lee explains this in Vol. 3 of her textbook."],
+]
+
+# Cases not used to write the regex rules: ordinary words and letters before a
+# period, times, place names, and abbreviations the rules do not list
+HELD_OUT = [
+    ["The answer was no.", "We left early."],
+    ["He took vitamin A.", "It helped."],
+    ["I went home at 5 p.m.", "Then I slept."],
+    ["She grew up in Washington, D.C.", "Her family later moved to Ohio."],
+    ["Call the office at ext. 4410 before noon.", "Someone will answer."],
+    ["The vote was 5 to 4.", "Justice O. W. Holmes wrote the dissent."],
+    ["Sales rose 4 p.c. in March.", "Costs fell."],
+    ["Results are shown in Table 2.", "Approx. 40 samples failed.", "They were discarded."],
+    ["The ship sailed from St. John's at dawn.", "It reached port a week later."],
+    ["He said, \"Wait here.\"", "Then he left the room."],
+]
+
+
+def _ends(text, sentences):
+    """Character offsets in text where each sentence ends"""
+    ends = set()
+    cursor = 0
+    for sentence in sentences:
+        found = text.find(sentence, cursor)
+        if found < 0:
+            continue
+        cursor = found + len(sentence)
+        ends.add(cursor)
+    return ends
+
+
+def accuracy(segmenter, gold):
+    """Boundary precision, recall and F1 of a segmenter against gold segmentations"""
+    true_positives = predicted_total = gold_total = 0
+    for sentences in gold:
+        text = ' '.join(sentences)
+        # The end of the text is not a decision, so it is not counted
+        expected = _ends(text, sentences) - {len(text)}
+        predicted = _ends(text, segmenter.split(text)) - {len(text)}
+        true_positives += len(expected & predicted)
+        predicted_total += len(predicted)
+        gold_total += len(expected)
+    precision = true_positives / predicted_total if predicted_total else 1.0
+    recall = true_positives / gold_total if gold_total else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def throughput(segmenter, documents):
+    """(documents/s, sentences/s, characters/s) of split_many over documents"""
+    started = time.perf_counter()
+    sentence_lists = segmenter.split_many(documents)
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    sentences = sum(len(sentences) for sentences in sentence_lists)
+    characters = sum(len(document) for document in documents)
+    return len(documents) / elapsed, sentences / elapsed, characters / elapsed
+
+
+def _load_gold(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)['sentences'] for line in f if line.strip()]
+
+
+def _load_documents(directory):
+    documents = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.txt'):
+            with open(os.path.join(directory, name), encoding='utf-8', errors='replace') as f:
+                documents.append(' '.join(f.read().split()))
+    return documents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the sentence segmenter backends')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='Comma-separated backends to compare')
+    parser.add_argument('--docs', type=int, default=200, help='Repetitions of the gold documents for throughput')
+    parser.add_argument('--gold', help='JSONL file of gold segmentations ({"sentences": [...]})')
+    parser.add_argument('--input', help='Directory of .txt documents for throughput')
+    args = parser.parse_args(argv)
+
+    gold = _load_gold(args.gold) if args.gold else GOLD
+    documents = (_load_documents(args.input) if args.input
+                 else [' '.join(sentences) for sentences in gold] * args.docs)
+
+    print(f"{'backend':<12} {'load s':>7} {'docs/s':>9} {'sents/s':>10} {'chars/s':>11} "
+          f"{'prec':>6} {'recall':>6} {'F1':>6} {'held-out F1':>12}")
+    for backend in args.backends.split(','):
+        started = time.perf_counter()
+        try:
+            segmenter = RegexSegmenter() if backend == 'regex' else SpacySegmenter(backend)
+        except (ImportError, OSError) as e:
+            print(f"{backend:<12} unavailable: {str(e)}")
+            continue
+        load_time = time.perf_counter() - started
+
+        segmenter.split_many(documents[:10])  # warm up
+        docs_per_s, sentences_per_s, chars_per_s = throughput(segmenter, documents)
+        precision, recall, f1 = accuracy(segmenter, gold)
+        held_out_f1 = accuracy(segmenter, HELD_OUT)[2]
+        print(f"{backend:<12} {load_time:>7.2f} {docs_per_s:>9.0f} {sentences_per_s:>10.0f} {chars_per_s:>11.0f} "
+              f"{precision:>6.3f} {recall:>6.3f} {f1:>6.3f} {held_out_f1:>12.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
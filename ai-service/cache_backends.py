@@ -0,0 +1,218 @@
+"""
+Key/value cache backends with LRU eviction and per-entry TTL.
+Values must be JSON-serializable. The memory backend is private to one
+process; the SQLite and file backends can be shared by several gunicorn
+workers on the same machine.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return json.loads(payload)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, json.dumps(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """SQLite-backed LRU cache that can be shared across processes"""
+
+    def __init__(self, path, max_entries=1000, table='cache'):
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL, last_access REAL NOT NULL)'
+            )
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.table}_last_access '
+                f'ON {self.table} (last_access)'
+            )
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+                return None
+            conn.execute(
+                f'UPDATE {self.table} SET last_access = ? WHERE key = ?', (now, key)
+            )
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._connect() as conn:
+            conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) '
+                'VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), expires_at, now)
+            )
+            conn.execute(
+                f'DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at < ?',
+                (now,)
+            )
+            # Evict least recently used entries beyond max_entries
+            conn.execute(
+                f'DELETE FROM {self.table} WHERE key IN ('
+                f'SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+
+class FileCacheBackend:
+    """One JSON file per entry in a directory; file mtime tracks recency"""
+
+    def __init__(self, directory, max_entries=1000):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        # Keys may contain characters that are not valid in file names
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        expires_at = entry.get('expires_at')
+        if expires_at is not None and expires_at < time.time():
+            self._remove(path)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry.get('value')
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        path = self._path(key)
+        # Write atomically so concurrent readers never see a partial file
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'expires_at': expires_at, 'value': value}, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def _evict(self):
+        """Remove least recently used files beyond max_entries"""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            self._remove(entry.path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        try:
+            return sum(1 for e in os.scandir(self.directory) if e.name.endswith('.json'))
+        except OSError:
+            return 0
+
+
+def create_backend(kind, path=None, max_entries=1000, name='cache'):
+    """
+    Create a cache backend by name
+
+    Args:
+        kind: 'memory', 'sqlite' or 'file'
+        path: SQLite database file or cache directory (ignored for memory)
+        max_entries: Maximum number of entries before LRU eviction
+        name: Used for the default path and SQLite table name
+
+    Returns:
+        Cache backend instance
+    """
+    kind = (kind or 'memory').lower()
+    if kind == 'memory':
+        return MemoryCacheBackend(max_entries=max_entries)
+    if kind == 'sqlite':
+        return SQLiteCacheBackend(path or os.path.join('cache', f'{name}.sqlite3'),
+                                  max_entries=max_entries, table=name)
+    if kind == 'file':
+        return FileCacheBackend(path or os.path.join('cache', name), max_entries=max_entries)
+    raise ValueError(f"Unknown cache backend: {kind}")
@@ -0,0 +1,150 @@
+"""
+Cross-request cache of sentence embeddings.
+Vectors are keyed by a hash of the model name and the whitespace-normalized
+sentence and kept in a bounded LRU. The vectors can optionally live in a
+memory-mapped .npy file so the cache survives restarts.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_KEY_BYTES = 16
+
+
+class EmbeddingCache:
+    """Bounded LRU of sentence embeddings with optional memmap persistence"""
+
+    def __init__(self, model_name, max_entries=None, dtype=None, path=None):
+        """
+        Initialize the embedding cache
+
+        Args:
+            model_name: Encoder name, part of every key
+            max_entries: Maximum number of cached sentences (EMBEDDING_CACHE_SIZE, default 50000)
+            dtype: 'float16' (default) or 'float32' storage (EMBEDDING_CACHE_DTYPE)
+            path: File prefix for persistence, e.g. cache/embeddings
+                (EMBEDDING_CACHE_PATH, in memory only when unset)
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries or int(os.getenv('EMBEDDING_CACHE_SIZE', '50000'))
+        self.dtype = np.dtype(dtype or os.getenv('EMBEDDING_CACHE_DTYPE', 'float16'))
+        if self.dtype not in (np.float16, np.float32):
+            raise ValueError(f"Unsupported embedding cache dtype: {self.dtype}")
+        self.path = path if path is not None else (os.getenv('EMBEDDING_CACHE_PATH') or None)
+
+        self._slots = OrderedDict()  # key -> row in self._vectors, least recently used first
+        self._vectors = None
+        self._keys = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.path:
+            self._load()
+
+    def key_for(self, sentence):
+        """Hash of the model name and the whitespace-normalized sentence"""
+        normalized = ' '.join(sentence.split())
+        return hashlib.sha1(f"{self.model_name}\0{normalized}".encode('utf-8')).digest()[:_KEY_BYTES]
+
+    def get_many(self, sentences):
+        """
+        Look up sentences
+
+        Returns:
+            List with a float32 vector per cached sentence and None per miss
+        """
+        keys = [self.key_for(sentence) for sentence in sentences]
+        with self._lock:
+            vectors = []
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    vectors.append(None)
+                else:
+                    self._slots.move_to_end(key)
+                    self.hits += 1
+                    vectors.append(np.array(self._vectors[slot], dtype=np.float32))
+            return vectors
+
+    def put_many(self, sentences, embeddings):
+        """Store the embeddings of sentences, evicting least recently used entries"""
+        embeddings = np.asarray(embeddings)
+        if not len(sentences) or embeddings.ndim != 2:
+            return
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != embeddings.shape[1]:
+                self._allocate(embeddings.shape[1])
+            for sentence, embedding in zip(sentences, embeddings):
+                key = self.key_for(sentence)
+                slot = self._slots.get(key)
+                if slot is None:
+                    if len(self._slots) < self.max_entries:
+                        slot = len(self._slots)
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                    self._slots[key] = slot
+                    self._keys[slot] = key
+                else:
+                    self._slots.move_to_end(key)
+                self._vectors[slot] = embedding
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+                self._keys.flush()
+
+    def _files(self):
+        return f"{self.path}.vectors.npy", f"{self.path}.keys.npy"
+
+    def _allocate(self, dim):
+        """Create empty storage for dim-dimensional vectors (dropping any entries)"""
+        self._slots.clear()
+        shape = (self.max_entries, dim)
+        if self.path:
+            vectors_file, keys_file = self._files()
+            os.makedirs(os.path.dirname(os.path.abspath(vectors_file)), exist_ok=True)
+            self._vectors = np.lib.format.open_memmap(vectors_file, mode='w+', dtype=self.dtype, shape=shape)
+            self._keys = np.lib.format.open_memmap(keys_file, mode='w+', dtype=f'S{_KEY_BYTES}',
+                                                   shape=(self.max_entries,))
+        else:
+            self._vectors = np.zeros(shape, dtype=self.dtype)
+            self._keys = np.zeros(self.max_entries, dtype=f'S{_KEY_BYTES}')
+
+    def _load(self):
+        """Reopen persisted vectors if they match the configured size and dtype"""
+        vectors_file, keys_file = self._files()
+        if not (os.path.exists(vectors_file) and os.path.exists(keys_file)):
+            return
+        try:
+            vectors = np.load(vectors_file, mmap_mode='r+')
+            keys = np.load(keys_file, mmap_mode='r+')
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not open embedding cache: {str(e)}")
+            return
+        if vectors.dtype != self.dtype or len(vectors) != self.max_entries or len(keys) != self.max_entries:
+            print("Embedding cache settings changed, starting with an empty cache")
+            return
+
+        self._vectors = vectors
+        self._keys = keys
+        # Recency is not persisted: reloaded entries start in slot order
+        for slot, key in enumerate(keys):
+            if not key:
+                break
+            self._slots[bytes(key).ljust(_KEY_BYTES, b'\0')] = slot
+        print(f"Loaded {len(self._slots)} cached sentence embeddings")
+
+    def stats(self):
+        """Return entry and hit/miss counts for this process"""
+        with self._lock:
+            return {
+                'entries': len(self._slots),
+                'max_entries': self.max_entries,
+                'dtype': str(self.dtype),
+                'persistent': bool(self.path),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,145 @@
+"""
+Sentence encoder backends.
+'torch' runs the Sentence-Transformer model as before. 'onnx' and 'int8' run
+the same model exported by export_encoder.py with ONNX Runtime, in float32 or
+dynamically quantized to int8, which is smaller and faster on CPU-only hosts.
+"""
+import json
+import os
+
+import numpy as np
+
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+BACKENDS = ('torch', 'onnx', 'int8')
+
+# Files written by export_encoder.py
+ONNX_MODEL_FILE = 'model.onnx'
+INT8_MODEL_FILE = 'model_int8.onnx'
+CONFIG_FILE = 'encoder.json'
+
+
+def default_model_dir(model_name):
+    """Directory export_encoder.py writes to by default"""
+    return os.path.join('models', f"{model_name.replace('/', '_')}-onnx")
+
+
+class TorchEncoder:
+    """Sentence-Transformer model on PyTorch (float32)"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.backend = 'torch'
+        self.model = SentenceTransformer(model_name)
+
+    @property
+    def name(self):
+        """Identifies the vectors this encoder produces (used in cache keys)"""
+        return self.model_name
+
+    def encode(self, sentences, batch_size=32):
+        return self.model.encode(list(sentences), batch_size=batch_size, convert_to_numpy=True)
+
+
+class OnnxEncoder:
+    """Exported transformer run with ONNX Runtime, followed by the model's pooling"""
+
+    def __init__(self, model_name, model_dir=None, quantized=False, num_threads=None):
+        """
+        Args:
+            model_name: Sentence-Transformer model the export was made from
+            model_dir: Output directory of export_encoder.py
+            quantized: Use the int8 model instead of the float32 one
+            num_threads: ONNX Runtime intra-op threads (ENCODER_THREADS, default: runtime's choice)
+        """
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime is not installed")
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.backend = 'int8' if quantized else 'onnx'
+        self.model_dir = model_dir or default_model_dir(model_name)
+        model_file = os.path.join(self.model_dir, INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(
+                f"{model_file} not found; run: python export_encoder.py --model {model_name}"
+            )
+
+        with open(os.path.join(self.model_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        if self.config.get('model_name') != model_name:
+            raise ValueError(f"{self.model_dir} was exported from {self.config.get('model_name')}, not {model_name}")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        options = onnxruntime.SessionOptions()
+        threads = num_threads or int(os.getenv('ENCODER_THREADS', '0'))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_file, options, providers=['CPUExecutionProvider'])
+        self._input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    @property
+    def name(self):
+        """Identifies the vectors this encoder produces (used in cache keys)"""
+        return f"{self.model_name}/{self.backend}"
+
+    def encode(self, sentences, batch_size=32):
+        sentences = list(sentences)
+        if not sentences:
+            return np.zeros((0, self.config['dimension']), dtype=np.float32)
+
+        batches = []
+        for i in range(0, len(sentences), batch_size):
+            tokens = self.tokenizer(
+                sentences[i:i + batch_size], padding=True, truncation=True,
+                max_length=self.config['max_seq_length'], return_tensors='np'
+            )
+            inputs = {name: tokens[name].astype(np.int64) for name in self._input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+            batches.append(self._pool(token_embeddings, tokens['attention_mask']))
+        return np.vstack(batches)
+
+    def _pool(self, token_embeddings, attention_mask):
+        """Apply the pooling and normalization of the Sentence-Transformer pipeline"""
+        mask = attention_mask[..., None].astype(np.float32)
+        if self.config['pooling'] == 'cls':
+            pooled = token_embeddings[:, 0]
+        elif self.config['pooling'] == 'max':
+            pooled = np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        else:
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config['normalize']:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+def create_encoder(backend=None, model_name='all-MiniLM-L6-v2', model_dir=None):
+    """
+    Create the sentence encoder for a backend
+
+    Args:
+        backend: 'torch', 'onnx' or 'int8' (ENCODER_BACKEND, default 'torch')
+        model_name: Sentence-Transformer model name
+        model_dir: Exported model directory for 'onnx'/'int8' (ENCODER_MODEL_DIR)
+
+    Falls back to the PyTorch model when an ONNX backend cannot be loaded.
+    """
+    backend = (backend or os.getenv('ENCODER_BACKEND', 'torch')).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    if backend in ('onnx', 'int8'):
+        try:
+            encoder = OnnxEncoder(model_name, model_dir or os.getenv('ENCODER_MODEL_DIR') or None,
+                                  quantized=backend == 'int8')
+            print(f"Using ONNX Runtime encoder ({backend})")
+            return encoder
+        except Exception as e:
+            print(f"Warning: could not load {backend} encoder, using PyTorch: {str(e)}")
+
+    return TorchEncoder(model_name)
@@ -0,0 +1,152 @@
+"""
+Micro-batching front end for the sentence encoder.
+Concurrent requests each encode a handful of sentences; on CPU many small
+forward passes compete for the same cores. The service collects sentences
+from concurrent callers for a few milliseconds (or until a batch is full),
+runs one encode, and hands every caller its own rows.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+
+
+class EncoderService:
+    """Coalesce encode calls from concurrent threads into shared batches"""
+
+    def __init__(self, encode, max_batch_size=None, max_wait_ms=None, timeout=None):
+        """
+        Initialize the encoder service
+
+        Args:
+            encode: Callable mapping a list of strings to an (n x dim) array
+            max_batch_size: Sentences per encode call before the batch is
+                closed early (ENCODER_MAX_BATCH, default 64)
+            max_wait_ms: How long the first caller of a batch waits for others
+                (ENCODER_MAX_WAIT_MS, default 5)
+            timeout: Seconds a caller waits for its batch before giving up
+                (ENCODER_TIMEOUT, default 120)
+        """
+        self._encode = encode
+        self.max_batch_size = max_batch_size or int(os.getenv('ENCODER_MAX_BATCH', '64'))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None
+                         else float(os.getenv('ENCODER_MAX_WAIT_MS', '5'))) / 1000.0
+        self.timeout = timeout if timeout is not None else float(os.getenv('ENCODER_TIMEOUT', '120'))
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._sentences = 0
+        self._max_batch = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    def encode(self, sentences):
+        """
+        Encode sentences as part of the next shared batch
+
+        Blocks until the batch containing these sentences has been encoded,
+        or raises concurrent.futures.TimeoutError after timeout seconds.
+
+        Returns:
+            numpy array (n_sentences x dim)
+        """
+        sentences = list(sentences)
+        if not sentences:
+            return self._encode(sentences)
+        self._ensure_started()
+        future = Future()
+        self._queue.put((sentences, future, time.time()))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Drop the sentences if their batch has not started yet
+            future.cancel()
+            raise
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='encoder-service', daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait is over"""
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.time() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect()
+                self._process(batch)
+            except Exception as e:
+                # Whatever failed, no caller of this batch may be left waiting
+                print(f"Error in batched encode: {str(e)}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch):
+        """Encode one batch and resolve its callers' futures"""
+        started = time.time()
+
+        # Callers that timed out while queued are skipped; the rest can no longer cancel
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        # Sentences requested by several callers are encoded once
+        unique = list(dict.fromkeys(s for sentences, _, _ in batch for s in sentences))
+        embeddings = np.asarray(self._encode(unique))
+
+        rows = {sentence: i for i, sentence in enumerate(unique)}
+        results = [embeddings[[rows[s] for s in sentences]] for sentences, _, _ in batch]
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+        waits = [started - enqueued for _, _, enqueued in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._sentences += len(unique)
+            self._max_batch = max(self._max_batch, len(unique))
+            self._queue_wait_total += sum(waits)
+            self._queue_wait_max = max(self._queue_wait_max, max(waits))
+
+    def stats(self):
+        """Return batch-size and queue-wait statistics for this process"""
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': batches,
+                'requests': self._requests,
+                'avg_batch_size': self._sentences / batches if batches else 0,
+                'largest_batch': self._max_batch,
+                'avg_queue_wait_ms': self._queue_wait_total / self._requests * 1000 if self._requests else 0,
+                'max_queue_wait_ms': self._queue_wait_max * 1000,
+                'queued': self._queue.qsize(),
+            }
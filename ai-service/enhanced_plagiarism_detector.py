@@ -2,31 +2,55 @@
 Enhanced plagiarism detector that works like plagiarismchecker.ai
 Uses multiple search strategies and better matching algorithms
 """
+import os
 import re
 import time
 from plagiarism_detector import PlagiarismDetector
+from query_planner import QueryPlanner
+from search_scheduler import SearchScheduler
+from wikipedia_index import WikipediaIndex
 
 class EnhancedPlagiarismDetector(PlagiarismDetector):
     """Enhanced version with better search and matching"""
     
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
-        super().__init__(model_name)
+    def __init__(self, model_name='all-MiniLM-L6-v2', encoder_backend=None):
+        super().__init__(model_name, encoder_backend)
         self.search_strategies = [
             'sentence_based',
             'phrase_based',
             'keyword_based'
         ]
+        self.wikipedia_index = self._load_wikipedia_index()
+        self.query_planner = self.web_searcher.query_planner if self.web_searcher else QueryPlanner()
+        # Runs the strategies concurrently under one query budget and deadline
+        self.search_scheduler = SearchScheduler(self._run_query, self.web_searcher)
     
-    def detect_plagiarism(self, text):
+    def _load_wikipedia_index(self):
+        """Load the offline Wikipedia index from WIKIPEDIA_INDEX_PATH, if configured"""
+        path = os.getenv('WIKIPEDIA_INDEX_PATH')
+        if not path:
+            return None
+        try:
+            index = WikipediaIndex(path)
+            print(f"Wikipedia index loaded: {len(index)} articles")
+            return index
+        except Exception as e:
+            print(f"Warning: could not load Wikipedia index from {path}: {str(e)}")
+            return None
+    
+    def detect_plagiarism(self, text, document=None):
         """
         Enhanced plagiarism detection with multiple search strategies
         """
-        sentences = self.preprocess_text(text)
-        ai_detection = self.detect_ai_generated(text)
+        if document is None:
+            document = self.analyze(text)
+        sentences = document.sentences
+        with document.timed('ai_detection'):
+            ai_detection = self.detect_ai_generated(text, sentences)
         
         if not self.web_searcher or not self.text_matcher:
             print("Web search not available, using basic detection")
-            return self._basic_detection(text, sentences, ai_detection)
+            return self._basic_detection(text, sentences, ai_detection, document.embeddings)
         
         print("=" * 60)
         print("ENHANCED PLAGIARISM DETECTION")
@@ -35,31 +59,132 @@ class EnhancedPlagiarismDetector(PlagiarismDetector):
         print(f"Sentences: {len(sentences)}")
         print("=" * 60)
         
-        # Strategy 0: Search specifically for Wikipedia pages (highest priority)
-        print("\n[Strategy 0] Searching specifically for Wikipedia pages...")
-        wikipedia_sources = self._search_wikipedia(text)
-        sources = wikipedia_sources
-        
-        # Strategy 1: Search using key sentences
-        print("\n[Strategy 1] Searching with key sentences...")
-        sentence_sources = self._search_with_sentences(text, sentences)
-        sources.extend(sentence_sources)
-        
-        # Strategy 2: Search using important phrases
-        if len(sources) < 5:
-            print("\n[Strategy 2] Searching with important phrases...")
-            phrase_sources = self._search_with_phrases(text)
-            sources.extend(phrase_sources)
-        
-        # Strategy 3: Search using keywords
-        if len(sources) < 5:
-            print("\n[Strategy 3] Searching with keywords...")
-            keyword_sources = self._search_with_keywords(text)
-            sources.extend(keyword_sources)
-        
-        # Remove duplicates and prioritize Wikipedia sources
+        # Strategies run concurrently; fallback strategies stop once enough sources are found
+        print("\nRunning search strategies concurrently...")
+        with document.timed('search'):
+            sources = self.search_scheduler.run(self._strategy_plan(document))
+        
+        unique_sources = self._unique_sources(sources)
+        
+        print(f"\nTotal unique sources found: {len(unique_sources)}")
+        
+        if unique_sources:
+            print("\nAnalyzing matches against sources...")
+            prepared = document.matcher_tables(self.text_matcher)
+            with document.timed('match'):
+                match_results = self.text_matcher.find_matches(text, unique_sources, prepared)
+            result = self._results_from_matches(
+                text, sentences, ai_detection, match_results, unique_sources
+            )
+        else:
+            print("\nNo sources found, using semantic analysis")
+            result = self._basic_detection(text, sentences, ai_detection, document.embeddings)
+        
+        print(f"Timings: {document.timing_summary()}")
+        return result
+    
+    def iter_detect_plagiarism(self, text):
+        """
+        Streaming variant of detect_plagiarism
+        
+        Sources are matched as soon as they are fetched, so matches are reported
+        before the remaining strategies finish.
+        
+        Yields:
+            Event dictionaries:
+            - {'event': 'start', ...} once, before searching
+            - {'event': 'progress', 'strategy': ..., ...} after each strategy
+            - {'event': 'match', 'match': {...}, 'coverage': {...}} per new match
+            - {'event': 'summary', 'result': {...}} once, with the full result
+        """
+        document = self.analyze(text)
+        sentences = document.sentences
+        ai_detection = self.detect_ai_generated(text, sentences)
+        
+        if not self.web_searcher or not self.text_matcher:
+            yield {'event': 'summary',
+                   'result': self._basic_detection(text, sentences, ai_detection, document.embeddings)}
+            return
+        
+        plan = self._strategy_plan(document)
+        match_sentences, match_phrases = document.matcher_tables(self.text_matcher)
+        
+        yield {
+            'event': 'start',
+            'text_length': len(text),
+            'sentence_count': len(sentences),
+            'strategies': [strategy['name'] for strategy in plan],
+        }
+        
+        sources = []
+        seen_urls = set()
+        matches = []
+        coverage = self.text_matcher.summarize(text, [])
+        
+        for event in self.search_scheduler.iter_results(plan):
+            if event['type'] == 'done':
+                yield {
+                    'event': 'progress',
+                    'strategy': event['strategy'],
+                    'queries': event['queries'],
+                    'skipped': event['skipped'],
+                    'sources_found': len(sources),
+                    'coverage': self._coverage_summary(coverage),
+                }
+                continue
+            if event['type'] == 'deadline':
+                yield {
+                    'event': 'progress',
+                    'deadline_exceeded': True,
+                    'pending_strategies': event['pending'],
+                    'sources_found': len(sources),
+                    'coverage': self._coverage_summary(coverage),
+                }
+                continue
+            
+            source = event['source']
+            url = source.get('url', '')
+            if not url or url in seen_urls:
+                continue
+            seen_urls.add(url)
+            sources.append(source)
+            
+            new_matches = self.text_matcher.match_source(
+                text, match_sentences, match_phrases, source, matches, len(sources)
+            )
+            if not new_matches:
+                continue
+            matches.extend(new_matches)
+            coverage = self.text_matcher.summarize(text, matches)
+            for match in new_matches:
+                yield {
+                    'event': 'match',
+                    'match': match,
+                    'coverage': self._coverage_summary(coverage),
+                }
+        
+        unique_sources = self._unique_sources(sources)
+        if unique_sources:
+            result = self._results_from_matches(
+                text, sentences, ai_detection, coverage, unique_sources
+            )
+        else:
+            result = self._basic_detection(text, sentences, ai_detection, document.embeddings)
+        
+        yield {'event': 'summary', 'result': result}
+    
+    def _coverage_summary(self, match_results):
+        """Running coverage percentages for streaming events"""
+        return {
+            'exact_match_percentage': float(match_results['exact_match_percentage']),
+            'partial_match_percentage': float(match_results['partial_match_percentage']),
+            'total_plagiarism': float(match_results['total_plagiarism']),
+            'unique_content_percentage': float(match_results['unique_content_percentage']),
+        }
+    
+    def _unique_sources(self, sources):
+        """Remove duplicate sources by URL and put Wikipedia sources first"""
         seen_urls = set()
-        unique_sources = []
         wikipedia_sources = []
         other_sources = []
         
@@ -67,69 +192,171 @@ class EnhancedPlagiarismDetector(PlagiarismDetector):
             url = source.get('url', '')
             if url and url not in seen_urls:
                 seen_urls.add(url)
-                # Ensure URL is always included
-                if not source.get('url'):
-                    source['url'] = url
                 # Prioritize Wikipedia sources
                 if 'wikipedia.org' in url.lower():
                     wikipedia_sources.append(source)
                 else:
                     other_sources.append(source)
         
-        # Put Wikipedia sources first
-        unique_sources = wikipedia_sources + other_sources
-        
-        print(f"\nTotal unique sources found: {len(unique_sources)}")
+        return wikipedia_sources + other_sources
+    
+    def _results_from_matches(self, text, sentences, ai_detection, match_results, unique_sources):
+        """Build the final result dictionary from TextMatcher output"""
+        exact_match_pct = match_results['exact_match_percentage']
+        partial_match_pct = match_results['partial_match_percentage']
+        total_plagiarism = match_results['total_plagiarism']
+        unique_content = match_results['unique_content_percentage']
+        matches = match_results['matches']
         
-        if unique_sources:
-            print("\nAnalyzing matches against sources...")
-            match_results = self.text_matcher.find_matches(text, unique_sources)
-            
-            exact_match_pct = match_results['exact_match_percentage']
-            partial_match_pct = match_results['partial_match_percentage']
-            total_plagiarism = match_results['total_plagiarism']
-            unique_content = match_results['unique_content_percentage']
-            matches = match_results['matches']
-            
-            # Format matches with URLs - ensure URLs are always included
-            formatted_matches = []
-            for i, match in enumerate(matches[:15], 1):  # Top 15 matches
-                # Ensure URL is always present - if missing, try to find it from source
-                match_url = match.get('url', '')
-                if not match_url:
-                    # Try to find URL from source title or source info
-                    source_name = match.get('source', '')
-                    # Look for Wikipedia URL in sources
-                    for source in unique_sources:
-                        if source.get('title', '') == source_name or source_name in source.get('title', ''):
-                            match_url = source.get('url', '')
-                            break
-                
-                formatted_matches.append({
-                    'text': match['text'],
-                    'similarity': match['similarity'],
-                    'match_type': match['match_type'],
-                    'source': match.get('source', 'Unknown Source'),
-                    'url': match_url,  # Always include URL, even if empty
-                    'match_number': i
-                })
+        # Format matches with URLs - ensure URLs are always included
+        formatted_matches = []
+        for i, match in enumerate(matches[:15], 1):  # Top 15 matches
+            # Ensure URL is always present - if missing, try to find it from source
+            match_url = match.get('url', '')
+            if not match_url:
+                # Try to find URL from source title or source info
+                source_name = match.get('source', '')
+                # Look for Wikipedia URL in sources
+                for source in unique_sources:
+                    if source.get('title', '') == source_name or source_name in source.get('title', ''):
+                        match_url = source.get('url', '')
+                        break
             
-            similarity_score = total_plagiarism
-            
-            return self._format_results(
-                similarity_score, exact_match_pct, partial_match_pct,
-                unique_content, formatted_matches, ai_detection, text, sentences
-            )
+            formatted_match = {
+                'text': match['text'],
+                'similarity': match['similarity'],
+                'match_type': match['match_type'],
+                'source': match.get('source', 'Unknown Source'),
+                'url': match_url,  # Always include URL, even if empty
+                'match_number': i
+            }
+            # [start, end) character offsets in the checked text, for highlighting
+            if match.get('position', -1) >= 0:
+                formatted_match['span'] = [match['position'],
+                                         match.get('end', match['position'] + len(match['text']))]
+            formatted_matches.append(formatted_match)
+        
+        similarity_score = total_plagiarism
+        
+        return self._format_results(
+            similarity_score, exact_match_pct, partial_match_pct,
+            unique_content, formatted_matches, ai_detection, text, sentences
+        )
+    
+    def _strategy_plan(self, document):
+        """
+        Describe the search strategies for an AnalyzedDocument in priority order
+        
+        Queries are built lazily so skipped strategies cost nothing. The
+        SearchScheduler runs all strategies concurrently. With an offline
+        Wikipedia index, Strategy 0 is resolved locally and the web strategies
+        only look for non-Wikipedia sources.
+        """
+        text, sentences = document.text, document.sentences
+        if self.wikipedia_index is not None:
+            wikipedia_strategy = {
+                # Strategy 0: Look up Wikipedia articles in the offline index
+                'name': 'wikipedia',
+                'label': '[Strategy 0] Looking up Wikipedia articles in the local index',
+                'queries': lambda: [text],
+                'max_results': 3,
+                'wikipedia_only': True,
+                'local': True,
+                'only_if_few_sources': False,
+                'skip_when_throttled': False,
+            }
+            web_queries = lambda queries: [f'{query} -site:wikipedia.org' for query in queries]
         else:
-            print("\nNo sources found, using semantic analysis")
-            return self._basic_detection(text, sentences, ai_detection)
+            wikipedia_strategy = {
+                # Strategy 0: Search specifically for Wikipedia pages (highest priority)
+                'name': 'wikipedia',
+                'label': '[Strategy 0] Searching specifically for Wikipedia pages',
+                'queries': lambda: self._wikipedia_queries(text, sentences),
+                'max_results': 3,
+                'wikipedia_only': True,
+                'only_if_few_sources': False,
+                'skip_when_throttled': False,
+            }
+            web_queries = lambda queries: queries
+        
+        return [
+            wikipedia_strategy,
+            {
+                # Strategy 1: Search using key sentences
+                'name': 'sentence_based',
+                'label': '[Strategy 1] Searching with key sentences',
+                'queries': lambda: web_queries(self._sentence_queries(sentences)),
+                'max_results': 2,
+                'wikipedia_only': False,
+                'only_if_few_sources': False,
+                'skip_when_throttled': False,
+            },
+            {
+                # Strategy 2: Search using important phrases
+                'name': 'phrase_based',
+                'label': '[Strategy 2] Searching with important phrases',
+                'queries': lambda: web_queries(self._phrase_queries(sentences)),
+                'max_results': 1,
+                'wikipedia_only': False,
+                'only_if_few_sources': True,
+                'skip_when_throttled': True,
+            },
+            {
+                # Strategy 3: Search using keywords
+                'name': 'keyword_based',
+                'label': '[Strategy 3] Searching with keywords',
+                'queries': lambda: web_queries(self._keyword_queries(text, document.lower_words)),
+                'max_results': 1,
+                'wikipedia_only': False,
+                'only_if_few_sources': True,
+                'skip_when_throttled': True,
+            },
+        ]
     
-    def _search_wikipedia(self, text):
-        """Search specifically for Wikipedia pages"""
+    def _run_query(self, query, strategy):
+        """Run one search query for a strategy, returning its sources"""
+        if strategy.get('local'):
+            return self._local_wikipedia_sources(query, strategy['max_results'])
+        
+        try:
+            print(f"  Searching ({strategy['name']}): '{query[:60]}...'")
+            results = self.web_searcher._search_google(query, max_results=strategy['max_results'])
+        except Exception as e:
+            print(f"  Error searching {strategy['name']}: {str(e)}")
+            return []
+        
+        if not strategy['wikipedia_only']:
+            return results
+        
+        # Only keep Wikipedia URLs
         sources = []
+        for result in results:
+            url = result.get('url', '')
+            if 'wikipedia.org' in url.lower():
+                sources.append(result)
+                print(f"    ✓ Found Wikipedia page: {url[:60]}...")
+        return sources
+    
+    def _local_wikipedia_sources(self, text, max_results):
+        """Resolve Wikipedia articles sharing fingerprints with text from the offline index"""
+        started = time.time()
+        try:
+            sources = self.wikipedia_index.sources(text, max_articles=max_results)
+        except Exception as e:
+            print(f"  Error looking up Wikipedia index: {str(e)}")
+            return []
+        for source in sources:
+            print(f"    ✓ Found Wikipedia article: {source['url'][:60]}...")
+        print(f"  Wikipedia index lookup: {len(sources)} articles in {(time.time() - started) * 1000:.0f}ms")
+        return sources
+    
+    def _wikipedia_queries(self, text, sentences=None):
+        """Build search queries that target Wikipedia articles"""
+        queries = []
         
         # Extract the main topic/keyword from the text (usually first sentence or key terms)
-        sentences = self.preprocess_text(text)
+        if sentences is None:
+            sentences = self.preprocess_text(text)
         if sentences:
             first_sentence = sentences[0] if sentences else ""
             
@@ -142,7 +369,6 @@ class EnhancedPlagiarismDetector(PlagiarismDetector):
                     potential_titles.append(words[i])
             
             # Try searching with "site:wikipedia.org" for better Wikipedia results
-            queries = []
             
             # Query 1: First sentence with Wikipedia site search
             if len(first_sentence) > 20:
@@ -161,101 +387,34 @@ class EnhancedPlagiarismDetector(PlagiarismDetector):
             # Also try without site: restriction but with "wikipedia" keyword
             if first_sentence:
                 queries.append(f'wikipedia {first_sentence[:80]}')
-            
-            for query in queries[:3]:  # Limit to 3 queries
-                try:
-                    print(f"  Searching Wikipedia: '{query[:60]}...'")
-                    results = self.web_searcher._search_google(query, max_results=3)
-                    # Prioritize Wikipedia URLs
-                    for result in results:
-                        url = result.get('url', '')
-                        if 'wikipedia.org' in url.lower():
-                            sources.append(result)
-                            print(f"    ✓ Found Wikipedia page: {url[:60]}...")
-                    time.sleep(0.8)  # Rate limiting
-                except Exception as e:
-                    print(f"  Error searching Wikipedia: {str(e)}")
         
-        return sources
+        return queries[:3]  # Limit to 3 queries
     
-    def _search_with_sentences(self, text, sentences):
-        """Search using key sentences"""
-        sources = []
-        # Use first 3-5 most important sentences
-        key_sentences = sentences[:5]
-        
-        for sentence in key_sentences:
-            if len(sentence) > 20:
-                try:
-                    results = self.web_searcher._search_google(sentence[:200], max_results=2)
-                    sources.extend(results)
-                    time.sleep(0.5)  # Rate limiting
-                except Exception as e:
-                    print(f"  Error searching sentence: {str(e)}")
-        
-        return sources
+    def _sentence_queries(self, sentences):
+        """Use up to 5 sentences with the rarest terms as queries"""
+        # Long sentences are cut to their first 200 characters, not skipped
+        return self.query_planner.plan([sentence[:200] for sentence in sentences],
+                                       max_queries=5, sentence_chars=(21, None))
     
-    def _search_with_phrases(self, text):
-        """Search using important phrases"""
-        sources = []
-        words = text.split()
-        
-        # Extract 4-6 word phrases
-        phrases = []
-        for length in range(4, 7):
-            for i in range(len(words) - length + 1):
-                phrase = ' '.join(words[i:i+length])
-                if 30 <= len(phrase) <= 150:
-                    phrases.append(phrase)
-        
-        # Use top 5 unique phrases
-        unique_phrases = list(set(phrases))[:5]
-        
-        for phrase in unique_phrases:
-            try:
-                results = self.web_searcher._search_google(phrase, max_results=1)
-                sources.extend(results)
-                time.sleep(0.5)
-            except Exception as e:
-                print(f"  Error searching phrase: {str(e)}")
-        
-        return sources
+    def _phrase_queries(self, sentences):
+        """Pick up to 5 non-overlapping 4-6 word phrases with the rarest terms"""
+        return self.query_planner.plan(sentences, max_queries=5, sentence_chars=None, phrase_words=(4, 6))
     
-    def _search_with_keywords(self, text):
-        """Search using important keywords"""
-        sources = []
-        
-        # Extract keywords (longer words, excluding common words)
-        words = text.lower().split()
-        common_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'}
-        
-        keywords = [w for w in words if len(w) > 4 and w not in common_words]
-        # Get top 5 most frequent keywords
-        from collections import Counter
-        if keywords:
-            keyword_counts = Counter(keywords)
-            top_keywords = [word for word, count in keyword_counts.most_common(5)]
-        else:
-            top_keywords = []
+    def _keyword_queries(self, text, words=None):
+        """Build 2-keyword queries from the keywords with the highest tf-idf"""
+        if words is None:
+            words = text.lower().split()
+        top_keywords = self.query_planner.keywords(words, 5)
         
         # Search with 2-3 keyword combinations
         if len(top_keywords) < 2:
-            return sources
+            return []
         
-        for i in range(len(top_keywords) - 1):
-            query = f"{top_keywords[i]} {top_keywords[i+1]}"
-            try:
-                results = self.web_searcher._search_google(query, max_results=1)
-                sources.extend(results)
-                time.sleep(0.5)
-            except Exception as e:
-                print(f"  Error searching keywords: {str(e)}")
-        
-        return sources
+        return [f"{top_keywords[i]} {top_keywords[i+1]}" for i in range(len(top_keywords) - 1)]
     
-    def _basic_detection(self, text, sentences, ai_detection):
+    def _basic_detection(self, text, sentences, ai_detection, sentence_embeddings=None):
         """Basic detection when web search is not available"""
-        similarity_score, matches = self._fallback_semantic_check(text, sentences)
+        similarity_score, matches = self._fallback_semantic_check(text, sentences, sentence_embeddings)
         return self._format_results(
             similarity_score, 0, similarity_score,
             100 - similarity_score, matches, ai_detection, text, sentences
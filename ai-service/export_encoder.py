@@ -0,0 +1,121 @@
+"""
+Export the Sentence-Transformer encoder to ONNX, plus a dynamically quantized
+int8 copy, for ENCODER_BACKEND=onnx / int8.
+
+Usage:
+    python export_encoder.py [--model all-MiniLM-L6-v2] [--output models/all-MiniLM-L6-v2-onnx]
+                             [--opset 14] [--no-int8]
+
+Requires torch, sentence-transformers, onnx and onnxruntime. Check the result
+with: python test_encoder_parity.py
+"""
+import argparse
+import json
+import os
+import sys
+
+from encoder_backends import CONFIG_FILE, INT8_MODEL_FILE, ONNX_MODEL_FILE, default_model_dir
+
+
+def _pipeline_config(model):
+    """Pooling and normalization settings of a SentenceTransformer pipeline"""
+    pooling = 'mean'
+    normalize = False
+    for module in model:
+        if type(module).__name__ == 'Pooling':
+            if getattr(module, 'pooling_mode_cls_token', False):
+                pooling = 'cls'
+            elif getattr(module, 'pooling_mode_max_tokens', False):
+                pooling = 'max'
+        elif type(module).__name__ == 'Normalize':
+            normalize = True
+    return pooling, normalize
+
+
+def export(model_name, output_dir, opset=14, int8=True):
+    """Write model.onnx, model_int8.onnx, the tokenizer and encoder.json to output_dir"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    print(f"Loading {model_name}...")
+    model = SentenceTransformer(model_name, device='cpu')
+    model.eval()
+    transformer = model[0].auto_model
+    tokenizer = model.tokenizer
+    pooling, normalize = _pipeline_config(model)
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Transformer returning only the token embeddings"""
+
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.transformer(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    sample = tokenizer(['An example sentence to trace the encoder.'], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    onnx_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+
+    print(f"Exporting ONNX model to {onnx_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer),
+            tuple(sample[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=['token_embeddings'],
+            dynamic_axes={
+                **{name: {0: 'batch', 1: 'sequence'} for name in input_names},
+                'token_embeddings': {0: 'batch', 1: 'sequence'},
+            },
+            opset_version=opset,
+        )
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(output_dir, INT8_MODEL_FILE)
+        print(f"Quantizing to int8: {int8_path}...")
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(output_dir)
+    config = {
+        'model_name': model_name,
+        'dimension': model.get_sentence_embedding_dimension(),
+        'max_seq_length': model.max_seq_length,
+        'pooling': pooling,
+        'normalize': normalize,
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), 'w') as f:
+        json.dump(config, f, indent=2)
+
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith('.onnx'):
+            size = os.path.getsize(os.path.join(output_dir, name)) / (1024 * 1024)
+            print(f"  {name}: {size:.1f} MB")
+    print("Done. Set ENCODER_BACKEND=onnx or ENCODER_BACKEND=int8 to use it.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the sentence encoder to ONNX / int8')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2', help='Sentence-Transformer model name')
+    parser.add_argument('--output', help='Output directory (default: models/<model>-onnx)')
+    parser.add_argument('--opset', type=int, default=14, help='ONNX opset version')
+    parser.add_argument('--no-int8', action='store_true', help='Skip the quantized int8 model')
+    args = parser.parse_args(argv)
+
+    try:
+        export(args.model, args.output or default_model_dir(args.model), args.opset, not args.no_int8)
+    except ImportError as e:
+        print(f"Missing dependency: {str(e)}")
+        print("Install with: pip install onnx onnxruntime")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
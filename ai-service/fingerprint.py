@@ -0,0 +1,191 @@
+"""
+Winnowing document fingerprints (the MOSS approach) for exact-match detection.
+Text is reduced to lowercase letters and digits, every k-gram is hashed, and
+winnowing keeps the minimum hash of each window of w consecutive k-grams.
+Any shared run of at least k + w - 1 normalized characters is guaranteed to
+share a fingerprint, which anchors a character-level span extension.
+"""
+import bisect
+import zlib
+from collections import defaultdict, deque
+
+
+def normalize_with_offsets(text):
+    """
+    Reduce text to lowercase alphanumeric characters
+
+    Returns:
+        (normalized, offsets, orig_to_norm) where offsets[i] is the index in
+        text of normalized character i, and orig_to_norm[j] is the number of
+        normalized characters before text index j (len(text) + 1 entries)
+    """
+    chars = []
+    offsets = []
+    orig_to_norm = [0] * (len(text) + 1)
+    for i, char in enumerate(text):
+        orig_to_norm[i] = len(chars)
+        if char.isalnum():
+            chars.append(char.lower())
+            offsets.append(i)
+    orig_to_norm[len(text)] = len(chars)
+    return ''.join(chars), offsets, orig_to_norm
+
+
+class Fingerprinter:
+    """Compute k-gram hashes and winnowed fingerprints"""
+
+    def __init__(self, k=20, w=8):
+        """
+        Args:
+            k: k-gram length in normalized characters (noise threshold)
+            w: Winnowing window size in k-grams
+        """
+        self.k = k
+        self.w = w
+
+    @property
+    def guarantee(self):
+        """Shared runs at least this long (normalized characters) are always detected"""
+        return self.k + self.w - 1
+
+    def kgram_hashes(self, normalized):
+        """Return the 32-bit hash of every k-gram of a normalized string"""
+        k = self.k
+        data = normalized.encode('utf-8')
+        if len(data) == len(normalized):
+            # ASCII fast path: byte offsets equal character offsets
+            return [zlib.crc32(data[i:i + k]) for i in range(len(normalized) - k + 1)]
+        return [zlib.crc32(normalized[i:i + k].encode('utf-8'))
+                for i in range(len(normalized) - k + 1)]
+
+    def winnow(self, hashes):
+        """
+        Select the minimum hash of every window of w hashes (rightmost on ties)
+
+        Returns:
+            List of (hash, position) fingerprints in position order
+        """
+        w = self.w
+        if not hashes:
+            return []
+        if len(hashes) <= w:
+            position = min(range(len(hashes)), key=lambda i: (hashes[i], -i))
+            return [(hashes[position], position)]
+
+        fingerprints = []
+        window = deque()  # positions with increasing hashes
+        last_selected = -1
+        for i, h in enumerate(hashes):
+            while window and hashes[window[-1]] >= h:
+                window.pop()
+            window.append(i)
+            if window[0] <= i - w:
+                window.popleft()
+            if i >= w - 1 and window[0] != last_selected:
+                last_selected = window[0]
+                fingerprints.append((hashes[last_selected], last_selected))
+        return fingerprints
+
+
+class SpanSet:
+    """Exact spans of the input text matched against one source"""
+
+    def __init__(self, spans, orig_to_norm):
+        # spans are (start, end) in normalized coordinates of the input
+        self.spans = sorted(spans)
+        self._starts = [start for start, _ in self.spans]
+        self._max_end = []
+        furthest = 0
+        for _, end in self.spans:
+            furthest = max(furthest, end)
+            self._max_end.append(furthest)
+        self._orig_to_norm = orig_to_norm
+
+    def __bool__(self):
+        return bool(self.spans)
+
+    def covers(self, start, end):
+        """True if one span contains the text[start:end] (original offsets)"""
+        norm_start = self._orig_to_norm[start]
+        norm_end = self._orig_to_norm[min(end, len(self._orig_to_norm) - 1)]
+        if norm_end <= norm_start:
+            return False
+        i = bisect.bisect_right(self._starts, norm_start) - 1
+        return i >= 0 and self._max_end[i] >= norm_end
+
+    def normalized_length(self, start, end):
+        """Number of normalized characters in text[start:end]"""
+        return (self._orig_to_norm[min(end, len(self._orig_to_norm) - 1)]
+                - self._orig_to_norm[start])
+
+
+class FingerprintIndex:
+    """Hash index from winnowed source fingerprints to source positions"""
+
+    def __init__(self, fingerprinter=None, max_postings=64):
+        """
+        Args:
+            fingerprinter: Fingerprinter to use (k=20, w=8 by default)
+            max_postings: Hashes occurring more often than this are ignored as boilerplate
+        """
+        self.fingerprinter = fingerprinter or Fingerprinter()
+        self.max_postings = max_postings
+        self._postings = defaultdict(list)
+        self._sources = {}
+
+    def add(self, source_id, text):
+        """Fingerprint a source once and add it to the index"""
+        normalized, _, _ = normalize_with_offsets(text)
+        self.add_normalized(source_id, normalized)
+
+    def add_normalized(self, source_id, normalized, fingerprints=None):
+        """Add an already normalized source, optionally with precomputed fingerprints"""
+        if fingerprints is None:
+            fingerprints = self.fingerprinter.winnow(self.fingerprinter.kgram_hashes(normalized))
+        self._sources[source_id] = normalized
+        for h, position in fingerprints:
+            self._postings[h].append((source_id, position))
+
+    def find_spans(self, text):
+        """
+        Find maximal exact (normalized) spans shared by text and each source
+
+        Every k-gram of the input is looked up once; each hit is verified and
+        extended along its diagonal, so the work is linear in the input size
+        plus the total length of the matched spans.
+
+        Returns:
+            Dictionary source_id -> SpanSet for every indexed source
+        """
+        k = self.fingerprinter.k
+        normalized, _, orig_to_norm = normalize_with_offsets(text)
+        hashes = self.fingerprinter.kgram_hashes(normalized)
+
+        spans = defaultdict(list)
+        extended_to = {}  # (source_id, diagonal) -> end of the last span on that diagonal
+        for i, h in enumerate(hashes):
+            postings = self._postings.get(h)
+            if not postings or len(postings) > self.max_postings:
+                continue
+            for source_id, j in postings:
+                diagonal = i - j
+                if extended_to.get((source_id, diagonal), -1) > i:
+                    continue
+                source = self._sources[source_id]
+                if normalized[i:i + k] != source[j:j + k]:
+                    continue  # hash collision
+                start_i, start_j = i, j
+                while start_i > 0 and start_j > 0 and normalized[start_i - 1] == source[start_j - 1]:
+                    start_i -= 1
+                    start_j -= 1
+                end_i, end_j = i + k, j + k
+                while end_i < len(normalized) and end_j < len(source) and normalized[end_i] == source[end_j]:
+                    end_i += 1
+                    end_j += 1
+                extended_to[(source_id, diagonal)] = end_i
+                spans[source_id].append((start_i, end_i))
+
+        return {
+            source_id: SpanSet(spans.get(source_id, []), orig_to_norm)
+            for source_id in self._sources
+        }
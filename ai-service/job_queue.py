@@ -0,0 +1,147 @@
+"""
+Background job queue for long-running plagiarism checks.
+Runs detector calls on a bounded in-process worker pool so HTTP workers
+can return a job id immediately instead of blocking on web searches.
+Job records live in a cache backend; the default SQLite store is shared by
+every gunicorn worker on the machine, so any worker can answer /jobs/<id>.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_backends import create_backend
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another submission"""
+
+
+class JobQueue:
+    """Bounded worker pool with a job store shared across processes"""
+
+    def __init__(self, max_workers=None, max_queue=None, result_ttl=None, store=None):
+        """
+        Initialize the job queue
+
+        Args:
+            max_workers: Number of background worker threads
+            max_queue: Maximum number of pending + running jobs in this process
+            result_ttl: Seconds to keep finished jobs before they are purged
+            store: Cache backend holding job records; defaults to one configured
+                from JOB_STORE_* env vars
+        """
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', '4'))
+        self.max_queue = max_queue or int(os.getenv('JOB_QUEUE_SIZE', '500'))
+        self.result_ttl = result_ttl or int(os.getenv('JOB_RESULT_TTL', '3600'))
+        if store is None:
+            store = create_backend(
+                os.getenv('JOB_STORE_BACKEND', 'sqlite'),
+                path=os.getenv('JOB_STORE_PATH') or None,
+                max_entries=int(os.getenv('JOB_STORE_SIZE', '10000')),
+                name='jobs'
+            )
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='check-job')
+        self._lock = threading.Lock()
+        self._active = {}  # job id -> status, for jobs of this process
+        self._finished = {'finished': 0, 'failed': 0}
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue a function call as a background job
+
+        Args:
+            func: Callable to run in the worker pool
+            *args, **kwargs: Arguments passed to func
+
+        Returns:
+            Job id string
+
+        Raises:
+            QueueFullError: If max_queue jobs are already pending or running
+        """
+        with self._lock:
+            if len(self._active) >= self.max_queue:
+                raise QueueFullError(
+                    f'Job queue is full ({self.max_queue} pending jobs). Please retry later.'
+                )
+            job_id = uuid.uuid4().hex
+            self._active[job_id] = 'queued'
+
+        job = {
+            'id': job_id,
+            'status': 'queued',
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+        }
+        try:
+            self.store.set(job_id, job)
+            self._executor.submit(self._run, job, func, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._active.pop(job_id, None)
+            raise
+        return job_id
+
+    def get(self, job_id):
+        """Return a snapshot of the job, or None if it is unknown or expired"""
+        try:
+            return self.store.get(job_id)
+        except Exception as e:
+            print(f"Warning: job store read failed: {str(e)}")
+            return None
+
+    def stats(self):
+        """Return queue depth and job counts by status for this process"""
+        with self._lock:
+            counts = dict(self._finished)
+            for status in self._active.values():
+                counts[status] = counts.get(status, 0) + 1
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'active': len(self._active),
+                'jobs': counts,
+                'store': type(self.store).__name__,
+            }
+
+    def _run(self, job, func, args, kwargs):
+        """Execute a job and record its outcome"""
+        job_id = job['id']
+        self._update(job, status='running', started_at=time.time())
+        try:
+            result = func(*args, **kwargs)
+            outcome = {'status': 'finished', 'result': result}
+        except Exception as e:
+            print(f"Error in background job {job_id}: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            outcome = {'status': 'failed', 'error': str(e)}
+        try:
+            # Finished jobs expire from the store after result_ttl
+            if not self._update(job, finished_at=time.time(), ttl=self.result_ttl, **outcome):
+                outcome = {'status': 'failed', 'result': None, 'error': 'Could not store the job result'}
+                self._update(job, ttl=self.result_ttl, **outcome)
+        finally:
+            with self._lock:
+                self._active.pop(job_id, None)
+                self._finished[outcome['status']] += 1
+
+    def _update(self, job, ttl=None, **fields):
+        """Apply fields to the job record and write it to the store; False if the write failed"""
+        job.update(fields)
+        with self._lock:
+            if job['id'] in self._active:
+                self._active[job['id']] = job['status']
+        try:
+            self.store.set(job['id'], job, ttl=ttl)
+            return True
+        except Exception as e:
+            print(f"Warning: job store write failed for {job['id']}: {str(e)}")
+            return False
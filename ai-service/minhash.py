@@ -0,0 +1,117 @@
+"""
+MinHash signatures and an LSH banding index for near-duplicate candidate search.
+Source sentences are indexed once per page; a fragment of the input text is
+only compared with SequenceMatcher against the sentences whose estimated
+character-shingle Jaccard similarity clears a threshold.
+"""
+import random
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+
+_MASK64 = (1 << 64) - 1
+
+
+class MinHasher:
+    """Compute MinHash signatures over character shingles"""
+
+    def __init__(self, num_perm=128, shingle_size=3, seed=1, cache_size=65536):
+        """
+        Args:
+            num_perm: Number of hash functions (signature length)
+            shingle_size: Characters per shingle
+            seed: Seed for the hash functions; signatures are only comparable
+                between MinHashers with the same parameters
+            cache_size: Number of signatures of recent texts kept in memory
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = random.Random(seed)
+        # Multiply-add hash functions modulo 2^64 (odd multipliers)
+        self._perms = [(rng.getrandbits(64) | 1, rng.getrandbits(64)) for _ in range(num_perm)]
+        # Fragments of the input are compared with many sources: memoize them
+        self.signature = lru_cache(maxsize=cache_size)(self.compute)
+
+    @property
+    def key(self):
+        """Parameters that determine signature values"""
+        return (self.num_perm, self.shingle_size, self.seed)
+
+    def shingle_hashes(self, text):
+        """Return the 32-bit hashes of the distinct character shingles of text"""
+        k = self.shingle_size
+        if len(text) <= k:
+            return {zlib.crc32(text.encode('utf-8'))} if text else set()
+        return {zlib.crc32(text[i:i + k].encode('utf-8')) for i in range(len(text) - k + 1)}
+
+    def compute(self, text):
+        """MinHash signature of text as a tuple, or None for empty text"""
+        hashes = self.shingle_hashes(text)
+        if not hashes:
+            return None
+        return tuple(
+            min([(a * h + b) & _MASK64 for h in hashes])
+            for a, b in self._perms
+        )
+
+
+def estimate_jaccard(signature, other):
+    """Fraction of equal signature positions (unbiased Jaccard estimate)"""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+class LSHIndex:
+    """Banded locality-sensitive hashing index over MinHash signatures"""
+
+    def __init__(self, num_perm=128, bands=64):
+        """
+        Args:
+            num_perm: Signature length of the indexed signatures
+            bands: Number of bands; rows per band is num_perm // bands.
+                Items sharing any band are candidates, so more bands (fewer
+                rows) raise recall at low similarity and the candidate count.
+        """
+        if bands <= 0 or num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._tables = [defaultdict(list) for _ in range(bands)]
+        self.signatures = []
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows] for i in range(self.bands)]
+
+    def add(self, signature):
+        """Index a signature and return its item id (insertion order)"""
+        item_id = len(self.signatures)
+        self.signatures.append(signature)
+        if signature is not None:
+            for table, band in zip(self._tables, self._band_keys(signature)):
+                table[band].append(item_id)
+        return item_id
+
+    def candidates(self, signature):
+        """Return the ids of items sharing at least one band with signature"""
+        found = set()
+        if signature is None:
+            return found
+        for table, band in zip(self._tables, self._band_keys(signature)):
+            items = table.get(band)
+            if items:
+                found.update(items)
+        return found
+
+    def query(self, signature, threshold):
+        """
+        Return ids of candidate items whose estimated Jaccard similarity
+        with signature is at least threshold, in insertion order
+        """
+        return [
+            item_id for item_id in sorted(self.candidates(signature))
+            if estimate_jaccard(signature, self.signatures[item_id]) >= threshold
+        ]
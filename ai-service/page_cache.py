@@ -0,0 +1,234 @@
+"""
+Persistent cache of fetched and extracted source pages.
+Stores the whitespace-normalized text of each URL compressed in SQLite,
+together with the ETag/Last-Modified validators used for conditional GETs.
+A small in-memory LRU tier in front of SQLite serves hot pages without
+touching the disk.
+"""
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+class PageCache:
+    """Size-bounded URL -> extracted text cache shared across processes"""
+
+    def __init__(self, path=None, max_bytes=None, max_age=None, memory_entries=None):
+        """
+        Initialize the page cache
+
+        Args:
+            path: SQLite database file
+            max_bytes: Maximum total compressed size before LRU eviction
+            max_age: Seconds an entry is served without revalidation
+            memory_entries: Number of pages kept decompressed in memory
+        """
+        self.path = path or os.getenv('PAGE_CACHE_PATH', os.path.join('cache', 'pages.sqlite3'))
+        self.max_bytes = max_bytes or int(float(os.getenv('PAGE_CACHE_MAX_MB', '256')) * 1024 * 1024)
+        self.max_age = max_age if max_age is not None else int(os.getenv('PAGE_CACHE_MAX_AGE', '604800'))
+        self.memory_entries = memory_entries or int(os.getenv('PAGE_CACHE_MEMORY_ENTRIES', '256'))
+
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._local = threading.local()
+        # Fetch threads update the counters concurrently
+        self._stats_lock = threading.Lock()
+        self._writes_since_evict = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pages ('
+                'url TEXT PRIMARY KEY, content BLOB NOT NULL, size INTEGER NOT NULL, '
+                'etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, '
+                'last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)')
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, url):
+        """
+        Look up a cached page
+
+        Returns:
+            Dictionary with 'content', 'etag', 'last_modified' and 'fetched_at',
+            or None if the URL is not cached
+        """
+        with self._memory_lock:
+            entry = self._memory.get(url)
+            if entry is not None:
+                self._memory.move_to_end(url)
+                return entry
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT content, etag, last_modified, fetched_at FROM pages WHERE url = ?',
+                    (url,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute('UPDATE pages SET last_access = ? WHERE url = ?', (time.time(), url))
+        except sqlite3.Error as e:
+            print(f"Warning: page cache read failed: {str(e)}")
+            return None
+
+        entry = {
+            'content': zlib.decompress(row[0]).decode('utf-8'),
+            'etag': row[1],
+            'last_modified': row[2],
+            'fetched_at': row[3],
+        }
+        self._remember(url, entry)
+        return entry
+
+    def document(self, url, content, factory):
+        """
+        Return the parsed document kept with a page in the in-memory tier
+
+        Args:
+            url: Page URL
+            content: Extracted text the document must correspond to
+            factory: Callable building the document when none is cached
+        """
+        with self._memory_lock:
+            entry = self._memory.get(url)
+            if entry is not None and entry['content'] == content:
+                document = entry.get('document')
+                if document is None:
+                    document = factory()
+                    entry['document'] = document
+                return document
+        return factory()
+
+    def is_fresh(self, entry):
+        """True if the entry can be served without revalidation"""
+        return time.time() - entry['fetched_at'] < self.max_age
+
+    def put(self, url, content, etag=None, last_modified=None):
+        """Store the extracted text of a page"""
+        now = time.time()
+        entry = {
+            'content': content,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': now,
+        }
+        self._remember(url, entry)
+
+        blob = zlib.compress(content.encode('utf-8'), 6)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO pages '
+                    '(url, content, size, etag, last_modified, fetched_at, last_access) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (url, blob, len(blob), etag, last_modified, now, now)
+                )
+        except sqlite3.Error as e:
+            print(f"Warning: page cache write failed: {str(e)}")
+            return
+
+        with self._stats_lock:
+            self._writes_since_evict += 1
+            evict = self._writes_since_evict >= 20
+            if evict:
+                self._writes_since_evict = 0
+        if evict:
+            self._evict()
+
+    def touch(self, url):
+        """Mark a cached page as revalidated (HTTP 304)"""
+        now = time.time()
+        with self._stats_lock:
+            self.revalidated += 1
+        with self._memory_lock:
+            entry = self._memory.get(url)
+            if entry is not None:
+                entry['fetched_at'] = now
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'UPDATE pages SET fetched_at = ?, last_access = ? WHERE url = ?',
+                    (now, now, url)
+                )
+        except sqlite3.Error as e:
+            print(f"Warning: page cache update failed: {str(e)}")
+
+    def _remember(self, url, entry):
+        """Keep a decompressed entry in the in-memory LRU tier"""
+        with self._memory_lock:
+            self._memory[url] = entry
+            self._memory.move_to_end(url)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self):
+        """
+        Delete least recently used pages until the cache fits in max_bytes
+
+        Pages in the in-memory tier are kept: their hits never reach SQLite,
+        so their last_access there is out of date.
+        """
+        with self._memory_lock:
+            hot = set(self._memory)
+        try:
+            with self._connect() as conn:
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+                if total <= self.max_bytes:
+                    return
+                excess = total - self.max_bytes
+                freed = 0
+                stale = []
+                for url, size in conn.execute('SELECT url, size FROM pages ORDER BY last_access'):
+                    if url in hot:
+                        continue
+                    stale.append((url,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                conn.executemany('DELETE FROM pages WHERE url = ?', stale)
+            with self._memory_lock:
+                for (url,) in stale:
+                    self._memory.pop(url, None)
+            print(f"Page cache evicted {len(stale)} pages ({freed} bytes)")
+        except sqlite3.Error as e:
+            print(f"Warning: page cache eviction failed: {str(e)}")
+
+    def record_hit(self):
+        """Count a page served from the cache without revalidation"""
+        with self._stats_lock:
+            self.hits += 1
+
+    def record_miss(self):
+        """Count a page that was not cached"""
+        with self._stats_lock:
+            self.misses += 1
+
+    def stats(self):
+        """Return hit/miss counts for this process"""
+        with self._stats_lock:
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+            }
+        with self._memory_lock:
+            stats['memory_entries'] = len(self._memory)
+        return stats
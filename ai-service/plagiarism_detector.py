@@ -1,13 +1,15 @@
+import os
 import re
+from contextlib import nullcontext
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-except ImportError:
-    SPACY_AVAILABLE = False
-    print("Warning: spaCy not available. Using basic tokenization.")
+from analyzed_document import AnalyzedDocument
+from embedding_cache import EmbeddingCache
+from encoder_backends import create_encoder
+from encoder_service import EncoderService
+from reference_corpus import ReferenceCorpus
+from segmenter import create_segmenter
+from semantic_matcher import SemanticMatcher
 try:
     from textblob import TextBlob
     TEXTBLOB_AVAILABLE = True
@@ -31,55 +33,84 @@ class PlagiarismDetector:
     AI-based plagiarism detector using Sentence-Transformers for semantic similarity
     """
     
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, model_name='all-MiniLM-L6-v2', encoder_backend=None):
         """
         Initialize the plagiarism detector with a pre-trained model
         
         Args:
             model_name: Name of the Sentence-Transformer model to use
+            encoder_backend: 'torch', 'onnx' or 'int8' (ENCODER_BACKEND, default 'torch')
         """
         self.model_name = model_name
+        self.encoder_backend = encoder_backend
         self.model = None
-        self.nlp = None
+        self.encoder_service = None
+        self.embedding_cache = None
+        self.reference_corpus = None
+        self.segmenter = None
         self.web_searcher = None
         self.text_matcher = None
         self._load_model()
-        self._load_nlp()
+        self._load_reference_corpus()
+        self._load_segmenter()
         self._load_web_search()
     
     def _load_model(self):
         """Load the Sentence-Transformer model"""
         try:
             print(f"Loading model: {self.model_name}...")
-            self.model = SentenceTransformer(self.model_name)
+            self.model = create_encoder(self.encoder_backend, self.model_name)
             print("Model loaded successfully")
         except Exception as e:
             print(f"Error loading model: {str(e)}")
             raise
+        
+        if os.getenv('ENCODER_BATCHING', 'on').lower() != 'off':
+            # Concurrent requests share encoder forward passes
+            self.encoder_service = EncoderService(self.model.encode)
+        
+        if os.getenv('EMBEDDING_CACHE', 'on').lower() != 'off':
+            try:
+                # Keyed by backend too: ONNX/int8 vectors differ slightly from PyTorch ones
+                self.embedding_cache = EmbeddingCache(self.model.name)
+            except Exception as e:
+                print(f"Warning: embedding cache disabled: {str(e)}")
+                self.embedding_cache = None
     
-    def _load_nlp(self):
-        """Load spaCy NLP model for text processing"""
-        if not SPACY_AVAILABLE:
-            self.nlp = None
+    def _load_reference_corpus(self):
+        """Load the local reference corpus from REFERENCE_CORPUS_PATH, if configured"""
+        path = os.getenv('REFERENCE_CORPUS_PATH')
+        if not path:
             return
         
         try:
-            # Try to load English model, fallback to basic if not available
-            try:
-                self.nlp = spacy.load("en_core_web_sm")
-            except OSError:
-                print("Warning: spaCy English model not found. Using basic tokenization.")
-                self.nlp = None
+            corpus = ReferenceCorpus(path)
+        except Exception as e:
+            print(f"Warning: could not load reference corpus from {path}: {str(e)}")
+            return
+        
+        # Vectors from a different encoder are not comparable
+        if corpus.encoder_name != self.model.name:
+            print(f"Warning: reference corpus was embedded with {corpus.encoder_name}, "
+                  f"not {self.model.name}; ignoring it")
+            return
+        self.reference_corpus = corpus
+        print(f"Reference corpus loaded: {len(corpus)} sentences from {len(corpus.documents)} documents")
+    
+    def _load_segmenter(self):
+        """Load the sentence segmenter selected by SEGMENTER (parser, sentencizer or regex)"""
+        try:
+            self.segmenter = create_segmenter()
         except Exception as e:
-            print(f"Warning: Error loading spaCy: {str(e)}")
-            self.nlp = None
+            print(f"Warning: Error loading sentence segmenter: {str(e)}")
+            self.segmenter = create_segmenter('regex')
     
     def _load_web_search(self):
         """Load web search and text matching modules"""
         if WEB_SEARCH_AVAILABLE:
             try:
                 self.web_searcher = WebSearcher()
-                self.text_matcher = TextMatcher()
+                self.text_matcher = TextMatcher(semantic_matcher=self._create_semantic_matcher())
                 print("Web search and text matching modules loaded")
             except Exception as e:
                 print(f"Warning: Could not load web search modules: {str(e)}")
@@ -89,6 +120,12 @@ class PlagiarismDetector:
             self.web_searcher = None
             self.text_matcher = None
     
+    def _create_semantic_matcher(self):
+        """Paraphrase matcher sharing the sentence encoder, if SEMANTIC_MATCHING=on"""
+        if self.model is None or os.getenv('SEMANTIC_MATCHING', 'off').lower() != 'on':
+            return None
+        return SemanticMatcher(self.encode, self.model.name)
+    
     def is_model_loaded(self):
         """Check if the model is loaded"""
         return self.model is not None
@@ -104,18 +141,64 @@ class PlagiarismDetector:
             List of cleaned sentences
         """
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
+        return self._segment(re.sub(r'\s+', ' ', text.strip()))
+    
+    def _segment(self, text):
+        """Split whitespace-collapsed text into sentences"""
+        return self.segmenter.split(text)
+    
+    def analyze(self, text, sentences=None, sentence_embeddings=None):
+        """
+        Tokenize and segment text once for a whole check
         
-        # Split into sentences
-        if self.nlp:
-            doc = self.nlp(text)
-            sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
-        else:
-            # Fallback: simple sentence splitting
-            sentences = re.split(r'[.!?]+', text)
-            sentences = [s.strip() for s in sentences if s.strip()]
+        Args:
+            text: Input text
+            sentences: Optional pre-split sentences of text
+            sentence_embeddings: Optional precomputed embeddings of sentences
+            
+        Returns:
+            AnalyzedDocument shared by detection, query generation and matching
+        """
+        return AnalyzedDocument(text, self._segment, self.encode, sentences, sentence_embeddings)
+    
+    def preprocess_texts(self, texts):
+        """
+        Preprocess many texts at once; spaCy segmenters batch them with nlp.pipe
         
-        return sentences
+        Args:
+            texts: List of input text strings
+            
+        Returns:
+            List of sentence lists, one per input text
+        """
+        cleaned = [re.sub(r'\s+', ' ', text.strip()) for text in texts]
+        return self.segmenter.split_many(cleaned)
+    
+    def encode(self, sentences):
+        """
+        Encode sentences, sending only embedding cache misses to the model
+        
+        Args:
+            sentences: List of strings
+            
+        Returns:
+            numpy array (n_sentences x dim)
+        """
+        sentences = list(sentences)
+        encode = self.encoder_service.encode if self.encoder_service else self.model.encode
+        if self.embedding_cache is None or not sentences:
+            return encode(sentences)
+        
+        vectors = self.embedding_cache.get_many(sentences)
+        missing = list(dict.fromkeys(s for s, vector in zip(sentences, vectors) if vector is None))
+        if missing:
+            # All misses go to the encoder in one batch
+            embeddings = encode(missing)
+            self.embedding_cache.put_many(missing, embeddings)
+            encoded = dict(zip(missing, embeddings))
+            vectors = [encoded[s] if vector is None else vector for s, vector in zip(sentences, vectors)]
+        
+        return np.vstack(vectors).astype(np.float32)
     
     def extract_features(self, text):
         """
@@ -131,10 +214,10 @@ class PlagiarismDetector:
         
         if len(sentences) == 0:
             # If no sentences, use the whole text
-            embeddings = self.model.encode([text])
+            embeddings = self.encode([text])
         else:
             # Encode each sentence
-            embeddings = self.model.encode(sentences)
+            embeddings = self.encode(sentences)
         
         # Average the embeddings if multiple sentences
         if len(embeddings.shape) > 1 and embeddings.shape[0] > 1:
@@ -162,18 +245,20 @@ class PlagiarismDetector:
         similarity = cosine_similarity(text1_emb, text2_emb)[0][0]
         return float(similarity)
     
-    def detect_ai_generated(self, text):
+    def detect_ai_generated(self, text, sentences=None):
         """
         Detect if text might be AI-generated using heuristics
         
         Args:
             text: Input text string
+            sentences: Optional pre-split sentences of text
             
         Returns:
             Dictionary with AI detection results
         """
         # Heuristic 1: Check for repetitive patterns
-        sentences = self.preprocess_text(text)
+        if sentences is None:
+            sentences = self.preprocess_text(text)
         unique_sentences = len(set(sentences))
         repetition_score = 1 - (unique_sentences / max(len(sentences), 1))
         
@@ -192,7 +277,8 @@ class PlagiarismDetector:
             r'\b(in conclusion|to summarize|in summary)\b',
             r'\b(furthermore|moreover|additionally)\b',
         ]
-        pattern_count = sum(len(re.findall(pattern, text.lower())) for pattern in ai_patterns)
+        lowered = text.lower()
+        pattern_count = sum(len(re.findall(pattern, lowered)) for pattern in ai_patterns)
         pattern_score = min(pattern_count / max(len(sentences), 1), 1)
         
         # Combined AI score
@@ -205,20 +291,49 @@ class PlagiarismDetector:
             'uniformity_score': float(uniformity * 100),
         }
     
-    def detect_plagiarism(self, text):
+    def detect_plagiarism_batch(self, texts):
+        """
+        Detect plagiarism in many documents, sharing segmentation and web
+        search work across the batch
+        
+        Sentence embeddings are only computed for the documents that need
+        them (the semantic fallback), on first use; the embedding cache
+        answers sentences repeated across documents.
+        
+        Args:
+            texts: List of input texts to check
+            
+        Returns:
+            List of result dictionaries in the same shape as detect_plagiarism
+        """
+        sentence_lists = self.preprocess_texts(texts)
+        
+        # Duplicate queries and page fetches are only performed once per batch
+        batch_scope = self.web_searcher.batch_scope() if self.web_searcher else nullcontext()
+        with batch_scope:
+            return [
+                self.detect_plagiarism(text, document=self.analyze(text, sentences))
+                for text, sentences in zip(texts, sentence_lists)
+            ]
+    
+    def detect_plagiarism(self, text, document=None):
         """
         Main method to detect plagiarism in text
         
         Args:
             text: Input text to check
+            document: Optional AnalyzedDocument of text (see analyze)
             
         Returns:
             Dictionary with plagiarism detection results
         """
-        sentences = self.preprocess_text(text)
+        if document is None:
+            document = self.analyze(text)
+        sentences = document.sentences
         
         # Detect AI-generated content
-        ai_detection = self.detect_ai_generated(text)
+        with document.timed('ai_detection'):
+            ai_detection = self.detect_ai_generated(text, sentences)
         
         # Try to find real plagiarism using web search
         if self.web_searcher and self.text_matcher:
@@ -231,7 +346,8 @@ class PlagiarismDetector:
                 # Search for similar content online
                 import time
                 start_time = time.time()
-                sources = self.web_searcher.search_queries(text, max_results=5)
+                with document.timed('search'):
+                    sources = self.web_searcher.search_queries(text, max_results=5, document=document)
                 search_time = time.time() - start_time
                 
                 print(f"Web search completed in {search_time:.2f} seconds")
@@ -242,7 +358,9 @@ class PlagiarismDetector:
                     
                     # Match text against found sources
                     match_start = time.time()
-                    match_results = self.text_matcher.find_matches(text, sources)
+                    prepared = document.matcher_tables(self.text_matcher)
+                    with document.timed('match'):
+                        match_results = self.text_matcher.find_matches(text, sources, prepared)
                     match_time = time.time() - match_start
                     print(f"Text matching completed in {match_time:.2f} seconds")
                     
@@ -255,21 +373,26 @@ class PlagiarismDetector:
                     # Format matches with proper numbering
                     formatted_matches = []
                     for i, match in enumerate(matches[:10], 1):  # Limit to top 10 matches
-                        formatted_matches.append({
+                        formatted_match = {
                             'text': match['text'],
                             'similarity': match['similarity'],
                             'match_type': match['match_type'],
                             'source': match['source'],
                             'url': match.get('url', ''),
                             'match_number': i
-                        })
+                        }
+                        # [start, end) character offsets in the checked text, for highlighting
+                        if match.get('position', -1) >= 0:
+                            formatted_match['span'] = [match['position'],
+                                                       match.get('end', match['position'] + len(match['text']))]
+                        formatted_matches.append(formatted_match)
                     
                     similarity_score = total_plagiarism
                     
                 else:
                     # No sources found, use semantic similarity as fallback
                     print("No sources found, using semantic similarity with reference search")
-                    similarity_score, matches = self._fallback_semantic_check(text, sentences)
+                    similarity_score, matches = self._fallback_semantic_check(text, sentences, document.embeddings)
                     exact_match_pct = 0
                     partial_match_pct = similarity_score
                     unique_content = 100 - similarity_score
@@ -279,7 +402,7 @@ class PlagiarismDetector:
                 print(f"Error in web search plagiarism detection: {str(e)}")
                 print("Falling back to semantic similarity with reference search")
                 # Fallback to semantic similarity but still try to find references
-                similarity_score, matches = self._fallback_semantic_check(text, sentences)
+                similarity_score, matches = self._fallback_semantic_check(text, sentences, document.embeddings)
                 exact_match_pct = 0
                 partial_match_pct = similarity_score
                 unique_content = 100 - similarity_score
@@ -288,12 +411,14 @@ class PlagiarismDetector:
             # Web search not available, use semantic similarity
             print("Web search not available, using semantic similarity")
             print("Note: Reference links will not be available without web search")
-            similarity_score, matches = self._fallback_semantic_check(text, sentences)
+            similarity_score, matches = self._fallback_semantic_check(text, sentences, document.embeddings)
             exact_match_pct = 0
             partial_match_pct = similarity_score
             unique_content = 100 - similarity_score
             formatted_matches = matches
         
+        print(f"Timings: {document.timing_summary()}")
+        
         # Generate analysis
         analysis = []
         
@@ -358,11 +483,15 @@ class PlagiarismDetector:
             'sentence_count': int(len(sentences)),
         }
     
-    def _fallback_semantic_check(self, text, sentences):
+    def _fallback_semantic_check(self, text, sentences, sentence_embeddings=None):
         """Fallback method using semantic similarity when web search is not available"""
+        if self.reference_corpus is not None and sentences:
+            return self._reference_corpus_check(sentences, sentence_embeddings)
+        
         # Calculate internal similarity (how similar are parts of the text to each other)
         if len(sentences) > 1:
-            sentence_embeddings = self.model.encode(sentences)
+            if sentence_embeddings is None:
+                sentence_embeddings = self.encode(sentences)
             # Calculate pairwise similarities
             similarity_matrix = cosine_similarity(sentence_embeddings)
             # Get average similarity (excluding diagonal)
@@ -398,6 +527,61 @@ class PlagiarismDetector:
         
         return similarity_score, matches
     
+    def _reference_corpus_hits(self, sentence_embeddings):
+        """Nearest reference corpus sentences of each sentence, as (score, sentence_id) lists"""
+        top_k = int(os.getenv('REFERENCE_TOP_K', '3'))
+        return self.reference_corpus.search(sentence_embeddings, top_k=top_k)
+    
+    def _reference_corpus_check(self, sentences, sentence_embeddings=None, neighbours=None):
+        """
+        Match sentences against the local reference corpus (works offline)
+        
+        Args:
+            sentences: Sentences of the text
+            sentence_embeddings: Optional precomputed embeddings of sentences
+            neighbours: Optional output of _reference_corpus_hits for these sentences
+        
+        Returns:
+            (similarity_score, matches): share of the text (by characters) whose
+            nearest corpus sentence reaches REFERENCE_MATCH_THRESHOLD, and one
+            match per such sentence with the corpus document as its source
+        """
+        threshold = float(os.getenv('REFERENCE_MATCH_THRESHOLD', '0.80'))
+        if neighbours is None:
+            if sentence_embeddings is None:
+                sentence_embeddings = self.encode(sentences)
+            neighbours = self._reference_corpus_hits(sentence_embeddings)
+        matches = []
+        matched_chars = 0
+        for sentence, hits in zip(sentences, neighbours):
+            if not hits or hits[0][0] < threshold:
+                continue
+            score, sentence_id = hits[0]
+            reference = self.reference_corpus.sentence(sentence_id)
+            matched_chars += len(sentence)
+            matches.append({
+                'text': sentence[:200] + '...' if len(sentence) > 200 else sentence,
+                'similarity': float(min(score, 1.0) * 100),
+                'match_type': 'exact' if score >= 0.98 else 'paraphrase',
+                'source': reference['title'] or 'Reference corpus',
+                'url': reference['url'],
+                'source_text': reference['text'],
+                # Other corpus documents with a close sentence
+                'related_sources': list(dict.fromkeys(
+                    self.reference_corpus.sentence(other_id)['title']
+                    for other_score, other_id in hits[1:] if other_score >= threshold
+                )),
+            })
+        
+        matches.sort(key=lambda m: m['similarity'], reverse=True)
+        matches = matches[:10]
+        for i, match in enumerate(matches, 1):
+            match['match_number'] = i
+        
+        total_chars = sum(len(s) for s in sentences)
+        similarity_score = float(min(100, matched_chars / total_chars * 100)) if total_chars else 0.0
+        return similarity_score, matches
+    
     def _find_reference_for_sentence(self, sentence):
         """Try to find a reference URL for a sentence using web search"""
         if not self.web_searcher:
@@ -0,0 +1,86 @@
+"""
+Cache of search query -> result URLs.
+Outbound search queries are the scarcest resource of the service, so the
+URL list of every normalized query is remembered, including queries that
+returned nothing.
+"""
+import os
+import re
+import threading
+
+from cache_backends import create_backend
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so trivially different queries share an entry"""
+    return re.sub(r'\s+', ' ', query.strip().lower())
+
+
+class QueryCache:
+    """Memoize search result URLs per normalized query with separate positive/negative TTLs"""
+
+    def __init__(self, backend=None, ttl=None, negative_ttl=None):
+        """
+        Initialize the query cache
+
+        Args:
+            backend: Cache backend; defaults to one configured from QUERY_CACHE_* env vars
+            ttl: Seconds a non-empty URL list stays valid
+            negative_ttl: Seconds a "no hits" result stays valid
+        """
+        if backend is None:
+            backend = create_backend(
+                os.getenv('QUERY_CACHE_BACKEND', 'sqlite'),
+                path=os.getenv('QUERY_CACHE_PATH') or None,
+                max_entries=int(os.getenv('QUERY_CACHE_SIZE', '20000')),
+                name='queries'
+            )
+        self.backend = backend
+        self.ttl = ttl if ttl is not None else int(os.getenv('QUERY_CACHE_TTL', '604800'))
+        self.negative_ttl = (negative_ttl if negative_ttl is not None
+                             else int(os.getenv('QUERY_CACHE_NEGATIVE_TTL', '3600')))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, query, max_results):
+        """
+        Return cached URLs for the query, or None on a miss
+
+        An entry stored for a larger max_results also answers smaller requests.
+        """
+        urls = self._lookup(query, max_results)
+        with self._lock:
+            if urls is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return urls
+
+    def contains(self, query, max_results):
+        """True if get() would hit, without counting a lookup"""
+        return self._lookup(query, max_results) is not None
+
+    def _lookup(self, query, max_results):
+        try:
+            entry = self.backend.get(normalize_query(query))
+        except Exception as e:
+            print(f"Warning: query cache read failed: {str(e)}")
+            return None
+        if entry is not None and (not entry['urls'] or entry['max_results'] >= max_results):
+            return entry['urls'][:max_results]
+        return None
+
+    def set(self, query, max_results, urls):
+        """Store the URLs a search returned; an empty list records "no hits" """
+        ttl = self.ttl if urls else self.negative_ttl
+        try:
+            self.backend.set(normalize_query(query),
+                             {'urls': list(urls), 'max_results': max_results}, ttl=ttl)
+        except Exception as e:
+            print(f"Warning: query cache write failed: {str(e)}")
+
+    def stats(self):
+        """Return hit/miss counts for this process"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
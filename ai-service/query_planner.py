@@ -0,0 +1,274 @@
+"""
+Rarity-based search query selection.
+Candidate queries (sentences or word windows of sentences) are scored by the
+inverse document frequency of their terms, so common phrases like "in the
+United States" carry little weight. A greedy weighted set cover then picks
+the fewest high-information queries that cover most of the document's
+information, skipping candidates that overlap queries already chosen.
+
+The IDF table ships in data/idf_en.json.gz. Build one from a local corpus:
+    python query_planner.py build-idf <dir of .txt/.jsonl files> [--output data/idf_en.json.gz]
+or estimate one from unigram log-probabilities (term -> ln p, JSON, optionally .gz):
+    python query_planner.py from-unigrams <unigrams.json.gz> [--output data/idf_en.json.gz]
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter
+
+DEFAULT_IDF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'idf_en.json.gz')
+
+_TERM = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Used when no IDF table can be loaded: stopwords carry no information, other terms one unit each
+STOPWORDS = {
+    'a', 'about', 'after', 'all', 'also', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'been', 'but',
+    'by', 'can', 'could', 'did', 'do', 'does', 'each', 'for', 'from', 'had', 'has', 'have', 'he', 'her',
+    'his', 'how', 'i', 'if', 'in', 'into', 'is', 'it', 'its', 'may', 'more', 'most', 'no', 'not', 'of',
+    'on', 'one', 'only', 'or', 'other', 'our', 'she', 'should', 'so', 'some', 'such', 'than', 'that',
+    'the', 'their', 'them', 'then', 'there', 'these', 'they', 'this', 'those', 'to', 'up', 'was', 'we',
+    'were', 'what', 'when', 'which', 'while', 'who', 'will', 'with', 'would', 'you', 'your',
+}
+
+
+def terms(text):
+    """Lowercase word terms of text"""
+    return _TERM.findall(text.lower())
+
+
+class IDFTable:
+    """Inverse document frequencies of common terms; unlisted terms get default_idf"""
+
+    def __init__(self, idf, default_idf, documents=0, source=''):
+        self.idf = idf
+        self.default_idf = default_idf
+        self.documents = documents
+        self.source = source
+
+    @classmethod
+    def load(cls, path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['idf'], data['default_idf'], data.get('documents', 0), data.get('source', ''))
+
+    @classmethod
+    def fallback(cls):
+        """Stopword-only weighting for when no table is available"""
+        return cls({word: 0.0 for word in STOPWORDS}, 1.0, source='stopwords')
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        data = {
+            'source': self.source,
+            'documents': self.documents,
+            'default_idf': round(self.default_idf, 3),
+            'idf': {term: round(value, 3) for term, value in self.idf.items()},
+        }
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'), sort_keys=True)
+
+    def __call__(self, term):
+        return self.idf.get(term, self.default_idf)
+
+    def __len__(self):
+        return len(self.idf)
+
+
+def build_idf(documents, max_terms=50000, min_df=2, source=''):
+    """
+    Build an IDF table from an iterable of document texts
+
+    Only the max_terms most frequent terms are stored; every rarer term
+    gets the IDF of the least frequent stored term.
+    """
+    df = Counter()
+    count = 0
+    for text in documents:
+        df.update(set(terms(text)))
+        count += 1
+    if not count:
+        raise ValueError("No documents to build an IDF table from")
+
+    common = [(term, n) for term, n in df.most_common(max_terms) if n >= min_df]
+    idf = {term: math.log((1 + count) / (1 + n)) for term, n in common}
+    cutoff_df = common[-1][1] if common else 0
+    return IDFTable(idf, math.log((1 + count) / (1 + cutoff_df)), count, source)
+
+
+def idf_from_unigrams(log_probs, max_terms=50000, document_length=300, source=''):
+    """
+    Estimate an IDF table from unigram log-probabilities
+
+    A term with probability p appears in a document of document_length tokens
+    with probability 1 - exp(-p * document_length) (Poisson model).
+    """
+    probabilities = Counter()
+    for token, log_prob in log_probs.items():
+        for term in terms(token):
+            if term == token.lower():
+                probabilities[term] += math.exp(log_prob)
+
+    common = probabilities.most_common(max_terms)
+    if not common:
+        raise ValueError("No word terms among the unigrams")
+
+    def estimate(p):
+        return -math.log(-math.expm1(-p * document_length))
+
+    idf = {term: estimate(p) for term, p in common}
+    return IDFTable(idf, estimate(common[-1][1]), 0, source)
+
+
+class QueryPlanner:
+    """Choose few, high-information, non-overlapping search queries"""
+
+    def __init__(self, idf_table=None, coverage=None, max_overlap=0.5):
+        """
+        Args:
+            idf_table: IDFTable to weight terms with (loaded from QUERY_IDF_PATH,
+                default data/idf_en.json.gz; stopword weighting if unavailable)
+            coverage: Share of the document's information after which no more
+                queries are added (QUERY_PLANNER_COVERAGE, default 0.9)
+            max_overlap: Candidates sharing more than this share of their words
+                with a chosen query are dropped
+        """
+        if idf_table is None:
+            path = os.getenv('QUERY_IDF_PATH', DEFAULT_IDF_PATH)
+            try:
+                idf_table = IDFTable.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: could not load IDF table from {path}, using stopword weighting: {str(e)}")
+                idf_table = IDFTable.fallback()
+        self.idf = idf_table
+        self.coverage = coverage if coverage is not None else float(os.getenv('QUERY_PLANNER_COVERAGE', '0.9'))
+        self.max_overlap = max_overlap
+
+    def information(self, text):
+        """Summed IDF of the distinct terms of text"""
+        return sum(self.idf(term) for term in set(terms(text)))
+
+    def plan(self, sentences, max_queries, sentence_chars=(21, 199), phrase_words=None, phrase_chars=(30, 150)):
+        """
+        Pick queries covering the sentences' information
+
+        Args:
+            sentences: Sentences of the document
+            max_queries: Most queries returned
+            sentence_chars: (min, max) length of whole-sentence queries, max None
+                for no limit; None for no sentence queries
+            phrase_words: (min, max) words per phrase query; None for no phrase queries
+            phrase_chars: (min, max) length of phrase queries
+
+        Returns:
+            Queries, most informative first
+        """
+        # Weight of every word position, keyed by (sentence, word)
+        weights = {}
+        candidates = []
+        for s, sentence in enumerate(sentences):
+            words = sentence.split()
+            seen = set()
+            for w, word in enumerate(words):
+                word_terms = [term for term in terms(word) if term not in seen]
+                seen.update(word_terms)
+                weights[(s, w)] = sum(self.idf(term) for term in word_terms)
+
+            if sentence_chars is not None and _fits(sentence.strip(), sentence_chars):
+                candidates.append((sentence.strip(), [(s, w) for w in range(len(words))]))
+            if phrase_words is not None:
+                low, high = phrase_words
+                for length in range(low, high + 1):
+                    for start in range(len(words) - length + 1):
+                        phrase = ' '.join(words[start:start + length])
+                        if _fits(phrase, phrase_chars):
+                            candidates.append((phrase, [(s, w) for w in range(start, start + length)]))
+
+        total = sum(weights.values())
+        if not total:
+            return []
+
+        chosen = []
+        covered = set()
+        gained = 0.0
+        while candidates and len(chosen) < max_queries and gained < self.coverage * total:
+            best = None
+            best_gain = 0.0
+            remaining = []
+            for query, positions in candidates:
+                overlap = sum(1 for position in positions if position in covered)
+                if overlap > self.max_overlap * len(positions):
+                    continue
+                remaining.append((query, positions))
+                gain = sum(weights[position] for position in positions if position not in covered)
+                if gain > best_gain:
+                    best, best_gain = (query, positions), gain
+            candidates = remaining
+            if best is None:
+                break
+            chosen.append(best[0])
+            covered.update(best[1])
+            gained += best_gain
+            candidates.remove(best)
+        return chosen
+
+    def keywords(self, words, count):
+        """The count terms of words with the highest tf-idf, ignoring terms of 4 characters or fewer"""
+        tf = Counter(term for word in words for term in terms(word) if len(term) > 4)
+        ranked = sorted(tf, key=lambda term: (-tf[term] * self.idf(term), term))
+        return ranked[:count]
+
+
+def _fits(query, chars):
+    low, high = chars
+    return len(query) >= low and (high is None or len(query) <= high)
+
+
+def _documents(input_dir):
+    from reference_corpus import iter_documents
+    for document in iter_documents(input_dir):
+        yield document['text']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the IDF table used to select search queries')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build-idf', help='Count document frequencies in a local corpus')
+    build_parser.add_argument('input_dir', help='Directory of .txt files or .jsonl files with a "text" field')
+    build_parser.add_argument('--min-df', type=int, default=2, help='Drop terms found in fewer documents')
+    unigram_parser = subparsers.add_parser('from-unigrams', help='Estimate IDF from unigram log-probabilities')
+    unigram_parser.add_argument('unigrams', help='JSON object of term -> natural log probability, optionally .gz')
+    unigram_parser.add_argument('--document-length', type=int, default=300,
+                                help='Tokens per document assumed by the estimate (default: 300)')
+    for subparser in (build_parser, unigram_parser):
+        subparser.add_argument('--output', default=DEFAULT_IDF_PATH, help='Table to write (.json or .json.gz)')
+        subparser.add_argument('--max-terms', type=int, default=50000, help='Most frequent terms kept')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'build-idf':
+            table = build_idf(_documents(args.input_dir), args.max_terms, args.min_df,
+                              source=f"document frequencies of {os.path.basename(os.path.normpath(args.input_dir))}")
+        else:
+            opener = gzip.open if args.unigrams.endswith('.gz') else open
+            with opener(args.unigrams, 'rt', encoding='utf-8') as f:
+                log_probs = json.load(f)
+            table = idf_from_unigrams(log_probs, args.max_terms, args.document_length,
+                                      source=f"Poisson estimate from unigrams in {os.path.basename(args.unigrams)}, "
+                                             f"{args.document_length}-token documents")
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    table.save(args.output)
+    print(f"IDF table with {len(table)} terms written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
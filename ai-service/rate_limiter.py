@@ -0,0 +1,141 @@
+"""
+Token-bucket rate limiter for outbound search queries.
+The bucket state can live in this process or in a lock-protected file so
+that every gunicorn worker on the machine draws from the same bucket.
+"""
+import os
+import threading
+import time
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Windows: file locking via fcntl is not available
+    FCNTL_AVAILABLE = False
+
+
+class LocalBucketState:
+    """Bucket state shared by the threads of one process"""
+
+    def __init__(self, burst):
+        self._state = (float(burst), time.time())
+        self._lock = threading.Lock()
+
+    def update(self, func):
+        """Atomically replace the (tokens, timestamp) state with func(state)"""
+        with self._lock:
+            self._state, result = func(self._state)
+            return result
+
+
+class FileBucketState:
+    """Bucket state stored in a file and guarded by an exclusive flock"""
+
+    def __init__(self, path, burst):
+        self.path = path
+        self.burst = burst
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Create the file without truncating state written by other workers
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.close(fd)
+
+    def update(self, func):
+        """Atomically replace the (tokens, timestamp) state with func(state)"""
+        with self._lock, open(self.path, 'r+') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                try:
+                    tokens, timestamp = (float(v) for v in f.read().split())
+                    state = (tokens, timestamp)
+                except ValueError:
+                    state = (float(self.burst), time.time())
+                state, result = func(state)
+                f.seek(0)
+                f.write(f'{state[0]!r} {state[1]!r}')
+                f.truncate()
+                return result
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` queries per second with bursts up to `burst`"""
+
+    def __init__(self, rate, burst, state=None):
+        """
+        Initialize the token bucket
+
+        Args:
+            rate: Tokens added per second
+            burst: Maximum tokens the bucket can hold
+            state: LocalBucketState or FileBucketState (local by default)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.state = state or LocalBucketState(burst)
+
+    def _refill(self, state, now):
+        tokens, timestamp = state
+        tokens = min(self.burst, tokens + max(0.0, now - timestamp) * self.rate)
+        return tokens, now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available right now; never blocks"""
+        def take(state):
+            available, now = self._refill(state, time.time())
+            if available >= tokens:
+                return (available - tokens, now), True
+            return (available, now), False
+        return self.state.update(take)
+
+    def wait_time(self, tokens=1):
+        """Seconds until `tokens` would be available, without consuming them"""
+        def peek(state):
+            available, now = self._refill(state, time.time())
+            return (available, now), max(0.0, (tokens - available) / self.rate)
+        return self.state.update(peek)
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Block until tokens are available
+
+        Args:
+            tokens: Number of tokens to take
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+
+        Returns:
+            True if the tokens were taken, False on timeout
+        """
+        end_time = None if timeout is None else time.time() + timeout
+        while True:
+            if self.try_acquire(tokens):
+                return True
+            wait = self.wait_time(tokens)
+            if end_time is not None:
+                remaining = end_time - time.time()
+                if remaining <= 0 or wait > remaining:
+                    return False
+            # Other workers may take the tokens first; re-check after sleeping
+            time.sleep(max(wait, 0.01))
+
+
+def create_rate_limiter():
+    """
+    Create the search rate limiter configured by environment variables
+
+    SEARCH_RATE (queries/second), SEARCH_BURST, SEARCH_RATE_LIMITER
+    ('file' to share across processes, or 'local') and SEARCH_RATE_LIMITER_PATH.
+    """
+    rate = float(os.getenv('SEARCH_RATE', '0.5'))
+    burst = float(os.getenv('SEARCH_BURST', '3'))
+    backend = os.getenv('SEARCH_RATE_LIMITER', 'file').lower()
+
+    if backend == 'file':
+        if FCNTL_AVAILABLE:
+            path = os.getenv('SEARCH_RATE_LIMITER_PATH', os.path.join('cache', 'search_rate.bucket'))
+            return TokenBucket(rate, burst, FileBucketState(path, burst))
+        print("Warning: fcntl not available, search rate limiter is per-process only")
+
+    return TokenBucket(rate, burst)
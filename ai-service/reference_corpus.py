@@ -0,0 +1,321 @@
+"""
+Local reference corpus for semantic plagiarism detection without web search.
+Documents from a directory of .txt / .jsonl files are split into sentences,
+embedded once, and stored as memory-mapped float16 arrays. Small corpora are
+searched exactly; large ones get an IVF index (k-means lists stored
+contiguously) so a query only scans the closest lists.
+
+Usage:
+    python reference_corpus.py ingest <input_dir> [--output corpus] [--model all-MiniLM-L6-v2]
+                                      [--backend torch] [--index auto|exact|ivf] [--nlist N]
+
+Serve it by setting REFERENCE_CORPUS_PATH to the output directory.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import threading
+
+import numpy as np
+
+META_FILE = 'meta.json'
+EMBEDDINGS_FILE = 'embeddings.npy'
+SENTENCES_FILE = 'sentences.jsonl'
+OFFSETS_FILE = 'offsets.npy'
+DOCUMENTS_FILE = 'documents.jsonl'
+CENTROIDS_FILE = 'centroids.npy'
+LISTS_FILE = 'lists.npy'
+
+# Corpora up to this many sentences are searched exactly with index=auto
+EXACT_LIMIT = 50000
+# Rows scored per matrix product
+SEARCH_CHUNK = 65536
+
+
+def split_sentences(text, min_length=20, max_length=1000):
+    """Split a reference document into sentences worth indexing"""
+    sentences = re.split(r'(?<=[.!?])\s+', ' '.join(text.split()))
+    return [s for s in sentences if min_length <= len(s) <= max_length]
+
+
+def iter_documents(input_dir):
+    """
+    Yield {'title', 'url', 'text'} for every document under input_dir
+
+    .txt files are one document each (titled by file name); .jsonl files hold
+    one JSON object per line with 'text' (or 'content') and optional 'title'/'url'.
+    """
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if name.endswith('.txt'):
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    yield {'title': os.path.splitext(name)[0], 'url': '', 'text': f.read()}
+            elif name.endswith('.jsonl'):
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    for line_number, line in enumerate(f, 1):
+                        if not line.strip():
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            print(f"Warning: skipping invalid JSON in {path}:{line_number}")
+                            continue
+                        yield {
+                            'title': record.get('title') or os.path.splitext(name)[0],
+                            'url': record.get('url', ''),
+                            'text': record.get('text') or record.get('content') or '',
+                        }
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+class ReferenceCorpus:
+    """Memory-mapped sentence embeddings of a reference corpus with top-k search"""
+
+    def __init__(self, path, nprobe=None):
+        """
+        Open a corpus written by `reference_corpus.py ingest`
+
+        Args:
+            path: Corpus directory
+            nprobe: IVF lists scanned per query (REFERENCE_CORPUS_NPROBE, default 8)
+        """
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode='r')
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode='r')
+        with open(os.path.join(path, DOCUMENTS_FILE), encoding='utf-8') as f:
+            self.documents = [json.loads(line) for line in f]
+
+        self.centroids = None
+        self._lists = None
+        if self.meta['index'] == 'ivf':
+            self.centroids = np.load(os.path.join(path, CENTROIDS_FILE))
+            self._lists = np.load(os.path.join(path, LISTS_FILE))
+        self.nprobe = nprobe or int(os.getenv('REFERENCE_CORPUS_NPROBE', '8'))
+
+        self._sentences_file = open(os.path.join(path, SENTENCES_FILE), 'rb')
+        self._read_lock = threading.Lock()
+
+    @property
+    def encoder_name(self):
+        """Name of the encoder the corpus was embedded with"""
+        return self.meta['encoder']
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, query_embeddings, top_k=5):
+        """
+        Find the nearest corpus sentences of each query
+
+        Args:
+            query_embeddings: (m x dim) embeddings from the corpus encoder
+            top_k: Neighbours returned per query
+
+        Returns:
+            One list per query of (cosine_similarity, sentence_id), best first
+        """
+        queries = _normalize(query_embeddings)
+        if not len(self):
+            return [[] for _ in queries]
+        top_k = min(top_k, len(self))
+
+        if self.centroids is None:
+            return self._top_k(queries, [(0, len(self))], top_k)
+
+        # IVF: scan only the lists whose centroids are closest to each query
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+        results = []
+        for query, lists in zip(queries, probes):
+            ranges = [(self._lists[c], self._lists[c + 1]) for c in lists if self._lists[c] < self._lists[c + 1]]
+            results.extend(self._top_k(query[None, :], ranges, top_k))
+        return results
+
+    def _top_k(self, queries, ranges, top_k):
+        best_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        best_ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        for range_start, range_end in ranges:
+            for start in range(int(range_start), int(range_end), SEARCH_CHUNK):
+                end = min(start + SEARCH_CHUNK, int(range_end))
+                scores = queries @ np.asarray(self.embeddings[start:end], dtype=np.float32).T
+                all_scores = np.hstack([best_scores, scores])
+                all_ids = np.hstack([best_ids, np.broadcast_to(np.arange(start, end), scores.shape)])
+                keep = np.argpartition(-all_scores, top_k - 1, axis=1)[:, :top_k]
+                best_scores = np.take_along_axis(all_scores, keep, axis=1)
+                best_ids = np.take_along_axis(all_ids, keep, axis=1)
+
+        results = []
+        for scores, ids in zip(best_scores, best_ids):
+            order = np.argsort(-scores)
+            results.append([(float(scores[i]), int(ids[i])) for i in order if ids[i] >= 0])
+        return results
+
+    def sentence(self, sentence_id):
+        """Return {'text', 'title', 'url'} of a corpus sentence"""
+        start, end = int(self._offsets[sentence_id]), int(self._offsets[sentence_id + 1])
+        with self._read_lock:
+            self._sentences_file.seek(start)
+            record = json.loads(self._sentences_file.read(end - start))
+        document = self.documents[record['d']]
+        return {'text': record['t'], 'title': document.get('title', ''), 'url': document.get('url', '')}
+
+    def stats(self):
+        return {
+            'sentences': len(self),
+            'documents': len(self.documents),
+            'index': self.meta['index'],
+            'encoder': self.encoder_name,
+        }
+
+
+def _assign(vectors, centroids, chunk=8192):
+    """Index of the nearest (cosine) centroid of every vector"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        block = np.asarray(vectors[start:start + chunk], dtype=np.float32)
+        assignments[start:start + chunk] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _train_kmeans(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means centroids trained on a sample of the vectors"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * 64)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))],
+                        dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)]
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        empty = np.bincount(assignments, minlength=nlist) == 0
+        # Reseed empty lists with random sample vectors
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _write_sentences(path, records, order=None):
+    """Write sentence records as JSON lines and return their byte offsets"""
+    offsets = [0]
+    with open(path, 'wb') as f:
+        for i in (order if order is not None else range(len(records))):
+            line = (json.dumps(records[i], ensure_ascii=False) + '\n').encode('utf-8')
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    return np.array(offsets, dtype=np.int64)
+
+
+def ingest(input_dir, output_dir, model_name='all-MiniLM-L6-v2', backend=None,
+           index='auto', nlist=None, batch_size=256, encoder=None):
+    """
+    Embed every sentence under input_dir into a corpus at output_dir
+
+    encoder defaults to create_encoder(backend, model_name); any object with
+    a name and an encode(sentences) method can be passed instead.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    records = []
+    with open(os.path.join(output_dir, DOCUMENTS_FILE), 'w', encoding='utf-8') as documents:
+        document_count = 0
+        for document in iter_documents(input_dir):
+            sentences = split_sentences(document['text'])
+            if not sentences:
+                continue
+            documents.write(json.dumps({'title': document['title'], 'url': document['url']},
+                                       ensure_ascii=False) + '\n')
+            records.extend({'t': sentence, 'd': document_count} for sentence in sentences)
+            document_count += 1
+    if not records:
+        raise ValueError(f"No sentences found under {input_dir}")
+    print(f"Read {len(records)} sentences from {document_count} documents")
+
+    if encoder is None:
+        from encoder_backends import create_encoder
+        encoder = create_encoder(backend, model_name)
+    kind = index if index != 'auto' else ('exact' if len(records) <= EXACT_LIMIT else 'ivf')
+    embeddings_path = os.path.join(output_dir, EMBEDDINGS_FILE)
+    staging_path = embeddings_path + '.tmp' if kind == 'ivf' else embeddings_path
+
+    embeddings = None
+    for start in range(0, len(records), batch_size):
+        batch = _normalize(encoder.encode([r['t'] for r in records[start:start + batch_size]]))
+        if embeddings is None:
+            embeddings = np.lib.format.open_memmap(staging_path, mode='w+', dtype=np.float16,
+                                                   shape=(len(records), batch.shape[1]))
+        embeddings[start:start + len(batch)] = batch
+        print(f"  embedded {min(start + batch_size, len(records))}/{len(records)}", end='\r')
+    print()
+    embeddings.flush()
+    dimension = embeddings.shape[1]
+
+    order = None
+    if kind == 'ivf':
+        # k-means cannot pick more initial centroids than there are sentences
+        nlist = min(nlist or max(1, int(4 * math.sqrt(len(records)))), len(records))
+        print(f"Training IVF index with {nlist} lists...")
+        centroids = _train_kmeans(embeddings, nlist)
+        assignments = _assign(embeddings, centroids)
+        # Store each list contiguously so a probe reads one slice
+        order = np.argsort(assignments, kind='stable')
+        final = np.lib.format.open_memmap(embeddings_path, mode='w+', dtype=np.float16,
+                                          shape=embeddings.shape)
+        for start in range(0, len(order), SEARCH_CHUNK):
+            final[start:start + SEARCH_CHUNK] = embeddings[order[start:start + SEARCH_CHUNK]]
+        final.flush()
+        del embeddings, final
+        os.remove(staging_path)
+        np.save(os.path.join(output_dir, CENTROIDS_FILE), centroids)
+        np.save(os.path.join(output_dir, LISTS_FILE),
+                np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64))
+
+    np.save(os.path.join(output_dir, OFFSETS_FILE),
+            _write_sentences(os.path.join(output_dir, SENTENCES_FILE), records, order))
+    meta = {
+        'encoder': encoder.name,
+        'model_name': model_name,
+        'dimension': int(dimension),
+        'sentences': len(records),
+        'documents': document_count,
+        'index': kind,
+        'nlist': int(nlist) if kind == 'ivf' else None,
+    }
+    with open(os.path.join(output_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(f"Reference corpus written to {output_dir} ({kind} index)")
+    return meta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the local reference corpus')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help='Embed a directory of .txt/.jsonl documents')
+    ingest_parser.add_argument('input_dir')
+    ingest_parser.add_argument('--output', default='corpus', help='Corpus directory (default: corpus)')
+    ingest_parser.add_argument('--model', default='all-MiniLM-L6-v2', help='Sentence-Transformer model name')
+    ingest_parser.add_argument('--backend', help='Encoder backend (default: ENCODER_BACKEND or torch)')
+    ingest_parser.add_argument('--index', choices=['auto', 'exact', 'ivf'], default='auto')
+    ingest_parser.add_argument('--nlist', type=int, help='IVF lists (default: 4 * sqrt(sentences))')
+    args = parser.parse_args(argv)
+
+    try:
+        ingest(args.input_dir, args.output, args.model, args.backend, args.index, args.nlist)
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Content-addressed cache of plagiarism check results.
+Resubmissions of the same text (up to whitespace) are answered from the
+cache instead of repeating the search and match pipeline. Match spans are
+stored as offsets into the normalized text and mapped back to the text as
+submitted on every hit.
+"""
+import bisect
+import hashlib
+import os
+import re
+import threading
+
+from cache_backends import create_backend
+
+
+def normalize_text(text):
+    """Collapse whitespace the same way PlagiarismDetector.preprocess_text does"""
+    return re.sub(r'\s+', ' ', text.strip())
+
+
+class OffsetMap:
+    """Character offsets between a text and its normalize_text form"""
+
+    def __init__(self, text):
+        self._text_starts = []
+        self._normalized_starts = []
+        self._lengths = []
+        position = 0
+        for m in re.finditer(r'\S+', text):
+            self._text_starts.append(m.start())
+            self._normalized_starts.append(position)
+            self._lengths.append(m.end() - m.start())
+            position += m.end() - m.start() + 1
+
+    @staticmethod
+    def _map(offset, from_starts, to_starts, lengths):
+        # Offsets in whitespace map to the end of the preceding word
+        i = bisect.bisect_right(from_starts, offset) - 1
+        if i < 0:
+            return 0
+        return to_starts[i] + min(offset - from_starts[i], lengths[i])
+
+    def to_normalized(self, offset):
+        """Offset in the normalized text of an offset in the text"""
+        return self._map(offset, self._text_starts, self._normalized_starts, self._lengths)
+
+    def to_text(self, offset):
+        """Offset in the text of an offset in the normalized text"""
+        return self._map(offset, self._normalized_starts, self._text_starts, self._lengths)
+
+
+def _map_spans(result, convert):
+    """Copy of result with every match span passed through convert"""
+    if not result.get('matches'):
+        return dict(result)
+    matches = []
+    for match in result['matches']:
+        if match.get('span'):
+            match = dict(match, span=[convert(offset) for offset in match['span']])
+        matches.append(match)
+    return dict(result, matches=matches)
+
+
+class ResultCache:
+    """Cache detect_plagiarism results keyed by a hash of the normalized text"""
+
+    def __init__(self, backend=None, ttl=None, namespace=''):
+        """
+        Initialize the result cache
+
+        Args:
+            backend: Cache backend; defaults to one configured from RESULT_CACHE_* env vars
+            ttl: Seconds a cached result stays valid
+            namespace: Prefix that separates results of different detectors
+        """
+        if backend is None:
+            backend = create_backend(
+                os.getenv('RESULT_CACHE_BACKEND', 'memory'),
+                path=os.getenv('RESULT_CACHE_PATH') or None,
+                max_entries=int(os.getenv('RESULT_CACHE_SIZE', '1000')),
+                name='results'
+            )
+        self.backend = backend
+        self.ttl = ttl if ttl is not None else int(os.getenv('RESULT_CACHE_TTL', '86400'))
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key_for(self, text):
+        """Return the cache key for a text"""
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        return f'{self.namespace}:{digest}' if self.namespace else digest
+
+    def get(self, text):
+        """
+        Return the cached result for text, or None on a miss
+
+        Spans and text_length of the result refer to text, even when it was
+        stored for a text that differed only in whitespace.
+        """
+        try:
+            result = self.backend.get(self.key_for(text))
+        except Exception as e:
+            print(f"Warning: result cache read failed: {str(e)}")
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if result is None:
+            return None
+        result = _map_spans(result, OffsetMap(text).to_text)
+        if 'text_length' in result:
+            result['text_length'] = len(text)
+        return result
+
+    def set(self, text, result):
+        """Store the result for text, with spans as offsets into the normalized text"""
+        try:
+            stored = _map_spans(result, OffsetMap(text).to_normalized)
+            self.backend.set(self.key_for(text), stored, ttl=self.ttl)
+        except Exception as e:
+            print(f"Warning: result cache write failed: {str(e)}")
+
+    def stats(self):
+        """Return hit/miss counts for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'ttl': self.ttl,
+            }
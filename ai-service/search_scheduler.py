@@ -0,0 +1,165 @@
+"""
+Concurrent scheduler for the Enhanced detector's search strategies.
+All strategies run in parallel and share one query budget, the web
+searcher's rate limiter and one wall-clock deadline per check.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+
+class SearchScheduler:
+    """Run search strategies concurrently under a shared budget and deadline"""
+
+    def __init__(self, run_query, web_searcher=None, max_queries=None, deadline=None,
+                 max_skip_wait=None, enough_sources=5, max_workers=None):
+        """
+        Initialize the scheduler
+
+        Args:
+            run_query: Callable(query, strategy) returning a list of sources
+            web_searcher: WebSearcher whose batch memo and rate limiter are shared
+                with strategy threads
+            max_queries: Maximum search queries per check, across all strategies
+            deadline: Seconds per check after which the sources found so far are returned
+            max_skip_wait: Low-value queries are skipped when the rate limiter
+                would make them wait longer than this many seconds
+            enough_sources: Fallback strategies stop once this many sources are found
+            max_workers: Strategy threads shared by all checks
+                (SEARCH_STRATEGY_WORKERS, default 16)
+        """
+        self.run_query = run_query
+        self.web_searcher = web_searcher
+        self.max_queries = max_queries or int(os.getenv('SEARCH_QUERY_BUDGET', '12'))
+        self.deadline = deadline or float(os.getenv('SEARCH_DEADLINE', '25'))
+        self.max_skip_wait = (max_skip_wait if max_skip_wait is not None
+                              else float(os.getenv('SEARCH_SKIP_WAIT', '2')))
+        self.enough_sources = enough_sources
+        # One pool for every check: strategies past their deadline stop at their
+        # next query and free their thread instead of piling up
+        self.max_workers = max_workers or int(os.getenv('SEARCH_STRATEGY_WORKERS', '16'))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='search-strategy')
+
+    def run(self, plan):
+        """
+        Run every strategy of the plan and return the sources found
+
+        Returns:
+            List of source dictionaries, possibly partial if the deadline expired
+        """
+        return [event['source'] for event in self.iter_results(plan) if event['type'] == 'source']
+
+    def iter_results(self, plan):
+        """
+        Run the strategies concurrently, yielding results as they arrive
+
+        Yields:
+            {'type': 'source', 'strategy': name, 'source': {...}} per source found
+            {'type': 'done', 'strategy': name, 'queries': n, 'skipped': bool} per strategy
+            {'type': 'deadline', 'pending': [names]} if the deadline expired first
+        """
+        if not plan:
+            return
+
+        end_time = time.time() + self.deadline
+        events = queue.Queue()
+        state = {
+            'queries_left': self.max_queries,
+            'urls': set(),
+            'lock': threading.Lock(),
+            'closed': False,
+        }
+        memo = self.web_searcher.current_batch_memo() if self.web_searcher else None
+
+        def worker(strategy):
+            queries_run = 0
+            skipped = False
+            scope = (self.web_searcher.batch_scope(memo)
+                     if self.web_searcher is not None and memo is not None else nullcontext())
+            try:
+                with scope:
+                    print(f"\n{strategy['label']}...")
+                    for query in strategy['queries']():
+                        if state['closed'] or time.time() >= end_time:
+                            break
+                        if strategy['only_if_few_sources'] and self._found(state) >= self.enough_sources:
+                            skipped = queries_run == 0
+                            break
+                        # Local strategies cost neither budget nor rate limit tokens
+                        cached = strategy.get('local', False) or self._is_cached(query, strategy)
+                        wait = 0.0 if cached else self._rate_limit_wait()
+                        if wait >= end_time - time.time():
+                            print(f"  Rate limit wait exceeds deadline, stopping {strategy['name']}")
+                            break
+                        if strategy.get('skip_when_throttled') and wait > self.max_skip_wait:
+                            print(f"  Skipping low-value query ({wait:.1f}s rate limit wait)")
+                            continue
+                        if wait > self._max_rate_limit_wait():
+                            # The searcher would drop it anyway; keep the budget for later queries
+                            print(f"  Skipping query ({wait:.1f}s rate limit wait)")
+                            continue
+                        if not cached and not self._take_query(state):
+                            print(f"  Query budget exhausted, stopping {strategy['name']}")
+                            break
+                        queries_run += 1
+                        for source in self.run_query(query, strategy):
+                            with state['lock']:
+                                state['urls'].add(source.get('url', ''))
+                            events.put({'type': 'source', 'strategy': strategy['name'], 'source': source})
+            except Exception as e:
+                print(f"  Error in search strategy {strategy['name']}: {str(e)}")
+            finally:
+                events.put({'type': 'done', 'strategy': strategy['name'],
+                            'queries': queries_run, 'skipped': skipped})
+
+        for strategy in plan:
+            self._executor.submit(worker, strategy)
+
+        pending = {strategy['name'] for strategy in plan}
+        try:
+            while pending:
+                remaining = end_time - time.time()
+                try:
+                    event = events.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    print(f"  Search deadline of {self.deadline:.0f}s reached, "
+                          f"using sources found so far")
+                    yield {'type': 'deadline', 'pending': sorted(pending)}
+                    return
+                if event['type'] == 'done':
+                    pending.discard(event['strategy'])
+                yield event
+        finally:
+            # Strategy threads still running stop at their next query
+            state['closed'] = True
+
+    def _found(self, state):
+        with state['lock']:
+            return len(state['urls'])
+
+    def _take_query(self, state):
+        """Consume one query from the shared budget"""
+        with state['lock']:
+            if state['queries_left'] <= 0:
+                return False
+            state['queries_left'] -= 1
+            return True
+
+    def _is_cached(self, query, strategy):
+        """Cached queries cost neither budget nor rate limit tokens"""
+        if self.web_searcher is None or not hasattr(self.web_searcher, 'is_query_cached'):
+            return False
+        return self.web_searcher.is_query_cached(query, strategy['max_results'])
+
+    def _max_rate_limit_wait(self):
+        """Longest rate limit wait the web searcher accepts before dropping a query"""
+        return getattr(self.web_searcher, 'rate_limit_max_wait', float('inf'))
+
+    def _rate_limit_wait(self):
+        """Seconds the next outbound query would wait for a rate limit token"""
+        limiter = getattr(self.web_searcher, 'rate_limiter', None)
+        return limiter.wait_time() if limiter is not None else 0.0
@@ -0,0 +1,160 @@
+"""
+Sentence segmentation backends.
+'parser' runs en_core_web_sm with only the components sentence boundaries
+depend on (tok2vec and the dependency parser); 'sentencizer' is a blank
+English pipeline with spaCy's rule-based sentencizer; 'regex' needs no
+spaCy at all and handles common abbreviations and initials.
+Compare them with: python benchmark_segmenter.py
+"""
+import os
+import re
+import threading
+
+try:
+    import spacy
+    SPACY_AVAILABLE = True
+except ImportError:
+    SPACY_AVAILABLE = False
+
+BACKENDS = ('parser', 'sentencizer', 'regex')
+
+# en_core_web_sm components that do not affect doc.sents
+PARSER_EXCLUDE = ['tagger', 'attribute_ruler', 'lemmatizer', 'ner']
+
+# Abbreviations that are not expected to end a sentence
+ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'st', 'mt', 'rev', 'gen', 'col', 'lt', 'sgt', 'capt',
+    'vs', 'cf', 'approx', 'dept', 'fig', 'figs', 'eq', 'nos', 'vol', 'vols',
+    'pp', 'ch', 'eds', 'ave', 'blvd', 'rd',
+    'jan', 'feb', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+    'e.g', 'i.e',
+}
+
+# Abbreviations that often end a sentence; like initials and other dotted forms,
+# they only continue it when the next word is not a common sentence opener
+FINAL_ABBREVIATIONS = {
+    'etc', 'al', 'inc', 'ltd', 'co', 'corp', 'bros', 'jr', 'sr',
+    'u.s', 'u.k', 'a.m', 'p.m', 'ph.d', 'b.c', 'a.d',
+}
+
+# Capitalized words that usually begin a new sentence rather than continue a name
+SENTENCE_STARTERS = {
+    'a', 'after', 'also', 'although', 'an', 'and', 'as', 'at', 'because', 'before', 'both', 'but', 'by',
+    'during', 'each', 'finally', 'first', 'for', 'from', 'he', 'her', 'his', 'how', 'however', 'i', 'if',
+    'in', 'it', 'its', 'later', 'many', 'meanwhile', 'most', 'my', 'no', 'now', 'on', 'one', 'our',
+    'she', 'since', 'so', 'some', 'still', 'that', 'the', 'their', 'then', 'there', 'these', 'they',
+    'this', 'those', 'thus', 'today', 'we', 'what', 'when', 'where', 'while', 'who', 'why', 'yet', 'you',
+}
+
+# Terminal punctuation, optional closing quotes/brackets, then whitespace
+_BOUNDARY = re.compile(r'([.!?]+)([\'"’”)\]]*)\s+')
+_DOTTED_INITIALS = re.compile(r'(?:[a-z]\.)+[a-z]')
+_INITIAL = re.compile(r'[A-Z]\.')
+
+
+class RegexSegmenter:
+    """Rule-based splitter on terminal punctuation that skips abbreviations and initials"""
+
+    name = 'regex'
+
+    def split(self, text):
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(text):
+            next_char = text[match.end():match.end() + 1]
+            # A lowercase continuation means the punctuation did not end the sentence
+            if next_char.islower():
+                continue
+            if match.group(1) == '.' and self._is_abbreviation(text, match.start(1), match.end()):
+                continue
+            sentence = text[start:match.end(2)].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        tail = text[start:].strip()
+        if tail:
+            sentences.append(tail)
+        return sentences
+
+    def split_many(self, texts):
+        return [self.split(text) for text in texts]
+
+    def _is_abbreviation(self, text, dot, next_start):
+        word_start = dot
+        while word_start > 0 and not text[word_start - 1].isspace():
+            word_start -= 1
+        word = text[word_start:dot].lstrip('(["\'').lower()
+        if not word:
+            return False
+        if word in ABBREVIATIONS:
+            return True
+        # Initials ("J. Smith"), dotted forms ("U.S.") and FINAL_ABBREVIATIONS
+        # end the sentence when a common sentence opener follows ("vitamin A. It")
+        if not (word in FINAL_ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+                or _DOTTED_INITIALS.fullmatch(word)):
+            return False
+        following = text[next_start:].split(maxsplit=1)
+        next_word = following[0] if following else ''
+        if _INITIAL.fullmatch(next_word):
+            return True  # a run of initials ("J. R. R. Tolkien")
+        return next_word.strip('\'"‘“([').rstrip('.,;:!?').lower() not in SENTENCE_STARTERS
+
+
+class SpacySegmenter:
+    """spaCy pipeline reduced to what doc.sents needs"""
+
+    def __init__(self, mode='parser', model='en_core_web_sm', batch_size=None):
+        """
+        Args:
+            mode: 'parser' (dependency-based boundaries) or 'sentencizer' (rule-based)
+            model: spaCy model loaded for 'parser'
+            batch_size: Texts per nlp.pipe batch (SEGMENTER_BATCH_SIZE, default 64)
+        """
+        if not SPACY_AVAILABLE:
+            raise ImportError("spaCy is not installed")
+        self.name = mode
+        if mode == 'parser':
+            self.nlp = spacy.load(model, exclude=PARSER_EXCLUDE)
+        else:
+            self.nlp = spacy.blank('en')
+            self.nlp.add_pipe('sentencizer')
+        self.batch_size = batch_size or int(os.getenv('SEGMENTER_BATCH_SIZE', '64'))
+        # spaCy pipelines are not documented as thread-safe; job workers share this one
+        self._lock = threading.Lock()
+
+    def split(self, text):
+        with self._lock:
+            return self._sentences(self.nlp(text))
+
+    def split_many(self, texts):
+        with self._lock:
+            return [self._sentences(doc) for doc in self.nlp.pipe(texts, batch_size=self.batch_size)]
+
+    def _sentences(self, doc):
+        return [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+
+
+def create_segmenter(backend=None):
+    """
+    Create the sentence segmenter for a backend
+
+    Args:
+        backend: 'parser', 'sentencizer' or 'regex' (SEGMENTER, default 'parser')
+
+    Falls back to the next lighter backend when spaCy or its model is missing.
+    """
+    backend = (backend or os.getenv('SEGMENTER', 'parser')).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown segmenter '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    for candidate in BACKENDS[BACKENDS.index(backend):]:
+        if candidate == 'regex':
+            break
+        try:
+            segmenter = SpacySegmenter(candidate)
+            print(f"Using spaCy sentence segmenter ({candidate})")
+            return segmenter
+        except (ImportError, OSError) as e:
+            print(f"Warning: could not load {candidate} segmenter: {str(e)}")
+    print("Using regex sentence segmenter")
+    return RegexSegmenter()
@@ -0,0 +1,71 @@
+"""
+Embedding-based paraphrase matching.
+Input sentences and source sentences are encoded in batches, normalized, and
+compared with one matrix product per source, so reworded sentences that share
+few words with the source are still reported.
+"""
+import os
+import numpy as np
+
+
+class SemanticMatcher:
+    """Find input sentences that paraphrase a source sentence"""
+
+    def __init__(self, encode, model_name, threshold=None, max_source_sentences=None):
+        """
+        Args:
+            encode: Callable mapping a list of strings to an (n x dim) array
+            model_name: Name of the encoder, used to key cached embeddings
+            threshold: Minimum cosine similarity for a paraphrase match
+                (SEMANTIC_MATCH_THRESHOLD, default 0.80)
+            max_source_sentences: Sentences encoded per source page
+                (SEMANTIC_MAX_SOURCE_SENTENCES, default 100)
+        """
+        self._encode = encode
+        self.model_name = model_name
+        self.threshold = (threshold if threshold is not None
+                          else float(os.getenv('SEMANTIC_MATCH_THRESHOLD', '0.80')))
+        self.max_source_sentences = (max_source_sentences
+                                     or int(os.getenv('SEMANTIC_MAX_SOURCE_SENTENCES', '100')))
+
+    @property
+    def key(self):
+        """Cache key for embeddings produced by this matcher"""
+        return (self.model_name, self.max_source_sentences)
+
+    def encode(self, sentences):
+        """Encode sentences in one batch and L2-normalize the rows"""
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+        embeddings = np.asarray(self._encode(list(sentences)), dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def match(self, sentence_embeddings, document):
+        """
+        Compare input sentence embeddings with every sentence of a source
+
+        Args:
+            sentence_embeddings: Normalized (n x dim) embeddings of the input sentences
+            document: SourceDocument of the source
+
+        Returns:
+            List of (input_index, similarity, source_sentence) for input
+            sentences whose best cosine similarity reaches the threshold
+        """
+        if sentence_embeddings is None or not len(sentence_embeddings):
+            return []
+        source_embeddings = document.sentence_embeddings(self)
+        if not len(source_embeddings):
+            return []
+
+        # Rows are unit vectors, so one matmul gives every cosine similarity
+        similarities = sentence_embeddings @ source_embeddings.T
+        best = similarities.argmax(axis=1)
+        best_scores = similarities[np.arange(len(best)), best]
+
+        sentences = document.sentences
+        return [
+            (i, float(best_scores[i]), sentences[best[i]])
+            for i in np.flatnonzero(best_scores >= self.threshold)
+        ]
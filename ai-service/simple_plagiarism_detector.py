@@ -34,6 +34,9 @@ class SimplePlagiarismDetector:
         repetition = 1.0 - (len(set(sentences)) / len(sentences))
         return (uniformity * 0.5) + (repetition * 0.5)
 
+    def detect_plagiarism_batch(self, texts):
+        return [self.detect_plagiarism(text) for text in texts]
+
     def detect_plagiarism(self, text):
         sentences = self._split_sentences(text)
         tokens = self._tokenize(text)
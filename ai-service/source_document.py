@@ -0,0 +1,98 @@
+"""
+Pre-normalized representation of a fetched source page.
+Every view of the source that the matchers need is computed once, lazily,
+and reused for all sentences and phrases of every check against that page.
+"""
+import re
+import string
+
+from fingerprint import normalize_with_offsets
+from minhash import LSHIndex
+
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+
+class SourceDocument:
+    """Normalized text, sentences, word set and fingerprints of one source"""
+
+    def __init__(self, content, url='', title=''):
+        self.content = content or ''
+        self.url = url
+        self.title = title
+        self._cache = {}
+
+    @classmethod
+    def for_source(cls, source):
+        """
+        Return the SourceDocument of a search result, building it on first use
+
+        The document is stored on the source dictionary under 'document', and
+        WebSearcher attaches the one cached with the page.
+        """
+        document = source.get('document')
+        if document is None or document.content != source.get('content', ''):
+            document = cls(source.get('content', ''), source.get('url', ''),
+                           source.get('title', 'Unknown'))
+            source['document'] = document
+        return document
+
+    def _lazy(self, name, compute):
+        value = self._cache.get(name)
+        if value is None:
+            value = compute()
+            self._cache[name] = value
+        return value
+
+    @property
+    def lower(self):
+        """Lowercased source text"""
+        return self._lazy('lower', self.content.lower)
+
+    @property
+    def normalized(self):
+        """Lowercased text with whitespace collapsed"""
+        return self._lazy('normalized', lambda: ' '.join(self.lower.split()))
+
+    @property
+    def clean(self):
+        """Lowercased text with punctuation removed"""
+        return self._lazy('clean', lambda: self.lower.translate(_PUNCTUATION_TABLE))
+
+    @property
+    def sentences(self):
+        """Lowercased source sentences of at least 10 characters"""
+        return self._lazy('sentences', lambda: [
+            sentence for sentence in re.split(r'[.!?]+\s+', self.lower)
+            if len(sentence) >= 10
+        ])
+
+    @property
+    def words(self):
+        """Set of lowercased whitespace-separated words"""
+        return self._lazy('words', lambda: set(self.lower.split()))
+
+    @property
+    def fingerprint_text(self):
+        """Lowercase alphanumeric text used for k-gram fingerprints"""
+        return self._lazy('fingerprint_text', lambda: normalize_with_offsets(self.content)[0])
+
+    def fingerprints(self, fingerprinter):
+        """Winnowed (hash, position) fingerprints of fingerprint_text"""
+        return self._lazy(('fingerprints', fingerprinter.k, fingerprinter.w), lambda: fingerprinter.winnow(
+            fingerprinter.kgram_hashes(self.fingerprint_text)
+        ))
+    
+    def sentence_index(self, minhasher, bands):
+        """LSHIndex over the MinHash signatures of sentences (item ids index sentences)"""
+        def build():
+            index = LSHIndex(minhasher.num_perm, bands)
+            for sentence in self.sentences:
+                index.add(minhasher.compute(sentence))
+            return index
+        return self._lazy(('sentence_index', minhasher.key, bands), build)
+    
+    def sentence_embeddings(self, semantic_matcher):
+        """Normalized embeddings of the first sentences, encoded by a SemanticMatcher"""
+        return self._lazy(('sentence_embeddings', semantic_matcher.key), lambda: semantic_matcher.encode(
+            self.sentences[:semantic_matcher.max_source_sentences]
+        ))
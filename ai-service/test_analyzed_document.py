@@ -0,0 +1,99 @@
+"""
+Tests for the analyzed form of a submitted text
+Run with: pytest test_analyzed_document.py
+"""
+import re
+
+import numpy as np
+
+from analyzed_document import AnalyzedDocument
+from segmenter import RegexSegmenter
+from text_matcher import TextMatcher
+
+TEXT = "  Photosynthesis   converts light.\nPlants  grow fast!  Do they?  Yes, e.g. in spring  "
+
+
+class _Encoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, sentences):
+        self.calls.append(list(sentences))
+        return np.ones((len(sentences), 3), dtype=np.float32)
+
+
+def _document(text=TEXT, **options):
+    return AnalyzedDocument(text, RegexSegmenter().split, **options)
+
+
+def test_tokens_keep_their_offsets():
+    document = _document()
+    assert all(TEXT[start:end] == word for word, start, end in document.tokens)
+    assert document.normalized == ' '.join(TEXT.split())
+    assert document.lower_words[0] == 'photosynthesis'
+
+
+def test_sentence_spans_point_into_the_original_text():
+    document = _document()
+    assert document.sentences
+    for sentence, (start, end) in zip(document.sentences, document.sentence_spans):
+        assert ' '.join(TEXT[start:end].split()) == sentence
+
+
+def test_sentences_missing_from_the_text_have_no_span():
+    document = _document(sentences=["Photosynthesis converts light.", "Not in the text."])
+    assert document.sentence_spans[0] == (2, TEXT.index('light.') + len('light.'))
+    assert document.sentence_spans[1] == (-1, -1)
+    assert 'segment' not in document.timings
+
+
+def test_query_fragments_ignore_the_segmenter():
+    def one_sentence(text):
+        return [text]
+
+    document = AnalyzedDocument(TEXT, one_sentence)
+    assert document.sentences == [document.normalized]
+    assert document.query_fragments == re.split(r'[.!?]+', TEXT)
+    assert document.query_fragments is document.query_fragments
+
+
+def test_embeddings_are_encoded_once_on_first_use():
+    encoder = _Encoder()
+    document = _document(encode=encoder)
+    assert encoder.calls == []
+    assert document.embeddings.shape == (len(document.sentences), 3)
+    assert document.embeddings is document.embeddings
+    assert encoder.calls == [document.sentences]
+    assert 'embed' in document.timings
+
+
+def test_precomputed_embeddings_are_not_recomputed():
+    encoder = _Encoder()
+    embeddings = np.zeros((2, 3))
+    document = _document(encode=encoder, sentences=["One.", "Two."], embeddings=embeddings)
+    assert document.embeddings is embeddings
+    assert encoder.calls == []
+
+
+def test_no_encoder_or_no_sentences_means_no_embeddings():
+    assert _document().embeddings is None
+    encoder = _Encoder()
+    assert _document("   ", encode=encoder).embeddings is None
+    assert encoder.calls == []
+
+
+def test_matcher_tables_match_a_fresh_prepare():
+    matcher = TextMatcher()
+    document = _document()
+    sentences, phrases = document.matcher_tables(matcher)
+    assert document.matcher_tables(matcher)[0] is sentences
+    expected_sentences, expected_phrases = matcher.prepare(TEXT)
+    assert list(sentences) == list(expected_sentences)
+    assert list(phrases) == list(expected_phrases)
+
+
+def test_timing_summary_lists_each_stage():
+    document = _document()
+    with document.timed('search'):
+        pass
+    assert re.fullmatch(r'tokenize \d+ms, segment \d+ms, search \d+ms', document.timing_summary())
@@ -0,0 +1,101 @@
+"""
+Tests for the cross-request sentence embedding cache
+Run with: pytest test_embedding_cache.py
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def prefix():
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, 'cache', 'embeddings')
+    shutil.rmtree(directory)
+
+
+def _vectors(*values, dim=4):
+    return np.array([[value] * dim for value in values], dtype=np.float32)
+
+
+def _cached(cache, sentences):
+    return [vector is not None for vector in cache.get_many(sentences)]
+
+
+def test_round_trip_and_key_normalization():
+    cache = EmbeddingCache('model-a', max_entries=10, dtype='float32')
+    cache.put_many(["A  short sentence.", "Another one."], _vectors(0.5, -1.0))
+
+    hit, miss, other = cache.get_many([" A short\nsentence. ", "Unseen.", "Another one."])
+    assert hit.dtype == np.float32 and np.array_equal(hit, _vectors(0.5)[0])
+    assert miss is None
+    assert np.array_equal(other, _vectors(-1.0)[0])
+    # Another model never shares entries
+    assert EmbeddingCache('model-b').key_for("Another one.") != cache.key_for("Another one.")
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache('model', max_entries=3)
+    cache.put_many(['a', 'b', 'c'], _vectors(1, 2, 3))
+    cache.get_many(['a'])
+    cache.put_many(['d'], _vectors(4))
+
+    assert _cached(cache, ['a', 'b', 'c', 'd']) == [True, False, True, True]
+    assert cache.get_many(['d'])[0][0] == 4
+    assert cache.stats()['entries'] == 3
+
+
+def test_rewriting_an_entry_refreshes_it_without_growing():
+    cache = EmbeddingCache('model', max_entries=2)
+    cache.put_many(['a', 'b'], _vectors(1, 2))
+    cache.put_many(['a'], _vectors(5))
+    cache.put_many(['c'], _vectors(3))
+
+    assert _cached(cache, ['a', 'b', 'c']) == [True, False, True]
+    assert cache.get_many(['a'])[0][0] == 5
+
+
+def test_memmap_cache_survives_a_restart(prefix):
+    cache = EmbeddingCache('model', max_entries=4, path=prefix)
+    vectors = np.random.RandomState(0).randn(3, 8).astype(np.float32)
+    cache.put_many(['one', 'two', 'three'], vectors)
+
+    reloaded = EmbeddingCache('model', max_entries=4, path=prefix)
+    assert reloaded.stats()['entries'] == 3
+    for sentence, expected in zip(['one', 'two', 'three'], vectors):
+        np.testing.assert_allclose(reloaded.get_many([sentence])[0], expected, rtol=1e-3, atol=1e-3)
+
+
+def test_reloaded_entries_are_evicted_in_slot_order(prefix):
+    EmbeddingCache('model', max_entries=2, path=prefix).put_many(['one', 'two'], _vectors(1, 2))
+
+    reloaded = EmbeddingCache('model', max_entries=2, path=prefix)
+    reloaded.put_many(['three'], _vectors(3))
+    assert _cached(reloaded, ['one', 'two', 'three']) == [False, True, True]
+
+    # The eviction is persisted too
+    assert _cached(EmbeddingCache('model', max_entries=2, path=prefix), ['one', 'three']) == [False, True]
+
+
+def test_changed_settings_start_an_empty_cache(prefix):
+    EmbeddingCache('model', max_entries=4, path=prefix).put_many(['one'], _vectors(1))
+    assert EmbeddingCache('model', max_entries=8, path=prefix).stats()['entries'] == 0
+    assert EmbeddingCache('model', max_entries=4, dtype='float32', path=prefix).stats()['entries'] == 0
+
+
+def test_new_dimension_drops_old_entries():
+    cache = EmbeddingCache('model', max_entries=4)
+    cache.put_many(['one'], _vectors(1, dim=4))
+    cache.put_many(['two'], _vectors(2, dim=6))
+    assert _cached(cache, ['one', 'two']) == [False, True]
+
+
+def test_unsupported_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        EmbeddingCache('model', dtype='int8')
@@ -0,0 +1,80 @@
+"""
+Parity test for the ONNX / int8 encoder backends against the float PyTorch model
+Run after export_encoder.py with: pytest test_encoder_parity.py
+Backends that are not installed or not exported are skipped.
+"""
+import numpy as np
+import pytest
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+SENTENCES = [
+    "Photosynthesis converts light energy into chemical energy in plants.",
+    "Plants turn sunlight into chemical energy through photosynthesis.",
+    "The French Revolution began in 1789 and ended with Napoleon's coup.",
+    "Hypertension is a long-term condition of elevated blood pressure.",
+    "High blood pressure is a major risk factor for stroke.",
+    "My cat sleeps all day long on the couch.",
+    "It is important to note that the results were inconclusive.",
+    "The Great Barrier Reef lies off the coast of Queensland, Australia.",
+    "Quantum chromodynamics describes the strong interaction between quarks and gluons.",
+    "A short one.",
+]
+
+# Maximum absolute difference of any pairwise cosine similarity from the float model
+TOLERANCE = {'onnx': 1e-3, 'int8': 0.05}
+
+_float_embeddings = None
+
+
+def _normalized(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def _reference():
+    """Embeddings of SENTENCES from the float PyTorch model"""
+    global _float_embeddings
+    if _float_embeddings is None:
+        try:
+            from encoder_backends import TorchEncoder
+            _float_embeddings = _normalized(TorchEncoder(MODEL_NAME).encode(SENTENCES))
+        except ImportError as e:
+            pytest.skip(f"PyTorch model not available: {e}")
+    return _float_embeddings
+
+
+def _backend(backend):
+    try:
+        from encoder_backends import OnnxEncoder
+        return OnnxEncoder(MODEL_NAME, quantized=backend == 'int8')
+    except (ImportError, FileNotFoundError) as e:
+        pytest.skip(f"{backend} encoder not available: {e}")
+
+
+def _check_parity(backend):
+    reference = _reference()
+    embeddings = _normalized(_backend(backend).encode(SENTENCES))
+    assert embeddings.shape == reference.shape
+
+    difference = np.abs(embeddings @ embeddings.T - reference @ reference.T).max()
+    print(f"   {backend}: max cosine similarity difference {difference:.5f}")
+    assert difference <= TOLERANCE[backend]
+
+    # Each sentence must stay closest to its own float embedding
+    assert (np.argmax(embeddings @ reference.T, axis=1) == np.arange(len(SENTENCES))).all()
+
+
+def test_onnx_matches_float_model():
+    _check_parity('onnx')
+
+
+def test_int8_matches_float_model():
+    _check_parity('int8')
+
+
+def test_batches_match_single_sentences():
+    encoder = _backend('onnx')
+    batched = encoder.encode(SENTENCES, batch_size=4)
+    single = np.vstack([encoder.encode([sentence]) for sentence in SENTENCES])
+    assert np.abs(batched - single).max() < 1e-4
@@ -0,0 +1,115 @@
+"""
+Tests for the micro-batching encoder service
+Run with: pytest test_encoder_service.py
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import numpy as np
+import pytest
+
+from encoder_service import EncoderService
+
+
+class _Encoder:
+    """Encodes a sentence as [len, first char code]; records every batch"""
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+        self._lock = threading.Lock()
+
+    def __call__(self, sentences):
+        with self._lock:
+            self.batches.append(list(sentences))
+        if self.gate is not None:
+            self.gate.wait()
+        return np.array([[len(s), ord(s[0])] for s in sentences], dtype=np.float32)
+
+
+def _expected(sentences):
+    return np.array([[len(s), ord(s[0])] for s in sentences], dtype=np.float32)
+
+
+def _encode_concurrently(service, requests):
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        return list(pool.map(service.encode, requests))
+
+
+def test_concurrent_callers_share_one_batch():
+    encoder = _Encoder()
+    service = EncoderService(encoder, max_batch_size=100, max_wait_ms=200)
+    requests = [[f"sentence {i}", f"{i} more words"] for i in range(8)]
+
+    results = _encode_concurrently(service, requests)
+    for sentences, result in zip(requests, results):
+        assert np.array_equal(result, _expected(sentences))
+    assert len(encoder.batches) <= 2
+    assert service.stats()['requests'] == 8
+
+
+def test_full_batch_is_encoded_without_waiting():
+    encoder = _Encoder()
+    service = EncoderService(encoder, max_batch_size=4, max_wait_ms=5000)
+    started = time.time()
+    results = _encode_concurrently(service, [["a1", "a2"], ["b1", "b2"]])
+    assert time.time() - started < 2
+    assert [len(result) for result in results] == [2, 2]
+
+
+def test_shared_sentences_are_encoded_once():
+    encoder = _Encoder()
+    service = EncoderService(encoder, max_batch_size=100, max_wait_ms=200)
+    results = _encode_concurrently(service, [["same", "left"], ["same", "right"], ["same"]])
+    assert sorted(s for batch in encoder.batches for s in batch) == ["left", "right", "same"]
+    assert np.array_equal(results[2], _expected(["same"]))
+
+
+def test_caller_times_out_instead_of_waiting_forever():
+    gate = threading.Event()
+    encoder = _Encoder(gate)
+    service = EncoderService(encoder, max_wait_ms=0, timeout=0.2)
+    try:
+        started = time.time()
+        with pytest.raises(TimeoutError):
+            service.encode(["stuck"])
+        assert time.time() - started < 1
+    finally:
+        gate.set()
+
+
+def test_requests_that_timed_out_in_the_queue_are_not_encoded():
+    gate = threading.Event()
+    encoder = _Encoder(gate)
+    service = EncoderService(encoder, max_wait_ms=0, timeout=0.2)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        first = pool.submit(service.encode, ["first"])
+        time.sleep(0.05)
+        # Queued behind the stuck batch
+        with pytest.raises(TimeoutError):
+            service.encode(["second"])
+        gate.set()
+        with pytest.raises(TimeoutError):
+            first.result()
+
+    assert np.array_equal(service.encode(["third"]), _expected(["third"]))
+    assert encoder.batches == [["first"], ["third"]]
+
+
+def test_encode_errors_reach_every_caller():
+    def failing(sentences):
+        raise RuntimeError("model crashed")
+
+    service = EncoderService(failing, max_batch_size=100, max_wait_ms=100)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(service.encode, [f"sentence {i}"]) for i in range(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=5)
+
+
+def test_empty_request_bypasses_the_queue():
+    service = EncoderService(lambda sentences: np.zeros((0, 2)))
+    assert service.encode([]).shape == (0, 2)
+    assert service._thread is None
@@ -0,0 +1,116 @@
+"""
+Tests for the background job queue and its shared job store
+Run with: pytest test_job_queue.py
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pytest
+
+from cache_backends import MemoryCacheBackend, SQLiteCacheBackend
+from job_queue import JobQueue, QueueFullError
+from text_matcher import TextMatcher
+
+
+def _wait_for(queue, job_id, status, timeout=5):
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        job = queue.get(job_id)
+        if job and job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}: {queue.get(job_id)}")
+
+
+def test_status_moves_from_queued_to_running_to_finished():
+    queue = JobQueue(max_workers=1, store=MemoryCacheBackend())
+    release = threading.Event()
+    blocker = queue.submit(release.wait, 5)
+    job_id = queue.submit(lambda x: {'value': x * 2}, 21)
+
+    assert queue.get(job_id)['status'] == 'queued'
+    running = _wait_for(queue, blocker, 'running')
+    assert running['started_at'] is not None and running['finished_at'] is None
+
+    release.set()
+    job = _wait_for(queue, job_id, 'finished')
+    assert job['result'] == {'value': 42}
+    assert job['error'] is None
+    assert job['submitted_at'] <= job['started_at'] <= job['finished_at']
+
+
+def test_failed_job_records_the_error():
+    queue = JobQueue(max_workers=1, store=MemoryCacheBackend())
+
+    def fail():
+        raise ValueError("no sources")
+
+    job = _wait_for(queue, queue.submit(fail), 'failed')
+    assert job['error'] == "no sources"
+    assert job['result'] is None
+    assert queue.stats()['jobs']['failed'] == 1
+
+
+def test_unknown_job_id_is_none():
+    assert JobQueue(max_workers=1, store=MemoryCacheBackend()).get('no-such-job') is None
+
+
+def test_full_queue_rejects_submissions_until_a_job_finishes():
+    queue = JobQueue(max_workers=1, max_queue=2, store=MemoryCacheBackend())
+    release = threading.Event()
+    first = queue.submit(release.wait, 5)
+    queue.submit(release.wait, 5)
+    with pytest.raises(QueueFullError):
+        queue.submit(release.wait, 5)
+    assert queue.stats()['active'] == 2
+
+    release.set()
+    _wait_for(queue, first, 'finished')
+    end_time = time.time() + 5
+    while queue.stats()['active'] and time.time() < end_time:
+        time.sleep(0.01)
+    queue.submit(lambda: None)
+
+
+def test_finished_jobs_expire_after_the_result_ttl():
+    queue = JobQueue(max_workers=1, result_ttl=0.2, store=MemoryCacheBackend())
+    job_id = queue.submit(lambda: 'done')
+    _wait_for(queue, job_id, 'finished')
+    time.sleep(0.3)
+    assert queue.get(job_id) is None
+
+
+def test_jobs_are_visible_to_every_worker_sharing_the_store():
+    # Two queues on one SQLite file stand in for two gunicorn workers
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'jobs.sqlite3')
+        worker_a = JobQueue(max_workers=1, store=SQLiteCacheBackend(path, table='jobs'))
+        worker_b = JobQueue(max_workers=1, store=SQLiteCacheBackend(path, table='jobs'))
+        job_id = worker_a.submit(lambda: {'plagiarism_percentage': 12.5})
+        assert _wait_for(worker_b, job_id, 'finished')['result'] == {'plagiarism_percentage': 12.5}
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_concurrent_jobs_sharing_a_matcher_give_serial_results():
+    source = {'url': 'http://x', 'title': 'X', 'content': (
+        "Photosynthesis converts light energy into chemical energy stored in glucose. "
+        "Chlorophyll absorbs mostly blue and red light and reflects green light.")}
+    texts = [
+        "Plants are green. Chlorophyll absorbs mostly blue and red light and reflects green light.",
+        "Photosynthesis converts light energy into chemical energy stored in glucose, scientists say.",
+        "My weekend was relaxing and I spent most of it reading novels at home.",
+    ] * 4
+    matcher = TextMatcher()
+    expected = [matcher.find_matches(text, [dict(source)]) for text in texts]
+
+    queue = JobQueue(max_workers=4, store=MemoryCacheBackend())
+    job_ids = [queue.submit(matcher.find_matches, text, [dict(source)]) for text in texts]
+    results = [_wait_for(queue, job_id, 'finished')['result'] for job_id in job_ids]
+    for result, serial in zip(results, expected):
+        assert result['matches'] == serial['matches']
+        assert result['total_plagiarism'] == serial['total_plagiarism']
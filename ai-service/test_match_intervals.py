@@ -0,0 +1,93 @@
+"""
+Tests for the interval helpers that merge and look up matched text ranges
+Run with: pytest test_match_intervals.py
+"""
+import random
+
+from text_matcher import TextMatcher, _covered_length, _IntervalCover
+
+
+def _match(position, length, similarity, match_type='exact'):
+    return {'text': 'x' * length, 'position': position, 'end': position + length,
+            'similarity': similarity, 'match_type': match_type}
+
+
+def test_covered_length_counts_overlaps_once():
+    assert _covered_length([(0, 10), (5, 15)]) == 15
+    assert _covered_length([(5, 15), (0, 10), (2, 4)]) == 15
+
+
+def test_covered_length_merges_touching_ranges():
+    assert _covered_length([(0, 10), (10, 20)]) == 20
+    assert _covered_length([(0, 10), (11, 20)]) == 19
+
+
+def test_covered_length_ignores_empty_ranges():
+    assert _covered_length([]) == 0
+    assert _covered_length([(5, 5), (8, 3)]) == 0
+
+
+def test_covered_length_matches_a_character_count():
+    rng = random.Random(3)
+    for _ in range(200):
+        intervals = [(start, start + rng.randint(0, 15)) for start in
+                     (rng.randint(0, 80) for _ in range(rng.randint(0, 12)))]
+        expected = len({i for start, end in intervals for i in range(start, end)})
+        assert _covered_length(intervals) == expected
+
+
+def test_remove_overlaps_keeps_the_higher_similarity():
+    low, high = _match(0, 20, 70.0, 'partial'), _match(10, 20, 100.0)
+    assert TextMatcher()._remove_overlaps([low, high]) == [high]
+    assert TextMatcher()._remove_overlaps([high, _match(5, 10, 80.0, 'partial')]) == [high]
+
+
+def test_remove_overlaps_keeps_touching_matches():
+    first, second = _match(0, 10, 90.0), _match(10, 10, 80.0)
+    assert TextMatcher()._remove_overlaps([second, first]) == [first, second]
+
+
+def test_remove_overlaps_result_never_overlaps():
+    rng = random.Random(4)
+    for _ in range(200):
+        matches = [_match(rng.randint(0, 100), rng.randint(1, 30), rng.randint(50, 100))
+                   for _ in range(rng.randint(0, 10))]
+        kept = TextMatcher()._remove_overlaps(matches)
+        assert all(a['end'] <= b['position'] for a, b in zip(kept, kept[1:]))
+
+
+def test_interval_cover_containment():
+    cover = _IntervalCover([(10, 20), (30, 40)])
+    assert cover.covers(10, 20)
+    assert cover.covers(12, 18)
+    assert not cover.covers(5, 15)
+    assert not cover.covers(15, 35)
+
+
+def test_interval_cover_does_not_join_touching_or_overlapping_ranges():
+    # A range is covered only if it lies inside one interval
+    cover = _IntervalCover([(0, 10), (10, 20), (15, 30)])
+    assert cover.covers(0, 10) and cover.covers(10, 20) and cover.covers(15, 30)
+    assert not cover.covers(5, 15)
+    assert not cover.covers(12, 25)
+
+
+def test_interval_cover_drops_contained_intervals():
+    cover = _IntervalCover([(12, 14), (30, 35), (10, 20)])
+    cover.add(5, 40)
+    assert cover._starts == [5] and cover._ends == [40]
+    cover.add(6, 8)
+    assert cover._starts == [5]
+
+
+def test_interval_cover_matches_brute_force():
+    rng = random.Random(5)
+    for _ in range(100):
+        intervals = [(start, start + rng.randint(1, 20)) for start in
+                     (rng.randint(0, 60) for _ in range(rng.randint(1, 10)))]
+        cover = _IntervalCover(intervals)
+        for _ in range(30):
+            start = rng.randint(0, 80)
+            end = start + rng.randint(1, 20)
+            expected = any(s <= start and end <= e for s, e in intervals)
+            assert cover.covers(start, end) == expected
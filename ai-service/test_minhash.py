@@ -0,0 +1,132 @@
+"""
+Tests for the MinHash/LSH candidate filter used by TextMatcher fuzzy scoring
+Run with: pytest test_minhash.py
+"""
+import random
+from difflib import SequenceMatcher
+
+from minhash import LSHIndex, MinHasher, estimate_jaccard
+from source_document import SourceDocument
+from text_matcher import TextMatcher
+
+SOURCE = (
+    "Photosynthesis is the process used by plants, algae and certain bacteria to convert light energy "
+    "into chemical energy. The process takes place mainly in the leaves of green plants. Chlorophyll "
+    "absorbs light most strongly in the blue and red wavelengths. Oxygen is released as a by-product of "
+    "the light-dependent reactions. The Calvin cycle fixes carbon dioxide into three-carbon sugars. "
+    "The French Revolution was a period of political and societal change in France that began in 1789. "
+    "Many of its ideas are considered fundamental principles of liberal democracy. It ended with the "
+    "coup of Napoleon Bonaparte in November 1799. The storming of the Bastille became a symbol of the "
+    "uprising against royal authority. Hypertension is a long-term condition in which the blood pressure "
+    "in the arteries is persistently elevated. High blood pressure usually does not cause symptoms but "
+    "is a major risk factor for stroke and heart failure. Lifestyle changes such as reducing salt intake "
+    "and regular exercise can lower blood pressure. The Great Barrier Reef is the largest coral reef "
+    "system in the world and lies off the coast of Queensland. Rising sea temperatures cause coral "
+    "bleaching, which threatens the health of the whole reef ecosystem."
+)
+
+FILLER = ("the a of and in to is was for with that this however therefore quickly several important "
+          "student essay results people often during between system change light water").split()
+
+# Recall required of the default filter for pairs SequenceMatcher scores >= partial_threshold
+MIN_RECALL = 0.95
+
+
+def _perturbed_fragments(sentences, count, seed=7):
+    """Lowercased windows of source sentences with random word substitutions and deletions"""
+    rng = random.Random(seed)
+    fragments = []
+    while len(fragments) < count:
+        words = rng.choice(sentences).split()
+        start = rng.randrange(len(words))
+        end = rng.randint(start + 1, len(words))
+        rate = rng.random() * 0.4
+        window = [rng.choice(FILLER) if rng.random() < rate else word for word in words[start:end]]
+        if len(window) > 3 and rng.random() < 0.3:
+            del window[rng.randrange(len(window))]
+        fragment = ' '.join(window).lower()
+        if len(fragment) >= 15:
+            fragments.append(fragment)
+    return fragments
+
+
+def _similar_pairs(matcher, document, fragments):
+    """(fragment, sentence index) pairs at or above the partial threshold"""
+    pairs = []
+    for fragment in fragments:
+        for i, sentence in enumerate(document.sentences):
+            if SequenceMatcher(None, fragment, sentence).ratio() >= matcher.partial_threshold:
+                pairs.append((fragment, i))
+    return pairs
+
+
+def test_identical_text_is_always_a_candidate():
+    minhasher = MinHasher()
+    index = LSHIndex(minhasher.num_perm, bands=64)
+    sentence = "the calvin cycle fixes carbon dioxide into sugars"
+    item_id = index.add(minhasher.compute(sentence))
+    assert index.query(minhasher.signature(sentence), threshold=1.0) == [item_id]
+
+
+def test_estimate_tracks_true_jaccard():
+    minhasher = MinHasher(num_perm=256)
+    a = "oxygen is released as a by-product of the light-dependent reactions"
+    b = "oxygen is released as a side product of the light reactions"
+    shingles_a = {a[i:i + 3] for i in range(len(a) - 2)}
+    shingles_b = {b[i:i + 3] for i in range(len(b) - 2)}
+    true_jaccard = len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+    estimate = estimate_jaccard(minhasher.compute(a), minhasher.compute(b))
+    assert abs(estimate - true_jaccard) < 0.1
+
+
+def test_bands_must_divide_signature():
+    try:
+        LSHIndex(num_perm=128, bands=48)
+    except ValueError:
+        return
+    raise AssertionError("expected ValueError for 128 permutations in 48 bands")
+
+
+def test_default_filter_recall_at_partial_threshold():
+    matcher = TextMatcher()
+    document = SourceDocument(SOURCE)
+    fragments = _perturbed_fragments(document.sentences, 1500)
+    pairs = _similar_pairs(matcher, document, fragments)
+    assert len(pairs) > 100
+
+    index = document.sentence_index(matcher.minhasher, matcher.lsh_bands)
+    found = sum(
+        1 for fragment, i in pairs
+        if i in index.query(matcher.minhasher.signature(fragment), matcher.minhash_threshold)
+    )
+    recall = found / len(pairs)
+    print(f"   recall {recall:.3f} over {len(pairs)} pairs")
+    assert recall >= MIN_RECALL
+
+
+def test_filter_prunes_unrelated_sentences():
+    matcher = TextMatcher()
+    document = SourceDocument(SOURCE)
+    candidates = matcher._fuzzy_candidates(
+        "my cat sleeps all day long on the couch in the living room", document
+    )
+    assert len(candidates) < len(document.sentences) / 2
+
+
+def test_zero_threshold_scores_every_sentence():
+    matcher = TextMatcher(minhash_threshold=0)
+    document = SourceDocument(SOURCE)
+    assert matcher._fuzzy_candidates("anything at all", document) == document.sentences
+
+
+def test_match_types_agree_with_exhaustive_scoring():
+    filtered = TextMatcher()
+    exhaustive = TextMatcher(minhash_threshold=0)
+    document = SourceDocument(SOURCE)
+    fragments = _perturbed_fragments(document.sentences, 400, seed=11)
+    disagreements = sum(
+        1 for fragment in fragments
+        if filtered._fuzzy_similarity(fragment, document)[1]
+        != exhaustive._fuzzy_similarity(fragment, document)[1]
+    )
+    assert disagreements / len(fragments) <= 1 - MIN_RECALL
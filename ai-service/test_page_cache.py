@@ -0,0 +1,159 @@
+"""
+Tests for the persistent page cache and conditional-GET revalidation
+Run with: pytest test_page_cache.py
+"""
+import os
+import random
+import shutil
+import sqlite3
+import string
+import tempfile
+import threading
+
+import pytest
+
+from cache_backends import MemoryCacheBackend
+from page_cache import PageCache
+from query_cache import QueryCache
+from query_planner import IDFTable, QueryPlanner
+from rate_limiter import TokenBucket
+from web_search import WebSearcher
+
+URL = 'https://example.org/article'
+
+
+@pytest.fixture
+def path():
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, 'pages.sqlite3')
+    shutil.rmtree(directory)
+
+
+def _random_text(rng, length):
+    return ''.join(rng.choice(string.ascii_letters + ' ') for _ in range(length))
+
+
+class _Response:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class _Session:
+    """Records request headers and answers with queued responses"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+def _searcher(cache, *responses):
+    searcher = WebSearcher(page_cache=cache, rate_limiter=TokenBucket(100, 100),
+                           query_cache=QueryCache(backend=MemoryCacheBackend()),
+                           query_planner=QueryPlanner(IDFTable.fallback()))
+    searcher.session = _Session(*responses)
+    searcher._extract_text = lambda url, html: html.decode('utf-8')
+    return searcher
+
+
+def test_compressed_round_trip_through_sqlite(path):
+    text = "Café crème — naïve résumé. " * 200
+    PageCache(path=path).put(URL, text, etag='"v1"', last_modified='Wed, 01 Jan 2025 00:00:00 GMT')
+
+    with sqlite3.connect(path) as conn:
+        size, blob = conn.execute('SELECT size, content FROM pages WHERE url = ?', (URL,)).fetchone()
+    assert size == len(blob) < len(text.encode('utf-8'))
+
+    # A fresh instance has an empty memory tier, so this reads SQLite
+    entry = PageCache(path=path).get(URL)
+    assert entry['content'] == text
+    assert entry['etag'] == '"v1"'
+    assert entry['last_modified'] == 'Wed, 01 Jan 2025 00:00:00 GMT'
+    assert PageCache(path=path).get('https://example.org/missing') is None
+
+
+def test_stale_page_is_revalidated_and_reused_on_304(path):
+    cache = PageCache(path=path, max_age=0)
+    cache.put(URL, "cached page text", etag='"v1"', last_modified='Wed, 01 Jan 2025 00:00:00 GMT')
+    searcher = _searcher(cache, _Response(304))
+
+    assert searcher._fetch_page_content_uncached(URL) == "cached page text"
+    sent = searcher.session.requests[0]
+    assert sent['If-None-Match'] == '"v1"'
+    assert sent['If-Modified-Since'] == 'Wed, 01 Jan 2025 00:00:00 GMT'
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_changed_page_replaces_the_cached_copy(path):
+    cache = PageCache(path=path, max_age=0)
+    cache.put(URL, "old page text", etag='"v1"')
+    searcher = _searcher(cache, _Response(200, b"new page text", {'ETag': '"v2"'}))
+
+    assert searcher._fetch_page_content_uncached(URL) == "new page text"
+    entry = PageCache(path=path).get(URL)
+    assert entry['content'] == "new page text"
+    assert entry['etag'] == '"v2"'
+
+
+def test_fresh_page_is_served_without_a_request(path):
+    cache = PageCache(path=path, max_age=3600)
+    cache.put(URL, "cached page text", etag='"v1"')
+    searcher = _searcher(cache)
+    assert searcher._fetch_page_content_uncached(URL) == "cached page text"
+    assert searcher.session.requests == []
+    assert cache.stats()['hits'] == 1
+
+
+def test_eviction_drops_least_recently_used_pages(path):
+    rng = random.Random(5)
+    cache = PageCache(path=path, max_bytes=8000, memory_entries=1)
+    urls = [f'https://example.org/{i}' for i in range(20)]
+    for i, url in enumerate(urls):
+        cache.put(url, _random_text(rng, 1200))
+        if i == 15:
+            # Reading a page from SQLite makes it recently used
+            cache._memory.clear()
+            assert cache.get(urls[0]) is not None
+
+    with sqlite3.connect(path) as conn:
+        total = conn.execute('SELECT SUM(size) FROM pages').fetchone()[0]
+        kept = {url for (url,) in conn.execute('SELECT url FROM pages')}
+    assert total <= 8000
+    assert urls[0] in kept and urls[-1] in kept
+    assert urls[1] not in kept
+
+
+def test_eviction_keeps_pages_in_the_memory_tier(path):
+    rng = random.Random(6)
+    cache = PageCache(path=path, max_bytes=8000, memory_entries=2)
+    urls = [f'https://example.org/{i}' for i in range(20)]
+    for url in urls[:19]:
+        cache.put(url, _random_text(rng, 1200))
+    cache._remember(urls[0], cache.get(urls[0]))
+    cache.put(urls[19], _random_text(rng, 1200))
+
+    with sqlite3.connect(path) as conn:
+        kept = {url for (url,) in conn.execute('SELECT url FROM pages')}
+    assert urls[0] in kept
+
+
+def test_counters_are_exact_under_concurrent_updates(path):
+    cache = PageCache(path=path)
+
+    def record():
+        for _ in range(2000):
+            cache.record_hit()
+            cache.record_miss()
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats['hits'] == stats['misses'] == 16000
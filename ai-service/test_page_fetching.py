@@ -0,0 +1,102 @@
+"""
+Tests for concurrent page fetching: per-host limits and the fetch deadline
+Run with: pytest test_page_fetching.py
+"""
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from cache_backends import MemoryCacheBackend
+from query_cache import QueryCache
+from query_planner import IDFTable, QueryPlanner
+from rate_limiter import TokenBucket
+from web_search import WebSearcher
+
+
+class _Searcher(WebSearcher):
+    """WebSearcher whose page fetches sleep instead of going to the network"""
+
+    def __init__(self, delays, default_delay=0.05):
+        super().__init__(rate_limiter=TokenBucket(100, 100),
+                         query_cache=QueryCache(backend=MemoryCacheBackend()),
+                         query_planner=QueryPlanner(IDFTable.fallback()))
+        self.delays = delays
+        self.default_delay = default_delay
+        self.in_flight = Counter()
+        self.peak = Counter()
+        self.fetched = []
+        self._counter_lock = threading.Lock()
+
+    def _fetch_page_content_uncached(self, url, timeout=10):
+        host = url.split('/')[2]
+        with self._counter_lock:
+            self.in_flight[host] += 1
+            self.peak[host] = max(self.peak[host], self.in_flight[host])
+            self.fetched.append(url)
+        time.sleep(self.delays.get(url, self.default_delay))
+        with self._counter_lock:
+            self.in_flight[host] -= 1
+        return f"Content of {url} " * 20
+
+
+@pytest.fixture(autouse=True)
+def no_page_cache(monkeypatch):
+    monkeypatch.setenv('PAGE_CACHE', 'off')
+
+
+def test_per_host_limit_caps_concurrent_fetches():
+    searcher = _Searcher({})
+    searcher.per_host_limit = 2
+    urls = [f'https://busy.example/{i}' for i in range(6)] + [f'https://other.example/{i}' for i in range(2)]
+
+    fetched = dict(searcher.fetch_pages(urls, deadline=5))
+    assert set(fetched) == set(urls)
+    assert searcher.peak['busy.example'] == 2
+    # Other hosts are not held up by the busy one
+    assert searcher.peak['other.example'] == 2
+
+
+def test_deadline_skips_pages_still_in_flight():
+    slow = 'https://slow.example/page'
+    searcher = _Searcher({slow: 2.0}, default_delay=0.01)
+    urls = [slow] + [f'https://fast{i}.example/page' for i in range(3)]
+
+    started = time.time()
+    fetched = dict(searcher.fetch_pages(urls, deadline=0.3))
+    assert time.time() - started < 1.0
+    assert set(fetched) == set(urls[1:])
+
+
+def test_missed_deadline_still_returns_the_url():
+    slow = 'https://slow.example/page'
+    searcher = _Searcher({slow: 2.0}, default_delay=0.01)
+    searcher.fetch_deadline = 0.3
+    results = searcher._results_for_urls([slow, 'https://fast.example/page'], "query text")
+
+    by_url = {result['url']: result for result in results}
+    assert 'document' in by_url['https://fast.example/page']
+    assert by_url[slow]['content'] == "query text"
+
+
+def test_fetches_waiting_for_a_host_slot_give_up_at_the_deadline():
+    searcher = _Searcher({}, default_delay=0.5)
+    searcher.per_host_limit = 1
+    urls = [f'https://busy.example/{i}' for i in range(4)]
+
+    fetched = dict(searcher.fetch_pages(urls, deadline=0.7))
+    assert sum(1 for content in fetched.values() if content) == 1
+    # Fetches whose slot wait ran past the deadline never start
+    time.sleep(0.5)
+    assert len(searcher.fetched) == 2
+
+
+def test_batch_memo_fetches_each_url_once():
+    searcher = _Searcher({})
+    urls = ['https://a.example/1', 'https://b.example/1']
+    with searcher.batch_scope():
+        first = dict(searcher.fetch_pages(urls, deadline=5))
+        second = dict(searcher.fetch_pages(urls, deadline=5))
+    assert first == second
+    assert sorted(searcher.fetched) == sorted(urls)
@@ -0,0 +1,80 @@
+"""
+Tests for Aho-Corasick phrase lookup on overlapping patterns
+Run with: pytest test_phrase_table.py
+"""
+import random
+import string
+
+import pytest
+
+from aho_corasick import AhoCorasick
+from source_document import SourceDocument
+from text_matcher import PhraseTable
+
+
+def _brute_force(patterns, text):
+    return sorted((pattern_id, i + len(pattern))
+                  for pattern_id, pattern in enumerate(patterns)
+                  for i in range(len(text) - len(pattern) + 1)
+                  if text.startswith(pattern, i))
+
+
+def test_overlapping_and_nested_patterns_are_all_reported():
+    patterns = ['he', 'she', 'his', 'hers']
+    assert sorted(AhoCorasick(patterns).iter_matches('ushers')) == [(0, 4), (1, 4), (3, 6)]
+
+
+def test_self_overlapping_occurrences_are_all_reported():
+    patterns = ['a', 'aa', 'aaa']
+    matches = sorted(AhoCorasick(patterns).iter_matches('aaaa'))
+    assert matches == _brute_force(patterns, 'aaaa')
+    assert [pattern_id for pattern_id, _ in matches].count(2) == 2
+
+
+def test_duplicate_patterns_keep_their_own_ids():
+    automaton = AhoCorasick(['abc', 'abc', 'bc'])
+    assert automaton.find_present('xabcx') == {0, 1, 2}
+
+
+def test_empty_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        AhoCorasick(['abc', ''])
+
+
+def test_matches_brute_force_on_random_text():
+    rng = random.Random(7)
+    for _ in range(200):
+        patterns = [''.join(rng.choice('ab ') for _ in range(rng.randint(1, 5)))
+                    for _ in range(rng.randint(1, 8))]
+        text = ''.join(rng.choice('abc ') for _ in range(rng.randint(0, 40)))
+        automaton = AhoCorasick(patterns)
+        expected = _brute_force(patterns, text)
+        assert sorted(automaton.iter_matches(text)) == expected
+        assert automaton.find_present(text) == {pattern_id for pattern_id, _ in expected}
+
+
+def test_phrase_table_views_match_substring_checks():
+    rng = random.Random(8)
+    vocabulary = ['light', 'energy', 'plants', 'chemical', 'the', 'into', 'green,', 'leaf.']
+    for _ in range(50):
+        source = ' '.join(rng.choice(vocabulary) for _ in range(60))
+        document = SourceDocument(source)
+        occurrences = []
+        for _ in range(20):
+            # Phrases drawn from the source overlap each other and repeat
+            words = source.split()
+            start = rng.randint(0, len(words) - 6)
+            phrase = ' '.join(words[start:start + rng.randint(4, 6)])
+            if rng.random() < 0.3:
+                phrase = phrase.replace(' ', ' ' + rng.choice(vocabulary) + ' ', 1)
+            occurrences.append((phrase.upper() if rng.random() < 0.2 else phrase, 0, len(phrase)))
+
+        hits = PhraseTable(occurrences).scan(document)
+        punctuation = str.maketrans('', '', string.punctuation)
+        for phrase, _, _ in occurrences:
+            key = ' '.join(phrase.lower().split())
+            assert (key in hits.normalized) == (key in document.normalized)
+            assert (key in hits.clean) == (key.translate(punctuation) in document.clean)
+            words = key.split()
+            shares_window = any(' '.join(words[i:i + 4]) in document.lower for i in range(len(words) - 3))
+            assert (key in hits.windowed) == shares_window
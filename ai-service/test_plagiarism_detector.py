@@ -0,0 +1,106 @@
+"""
+Tests for PlagiarismDetector's batch checks against one-at-a-time checks
+Run with: pytest test_plagiarism_detector.py
+"""
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from plagiarism_detector import PlagiarismDetector
+from segmenter import RegexSegmenter
+from text_matcher import TextMatcher
+
+SOURCE = {
+    'url': 'https://en.wikipedia.org/wiki/Photosynthesis',
+    'title': 'Photosynthesis',
+    'content': ("Photosynthesis is a process used by plants to convert light energy into chemical energy. "
+                "The chemical energy is stored in carbohydrate molecules such as sugars and starches. "
+                "Most plants, algae and cyanobacteria perform photosynthesis."),
+}
+TEXTS = [
+    "Photosynthesis is a process used by plants to convert light energy into chemical energy. "
+    "My garden gets plenty of sun in the afternoon.",
+    "Most plants, algae and cyanobacteria perform photosynthesis. I learned this in school last year.",
+    "I spent the weekend hiking with friends. We cooked dinner by the lake and watched the stars.",
+]
+
+
+class _Encoder:
+    """Hashed bag-of-words vectors; records every call"""
+
+    name = 'test-encoder'
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences):
+        self.calls.append(list(sentences))
+        vectors = np.zeros((len(sentences), 64), dtype=np.float32)
+        for i, sentence in enumerate(sentences):
+            for word in sentence.lower().split():
+                vectors[i, zlib.crc32(word.encode('utf-8')) % 64] += 1.0
+        return vectors
+
+
+class _Searcher:
+    """Web searcher returning fixed sources"""
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.documents = []
+
+    @contextmanager
+    def batch_scope(self):
+        yield
+
+    def search_queries(self, text, max_results=5, document=None):
+        self.documents.append(document)
+        return [dict(source) for source in self.sources][:max_results]
+
+    def _search_google(self, query, max_results=3):
+        return []
+
+
+class _Detector(PlagiarismDetector):
+    """PlagiarismDetector with a test encoder and optional fixed search results"""
+
+    def __init__(self, sources=None):
+        self.model_name = 'test-encoder'
+        self.model = _Encoder()
+        self.encoder_service = None
+        self.embedding_cache = None
+        self.reference_corpus = None
+        self.segmenter = RegexSegmenter()
+        self.web_searcher = _Searcher(sources) if sources is not None else None
+        self.text_matcher = TextMatcher() if sources is not None else None
+
+
+def test_batch_matches_single_checks_with_web_sources():
+    expected = [_Detector([SOURCE]).detect_plagiarism(text) for text in TEXTS]
+    assert expected[0]['exact_match_percentage'] > 0
+    assert _Detector([SOURCE]).detect_plagiarism_batch(TEXTS) == expected
+
+
+def test_batch_matches_single_checks_in_the_fallback():
+    expected = [_Detector().detect_plagiarism(text) for text in TEXTS]
+    assert _Detector().detect_plagiarism_batch(TEXTS) == expected
+
+
+def test_batch_does_not_encode_when_sources_are_found():
+    detector = _Detector([SOURCE])
+    detector.detect_plagiarism_batch(TEXTS)
+    assert detector.model.calls == []
+
+
+def test_fallback_encodes_each_document_once():
+    detector = _Detector([])
+    detector.detect_plagiarism_batch(TEXTS)
+    assert detector.model.calls == [detector.preprocess_text(text) for text in TEXTS]
+
+
+def test_search_reuses_the_analyzed_document():
+    detector = _Detector([SOURCE])
+    document = detector.analyze(TEXTS[0])
+    detector.detect_plagiarism(TEXTS[0], document)
+    assert detector.web_searcher.documents == [document]
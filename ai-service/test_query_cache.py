@@ -0,0 +1,86 @@
+"""
+Tests for the search query cache and its positive/negative TTLs
+Run with: pytest test_query_cache.py
+"""
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+import cache_backends
+from cache_backends import MemoryCacheBackend, SQLiteCacheBackend
+from query_cache import QueryCache
+
+URLS = ['https://example.org/a', 'https://example.org/b', 'https://example.org/c']
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the backends' clock with one the test moves forward"""
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(cache_backends, 'time', SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request):
+    if request.param == 'memory':
+        yield MemoryCacheBackend()
+        return
+    directory = tempfile.mkdtemp()
+    yield SQLiteCacheBackend(os.path.join(directory, 'queries.sqlite3'))
+    shutil.rmtree(directory)
+
+
+def test_results_expire_after_the_ttl(backend, clock):
+    cache = QueryCache(backend=backend, ttl=600, negative_ttl=60)
+    cache.set("Photosynthesis  in plants", 3, URLS)
+
+    clock.now += 599
+    assert cache.get("photosynthesis in plants", 3) == URLS
+    clock.now += 2
+    assert cache.get("photosynthesis in plants", 3) is None
+
+
+def test_no_result_entries_expire_after_the_negative_ttl(backend, clock):
+    cache = QueryCache(backend=backend, ttl=600, negative_ttl=60)
+    cache.set("an obscure query", 3, [])
+
+    clock.now += 59
+    assert cache.get("an obscure query", 3) == []
+    assert cache.contains("an obscure query", 3)
+    clock.now += 2
+    # Expired long before a positive entry stored at the same time would
+    assert cache.get("an obscure query", 3) is None
+    assert not cache.contains("an obscure query", 3)
+
+
+def test_no_results_answer_any_max_results(backend, clock):
+    cache = QueryCache(backend=backend, ttl=600, negative_ttl=60)
+    cache.set("an obscure query", 1, [])
+    assert cache.get("an obscure query", 5) == []
+
+
+def test_larger_entries_answer_smaller_requests_only(backend, clock):
+    cache = QueryCache(backend=backend, ttl=600, negative_ttl=60)
+    cache.set("photosynthesis", 3, URLS)
+    assert cache.get("photosynthesis", 2) == URLS[:2]
+    assert cache.get("photosynthesis", 5) is None
+
+
+def test_stats_count_get_but_not_contains(clock):
+    cache = QueryCache(backend=MemoryCacheBackend(), ttl=600, negative_ttl=60)
+    cache.set("photosynthesis", 3, URLS)
+    cache.get("photosynthesis", 3)
+    cache.get("chlorophyll", 3)
+    cache.contains("photosynthesis", 3)
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+
+
+def test_ttls_default_to_the_environment(monkeypatch):
+    monkeypatch.setenv('QUERY_CACHE_TTL', '120')
+    monkeypatch.setenv('QUERY_CACHE_NEGATIVE_TTL', '30')
+    cache = QueryCache(backend=MemoryCacheBackend())
+    assert (cache.ttl, cache.negative_ttl) == (120, 30)
@@ -0,0 +1,89 @@
+"""
+Tests for rarity-based search query selection
+Run with: pytest test_query_planner.py
+"""
+from enhanced_plagiarism_detector import EnhancedPlagiarismDetector
+from query_planner import IDFTable, QueryPlanner, build_idf
+
+# Listed words are common; anything else counts as rare (default_idf)
+TABLE = IDFTable({
+    'the': 0.0, 'a': 0.0, 'of': 0.0, 'in': 0.0, 'and': 0.0, 'is': 0.0, 'it': 0.0, 'to': 0.0, 'that': 0.0,
+    'many': 0.5, 'people': 0.5, 'think': 0.5, 'important': 0.5, 'study': 0.5, 'united': 0.5,
+    'states': 0.5, 'really': 0.5, 'good': 0.5, 'thing': 0.5, 'history': 1.0, 'cells': 1.0,
+}, default_idf=5.0)
+
+RARE = "The mitochondrion is an organelle found in eukaryotic cells and produces adenosine triphosphate."
+GENERIC = "In the United States many people think that it is important to study history."
+SHORT_RARE = "Mitochondria have their own genome."
+LONG_RARE = " ".join([RARE] * 4).replace(".", ",")
+
+
+def _planner(coverage=0.9):
+    return QueryPlanner(TABLE, coverage=coverage)
+
+
+def test_rarest_sentence_first():
+    queries = _planner(coverage=1.0).plan([GENERIC, RARE, SHORT_RARE], max_queries=3)
+    assert queries[0] == RARE
+    assert queries[-1] == GENERIC
+
+
+def test_stops_once_coverage_is_reached():
+    # RARE and SHORT_RARE hold well over 90% of the information; GENERIC adds little
+    assert _planner().plan([GENERIC, RARE, SHORT_RARE], max_queries=5) == [RARE, SHORT_RARE]
+
+
+def test_max_queries_is_respected():
+    assert _planner(coverage=1.0).plan([GENERIC, RARE, SHORT_RARE], max_queries=1) == [RARE]
+
+
+def test_sentence_length_limits():
+    queries = _planner().plan([RARE, SHORT_RARE], max_queries=5, sentence_chars=(21, 60))
+    assert queries == [SHORT_RARE]
+    assert _planner().plan([RARE], max_queries=5, sentence_chars=None) == []
+
+
+def test_long_sentences_are_cut_not_dropped():
+    detector = EnhancedPlagiarismDetector.__new__(EnhancedPlagiarismDetector)
+    detector.query_planner = _planner(coverage=1.0)
+    queries = detector._sentence_queries([GENERIC, LONG_RARE])
+    assert len(LONG_RARE) > 200
+    assert queries[0] == LONG_RARE[:200].strip()
+    assert GENERIC in queries
+
+
+def test_phrases_do_not_overlap_chosen_queries():
+    planner = _planner(coverage=1.0)
+    queries = planner.plan([RARE], max_queries=10, sentence_chars=None, phrase_words=(3, 4), phrase_chars=(10, 80))
+    assert queries
+    words = RARE.split()
+    spans = []
+    for query in queries:
+        length = len(query.split())
+        start = next(i for i in range(len(words)) if words[i:i + length] == query.split())
+        spans.append(set(range(start, start + length)))
+    for i, span in enumerate(spans):
+        for earlier in spans[:i]:
+            assert len(span & earlier) <= planner.max_overlap * len(span)
+
+
+def test_common_words_carry_no_information():
+    assert _planner().plan(["It is in the and of that, and it is to it."], max_queries=5) == []
+
+
+def test_keywords_rank_by_tf_idf():
+    words = "history mitochondria. Mitochondria people people people people".lower().split()
+    # 2 x rare beats 4 x common, and "mitochondria." counts as "mitochondria"
+    assert _planner().keywords(words, 2) == ['mitochondria', 'people']
+
+
+def test_fallback_weights_only_stopwords():
+    planner = QueryPlanner(IDFTable.fallback())
+    assert planner.information("the of and") == 0.0
+    assert planner.information("mitochondria organelle") == 2.0
+
+
+def test_build_idf_counts_document_frequency():
+    table = build_idf(["the cell divides", "the cell grows", "the sun rises"], min_df=2)
+    assert set(table.idf) == {'the', 'cell'}
+    assert table('the') < table('cell') <= table('sun')
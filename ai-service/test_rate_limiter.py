@@ -0,0 +1,118 @@
+"""
+Tests for the token-bucket search rate limiter
+Run with: pytest test_rate_limiter.py
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from rate_limiter import FCNTL_AVAILABLE, FileBucketState, LocalBucketState, TokenBucket, create_rate_limiter
+
+needs_fcntl = pytest.mark.skipif(not FCNTL_AVAILABLE, reason="fcntl not available")
+
+
+@pytest.fixture
+def path():
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, 'search_rate.bucket')
+    shutil.rmtree(directory)
+
+
+def _take_tokens(path, count, results):
+    bucket = TokenBucket(0.001, 5, FileBucketState(path, 5))
+    results.put(sum(bucket.try_acquire() for _ in range(count)))
+
+
+def test_burst_is_available_immediately_then_empty():
+    bucket = TokenBucket(0.001, 3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_tokens_refill_at_the_rate_up_to_the_burst():
+    bucket = TokenBucket(20, 2)
+    assert bucket.try_acquire(2)
+    assert not bucket.try_acquire()
+    time.sleep(0.06)
+    assert bucket.try_acquire()
+    # A long idle period never fills the bucket past the burst
+    time.sleep(0.3)
+    assert bucket.try_acquire(2)
+    assert not bucket.try_acquire()
+
+
+def test_wait_time_does_not_consume_tokens():
+    bucket = TokenBucket(2, 1)
+    assert bucket.wait_time() == 0.0
+    assert bucket.wait_time() == 0.0
+    assert bucket.try_acquire()
+    assert 0.4 < bucket.wait_time() <= 0.5
+    assert 0.9 < bucket.wait_time(2) <= 1.0
+
+
+def test_acquire_waits_for_a_token():
+    bucket = TokenBucket(10, 1)
+    assert bucket.try_acquire()
+    started = time.time()
+    assert bucket.acquire(timeout=1)
+    assert 0.05 < time.time() - started < 0.5
+
+
+def test_acquire_gives_up_at_once_when_the_wait_exceeds_the_timeout():
+    bucket = TokenBucket(0.1, 1)
+    assert bucket.try_acquire()
+    started = time.time()
+    assert not bucket.acquire(timeout=2)
+    assert time.time() - started < 0.1
+
+
+def test_local_state_is_the_default():
+    assert isinstance(TokenBucket(1, 1).state, LocalBucketState)
+
+
+@needs_fcntl
+def test_file_state_is_shared_between_buckets(path):
+    first = TokenBucket(0.001, 2, FileBucketState(path, 2))
+    second = TokenBucket(0.001, 2, FileBucketState(path, 2))
+    assert first.try_acquire()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+    assert second.wait_time() > 100
+
+
+@needs_fcntl
+def test_file_state_is_shared_between_processes(path):
+    FileBucketState(path, 5)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_take_tokens, args=(path, 4, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sum(results.get() for _ in workers) == 5
+
+
+@needs_fcntl
+def test_file_state_keeps_tokens_written_before_it_was_opened(path):
+    TokenBucket(0.001, 3, FileBucketState(path, 3)).try_acquire(3)
+    # Opening the file again must not reset the bucket to full
+    assert not TokenBucket(0.001, 3, FileBucketState(path, 3)).try_acquire()
+
+
+def test_create_rate_limiter_reads_the_environment(monkeypatch, path):
+    monkeypatch.setenv('SEARCH_RATE', '4')
+    monkeypatch.setenv('SEARCH_BURST', '7')
+    monkeypatch.setenv('SEARCH_RATE_LIMITER', 'local')
+    limiter = create_rate_limiter()
+    assert (limiter.rate, limiter.burst) == (4.0, 7.0)
+    assert isinstance(limiter.state, LocalBucketState)
+
+    if FCNTL_AVAILABLE:
+        monkeypatch.setenv('SEARCH_RATE_LIMITER', 'file')
+        monkeypatch.setenv('SEARCH_RATE_LIMITER_PATH', path)
+        limiter = create_rate_limiter()
+        assert isinstance(limiter.state, FileBucketState)
+        assert os.path.exists(path)
@@ -0,0 +1,100 @@
+"""
+Search recall tests for the reference corpus, exact and IVF, on synthetic vectors
+Run with: pytest test_reference_corpus.py
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from reference_corpus import ReferenceCorpus, ingest
+
+DIMENSION = 32
+
+
+class _VectorEncoder:
+    """Encoder returning fixed vectors for known sentences"""
+
+    name = 'synthetic'
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, sentences):
+        return np.array([self.vectors[sentence] for sentence in sentences], dtype=np.float32)
+
+
+def _clustered_vectors(count, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIMENSION))
+    vectors = centers[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, DIMENSION))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _build(count, index, seed=0):
+    """Corpus of count one-sentence documents; returns (directory, corpus, sentence vectors)"""
+    vectors = _clustered_vectors(count, seed=seed)
+    sentences = [f"Reference sentence number {i} of the synthetic corpus." for i in range(count)]
+    directory = tempfile.mkdtemp()
+    input_dir = os.path.join(directory, 'input')
+    os.makedirs(input_dir)
+    with open(os.path.join(input_dir, 'documents.jsonl'), 'w', encoding='utf-8') as f:
+        for i, sentence in enumerate(sentences):
+            f.write(json.dumps({'title': f'Document {i}', 'text': sentence}) + '\n')
+    encoder = _VectorEncoder(dict(zip(sentences, vectors)))
+    ingest(input_dir, os.path.join(directory, 'corpus'), index=index, encoder=encoder)
+    return directory, ReferenceCorpus(os.path.join(directory, 'corpus')), vectors
+
+
+def _recall(corpus, vectors, queries=200, seed=1):
+    """Share of noisy copies of corpus vectors whose top hit is the brute-force nearest sentence"""
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+    noisy = vectors[picked] + 0.05 * rng.normal(size=(len(picked), DIMENSION))
+    noisy /= np.linalg.norm(noisy, axis=1, keepdims=True)
+    nearest = np.argmax(noisy @ np.asarray(corpus.embeddings, dtype=np.float32).T, axis=1)
+    found = sum(1 for expected, hits in zip(nearest, corpus.search(noisy, top_k=1))
+                if hits and hits[0][1] == expected)
+    return found / len(picked)
+
+
+def _titles_follow_vectors(corpus, vectors):
+    """Whether every stored sentence still points at the document it was embedded from"""
+    for sentence_id in range(len(corpus)):
+        i = int(corpus.sentence(sentence_id)['title'].split()[-1])
+        if np.dot(vectors[i], np.asarray(corpus.embeddings[sentence_id], dtype=np.float32)) < 0.99:
+            return False
+    return True
+
+
+def test_exact_search_recall():
+    directory, corpus, vectors = _build(2000, 'exact')
+    try:
+        assert corpus.meta['index'] == 'exact'
+        assert _recall(corpus, vectors) == 1.0
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_ivf_search_recall():
+    directory, corpus, vectors = _build(2000, 'ivf')
+    try:
+        assert corpus.meta['index'] == 'ivf'
+        assert _titles_follow_vectors(corpus, vectors)
+        recall = _recall(corpus, vectors)
+        print(f"   IVF recall {recall:.3f}")
+        assert recall >= 0.9
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_ivf_on_a_tiny_corpus():
+    # 4 * sqrt(10) lists would exceed the 10 sentences
+    directory, corpus, vectors = _build(10, 'ivf')
+    try:
+        assert corpus.meta['nlist'] <= 10
+        assert _recall(corpus, vectors) == 1.0
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,117 @@
+"""
+Tests for the result cache and its key/value backends
+Run with: pytest test_result_cache.py
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from cache_backends import FileCacheBackend, MemoryCacheBackend, SQLiteCacheBackend, create_backend
+from result_cache import OffsetMap, ResultCache, normalize_text
+
+TEXT = "Mitochondria are the powerhouse of the cell. They produce most of its energy."
+SPACED = "  Mitochondria are  the powerhouse of the cell.\n\nThey   produce most of its energy. "
+
+
+def _result(text, phrase):
+    start = text.index(phrase)
+    return {
+        'plagiarism_percentage': 40.0,
+        'text_length': len(text),
+        'matches': [{'text': phrase, 'match_type': 'exact', 'span': [start, start + len(phrase)]},
+                    {'text': 'no offsets', 'match_type': 'partial'}],
+    }
+
+
+@pytest.fixture
+def directory():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path)
+
+
+def _backends(directory, max_entries=1000):
+    return [
+        MemoryCacheBackend(max_entries=max_entries),
+        SQLiteCacheBackend(os.path.join(directory, 'cache.sqlite3'), max_entries=max_entries),
+        FileCacheBackend(os.path.join(directory, 'files'), max_entries=max_entries),
+    ]
+
+
+def test_offset_map_round_trips_word_offsets():
+    offsets = OffsetMap(SPACED)
+    normalized = normalize_text(SPACED)
+    assert normalized == TEXT
+    for word_start in (2, SPACED.index('They'), SPACED.index('energy')):
+        word = SPACED[word_start:].split()[0]
+        n = offsets.to_normalized(word_start)
+        assert normalized[n:n + len(word)] == word
+        assert offsets.to_text(n) == word_start
+
+
+def test_whitespace_variant_hits_with_spans_on_the_submitted_text():
+    cache = ResultCache(backend=MemoryCacheBackend())
+    phrase = "They produce most of its energy"
+    cache.set(TEXT, _result(TEXT, phrase))
+
+    result = cache.get(SPACED)
+    assert result is not None
+    start, end = result['matches'][0]['span']
+    assert ' '.join(SPACED[start:end].split()) == phrase
+    assert SPACED[start:end] == "They   produce most of its energy"
+    assert result['text_length'] == len(SPACED)
+    assert 'span' not in result['matches'][1]
+    assert cache.stats()['hits'] == 1
+
+
+def test_spans_stored_from_a_spaced_text_map_onto_the_plain_one():
+    cache = ResultCache(backend=MemoryCacheBackend())
+    cache.set(SPACED, _result(SPACED, "the powerhouse of the cell"))
+    start, end = cache.get(TEXT)['matches'][0]['span']
+    assert TEXT[start:end] == "the powerhouse of the cell"
+
+
+def test_different_text_misses_and_namespaces_are_separate():
+    backend = MemoryCacheBackend()
+    cache = ResultCache(backend=backend, namespace='full')
+    cache.set(TEXT, _result(TEXT, "the cell"))
+    assert cache.get(TEXT + " Extra sentence.") is None
+    assert ResultCache(backend=backend, namespace='tiered').get(TEXT) is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_backends_expire_entries_after_their_ttl(directory):
+    for backend in _backends(directory):
+        backend.set('short', {'v': 1}, ttl=0.2)
+        backend.set('long', {'v': 2}, ttl=60)
+        backend.set('forever', {'v': 3})
+        time.sleep(0.3)
+        assert backend.get('short') is None, type(backend).__name__
+        assert backend.get('long') == {'v': 2}
+        assert backend.get('forever') == {'v': 3}
+
+
+def test_backends_evict_the_least_recently_used_entry(directory):
+    for backend in _backends(directory, max_entries=2):
+        backend.set('a', 1)
+        time.sleep(0.02)
+        backend.set('b', 2)
+        time.sleep(0.02)
+        assert backend.get('a') == 1  # 'b' is now the least recently used
+        time.sleep(0.02)
+        backend.set('c', 3)
+        assert backend.get('b') is None, type(backend).__name__
+        assert backend.get('a') == 1 and backend.get('c') == 3
+        assert len(backend) == 2
+
+
+def test_create_backend_selects_by_name(directory):
+    assert isinstance(create_backend('memory'), MemoryCacheBackend)
+    assert isinstance(create_backend('sqlite', path=os.path.join(directory, 'r.sqlite3'), name='results'),
+                      SQLiteCacheBackend)
+    assert isinstance(create_backend('file', path=os.path.join(directory, 'r')), FileCacheBackend)
+    with pytest.raises(ValueError):
+        create_backend('redis')
@@ -0,0 +1,139 @@
+"""
+Tests for the concurrent search strategy scheduler
+Run with: pytest test_search_scheduler.py
+"""
+import threading
+import time
+
+from search_scheduler import SearchScheduler
+
+
+def _strategy(name, queries, **options):
+    strategy = {
+        'name': name,
+        'label': name,
+        'queries': lambda: list(queries),
+        'max_results': 1,
+        'wikipedia_only': False,
+        'only_if_few_sources': False,
+        'skip_when_throttled': False,
+    }
+    strategy.update(options)
+    return strategy
+
+
+class _Limiter:
+    def __init__(self, wait):
+        self.wait = wait
+
+    def wait_time(self, tokens=1):
+        return self.wait
+
+
+class _Searcher:
+    """Web searcher stand-in: a fixed rate limiter wait and a set of cached queries"""
+
+    def __init__(self, wait=0.0, cached=(), max_wait=float('inf')):
+        self.rate_limiter = _Limiter(wait)
+        self.rate_limit_max_wait = max_wait
+        self.cached = set(cached)
+
+    def current_batch_memo(self):
+        return None
+
+    def is_query_cached(self, query, max_results=3):
+        return query in self.cached
+
+
+class _Queries:
+    """run_query recording every query; optional per-query delay"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.seen = []
+        self._lock = threading.Lock()
+
+    def __call__(self, query, strategy):
+        with self._lock:
+            self.seen.append(query)
+        time.sleep(self.delay)
+        return [{'url': f'https://example.org/{query}'}]
+
+
+def test_all_strategies_share_one_query_budget():
+    run_query = _Queries()
+    scheduler = SearchScheduler(run_query, max_queries=3)
+    plan = [_strategy('a', ['a1', 'a2', 'a3']), _strategy('b', ['b1', 'b2', 'b3'])]
+    sources = scheduler.run(plan)
+    assert len(run_query.seen) == 3
+    assert len(sources) == 3
+
+
+def test_cached_and_local_queries_do_not_use_the_budget():
+    run_query = _Queries()
+    scheduler = SearchScheduler(run_query, _Searcher(cached={'a1', 'a2'}), max_queries=1)
+    plan = [_strategy('a', ['a1', 'a2', 'a3', 'a4']), _strategy('wiki', ['w1', 'w2'], local=True)]
+    scheduler.run(plan)
+    assert sorted(run_query.seen) == ['a1', 'a2', 'a3', 'w1', 'w2']
+
+
+def test_deadline_returns_the_sources_found_so_far():
+    run_query = _Queries(delay=0.2)
+    scheduler = SearchScheduler(run_query, max_queries=50, deadline=0.5)
+    started = time.time()
+    events = list(scheduler.iter_results([_strategy('slow', [f'q{i}' for i in range(20)])]))
+    assert time.time() - started < 0.8
+    assert events[-1] == {'type': 'deadline', 'pending': ['slow']}
+    assert 1 <= sum(event['type'] == 'source' for event in events) < 20
+
+
+def test_throttled_low_value_strategy_is_skipped():
+    run_query = _Queries()
+    scheduler = SearchScheduler(run_query, _Searcher(wait=5.0), max_skip_wait=2, deadline=10)
+    plan = [_strategy('sentences', ['s1']), _strategy('phrases', ['p1', 'p2'], skip_when_throttled=True)]
+    done = {event['strategy']: event for event in scheduler.iter_results(plan) if event['type'] == 'done'}
+    assert run_query.seen == ['s1']
+    assert done['phrases']['queries'] == 0
+
+
+def test_rate_limit_wait_past_the_deadline_stops_the_strategy():
+    run_query = _Queries()
+    scheduler = SearchScheduler(run_query, _Searcher(wait=30.0), deadline=1)
+    started = time.time()
+    scheduler.run([_strategy('sentences', ['s1', 's2'])])
+    assert run_query.seen == []
+    assert time.time() - started < 0.5
+
+
+def test_queries_the_searcher_would_drop_do_not_use_the_budget():
+    run_query = _Queries()
+    searcher = _Searcher(wait=3.0, cached={'s2'}, max_wait=2)
+    scheduler = SearchScheduler(run_query, searcher, max_queries=1, deadline=10)
+    started = time.time()
+    scheduler.run([_strategy('sentences', ['s1', 's2'])])
+    # s1 would be dropped after a 3s wait; the cached s2 still runs
+    assert run_query.seen == ['s2']
+    assert time.time() - started < 0.5
+
+
+def test_fallback_strategy_stops_once_enough_sources_are_found():
+    run_query = _Queries()
+    scheduler = SearchScheduler(run_query, enough_sources=2)
+
+    def late_queries():
+        time.sleep(0.2)
+        return ['k1']
+
+    plan = [_strategy('sentences', ['a', 'b', 'c']),
+            dict(_strategy('keywords', [], only_if_few_sources=True), queries=late_queries)]
+    done = {event['strategy']: event for event in scheduler.iter_results(plan) if event['type'] == 'done'}
+    assert 'k1' not in run_query.seen
+    assert done['keywords']['skipped']
+
+
+def test_checks_share_one_bounded_thread_pool():
+    scheduler = SearchScheduler(_Queries(delay=0.3), max_workers=4, deadline=0.1)
+    for _ in range(10):
+        scheduler.run([_strategy(f's{i}', ['q1', 'q2']) for i in range(3)])
+    strategy_threads = [t for t in threading.enumerate() if t.name.startswith('search-strategy')]
+    assert len(strategy_threads) <= 4
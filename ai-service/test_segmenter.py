@@ -0,0 +1,52 @@
+"""
+Tests for the regex sentence segmenter (the fallback when spaCy or its model is missing)
+Run with: pytest test_segmenter.py
+"""
+from segmenter import RegexSegmenter
+
+SEGMENTER = RegexSegmenter()
+
+
+def _check(*sentences):
+    text = ' '.join(sentences)
+    assert SEGMENTER.split(text) == list(sentences), SEGMENTER.split(text)
+
+
+def test_splits_on_terminal_punctuation():
+    _check("Is it true?", "Nobody answered.", "The room was silent!")
+
+
+def test_ordinary_word_before_period_ends_sentence():
+    _check("The answer was no.", "We left early.")
+
+
+def test_single_letter_before_sentence_opener_ends_sentence():
+    _check("He took vitamin A.", "It helped.")
+
+
+def test_time_before_sentence_opener_ends_sentence():
+    _check("I went home at 5 p.m.", "Then I slept.")
+
+
+def test_dotted_place_name_ends_sentence():
+    _check("She grew up in Washington, D.C.", "Her family later moved to Ohio.")
+
+
+def test_initials_do_not_split():
+    _check("J. R. R. Tolkien wrote The Hobbit.", "It was published in 1937.")
+    _check("The paper by J. A. Smith was cited.")
+
+
+def test_titles_and_reference_abbreviations_do_not_split():
+    _check("Dr. Smith arrived on Jan. 5.", "He met Prof. Lee.")
+    _check("See Fig. 2 and Vol. 3 for details.")
+
+
+def test_lowercase_continuation_does_not_split():
+    _check("The U.S. economy grew, e.g. in exports, by 3.5 percent.")
+    _check("Analysts at XYZ Corp. expected less.")
+
+
+def test_split_many_matches_split():
+    texts = ["One sentence here. Another one.", "Single."]
+    assert SEGMENTER.split_many(texts) == [SEGMENTER.split(text) for text in texts]
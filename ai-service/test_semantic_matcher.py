@@ -0,0 +1,101 @@
+"""
+Tests for embedding-based paraphrase matching
+Run with: pytest test_semantic_matcher.py
+"""
+import re
+import zlib
+
+import numpy as np
+
+from plagiarism_detector import PlagiarismDetector
+from semantic_matcher import SemanticMatcher
+from source_document import SourceDocument
+from text_matcher import TextMatcher
+
+# Words of one group share a dimension, standing in for a model that knows synonyms
+SYNONYMS = {
+    'vegetation': 'plants', 'converts': 'turn', 'solar': 'sunlight', 'radiation': 'sunlight',
+    'stored': 'chemical', 'fuel': 'energy', 'photosynthetic': 'photosynthesis', 'processes': 'lets',
+}
+STOPWORDS = {'the', 'to', 'via', 'into', 'in', 'for', 'was', 'a'}
+
+COPIED = "The Eiffel Tower was completed in 1889 for the World's Fair."
+PARAPHRASE = "Vegetation converts solar radiation to stored fuel via photosynthetic processes."
+UNRELATED = "My dog likes long walks in the park near our house."
+SOURCE = {
+    'url': 'https://example.org/science',
+    'title': 'Science facts',
+    'content': "Photosynthesis lets green plants turn sunlight into chemical energy. " + COPIED,
+}
+
+
+class _Encoder:
+    """Bag-of-concepts vectors; records every call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, sentences):
+        self.calls.append(list(sentences))
+        vectors = np.zeros((len(sentences), 256), dtype=np.float32)
+        for i, sentence in enumerate(sentences):
+            for word in re.findall(r"[a-z0-9']+", sentence.lower()):
+                if word not in STOPWORDS:
+                    word = SYNONYMS.get(word, word)
+                    vectors[i, zlib.crc32(word.encode('utf-8')) % 256] += 1.0
+        return vectors
+
+
+def _matcher(encoder=None, **options):
+    return TextMatcher(semantic_matcher=SemanticMatcher(encoder or _Encoder(), 'test-encoder', **options))
+
+
+def test_paraphrase_is_found_and_exact_match_is_reported_once():
+    text = " ".join([COPIED, PARAPHRASE, UNRELATED])
+    matches = _matcher().find_matches(text, [dict(SOURCE)])['matches']
+
+    # Matched sentences leave out their final punctuation
+    by_text = {}
+    for match in matches:
+        by_text.setdefault(match['text'] + '.', []).append(match['match_type'])
+    assert by_text[PARAPHRASE] == ['paraphrase']
+    assert by_text[COPIED] == ['exact']
+    assert UNRELATED not in by_text
+
+    paraphrase = next(match for match in matches if match['match_type'] == 'paraphrase')
+    assert text[paraphrase['position']:paraphrase['end']] == PARAPHRASE.rstrip('.')
+    assert 80 <= paraphrase['similarity'] <= 100
+
+
+def test_paraphrase_needs_the_semantic_matcher():
+    text = " ".join([COPIED, PARAPHRASE])
+    matches = TextMatcher().find_matches(text, [dict(SOURCE)])['matches']
+    assert [match['text'] for match in matches] == [COPIED.rstrip('.')]
+
+
+def test_url_only_sources_are_not_encoded():
+    encoder = _Encoder()
+    source = {'url': 'https://example.org/unfetched', 'title': 'Unfetched',
+              'content': PARAPHRASE.lower(), 'snippet': PARAPHRASE, 'url_only': True}
+    matches = _matcher(encoder).find_matches(" ".join([UNRELATED, PARAPHRASE]), [source])['matches']
+    assert all(match['match_type'] != 'paraphrase' for match in matches)
+    assert encoder.calls == []
+
+
+def test_source_sentences_are_capped():
+    encoder = _Encoder()
+    matcher = SemanticMatcher(encoder, 'test-encoder', max_source_sentences=5)
+    document = SourceDocument(" ".join(f"Sentence number {i} is about topic {i}." for i in range(50)))
+    matcher.match(matcher.encode(["Sentence number 3 is about topic 3."]), document)
+    assert len(encoder.calls[-1]) == 5
+
+
+def test_semantic_matching_is_opt_in(monkeypatch):
+    detector = PlagiarismDetector.__new__(PlagiarismDetector)
+    detector.model = type('Model', (), {'name': 'test-encoder'})()
+
+    monkeypatch.delenv('SEMANTIC_MATCHING', raising=False)
+    assert detector._create_semantic_matcher() is None
+    monkeypatch.setenv('SEMANTIC_MATCHING', 'on')
+    matcher = detector._create_semantic_matcher()
+    assert matcher is not None and matcher.max_source_sentences == 100
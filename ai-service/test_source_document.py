@@ -0,0 +1,73 @@
+"""
+Tests for SourceDocument's normalized views and their offsets into the original text
+Run with: pytest test_source_document.py
+"""
+from fingerprint import FingerprintIndex, normalize_with_offsets
+from source_document import SourceDocument
+
+CONTENT = ("Photosynthesis  is a PROCESS used by plants, algae & cyanobacteria!\n\n"
+           "It converts light energy into chemical energy. Café owners rarely notice.")
+SHARED = "It converts light energy into chemical energy."
+
+
+def test_every_normalized_character_maps_back_to_its_original():
+    normalized, offsets, orig_to_norm = normalize_with_offsets(CONTENT)
+    assert len(offsets) == len(normalized)
+    for i, char in enumerate(normalized):
+        assert CONTENT[offsets[i]].lower() == char
+        assert orig_to_norm[offsets[i]] == i
+    assert orig_to_norm[len(CONTENT)] == len(normalized)
+
+
+def test_original_ranges_map_to_the_normalized_run_between_them():
+    normalized, _, orig_to_norm = normalize_with_offsets(CONTENT)
+    start = CONTENT.index(SHARED)
+    end = start + len(SHARED)
+    assert normalized[orig_to_norm[start]:orig_to_norm[end]] == "itconvertslightenergyintochemicalenergy"
+
+
+def test_fingerprint_text_is_the_offset_normalization():
+    document = SourceDocument(CONTENT)
+    assert document.fingerprint_text == normalize_with_offsets(CONTENT)[0]
+    assert "café" in document.fingerprint_text
+
+
+def test_normalized_and_clean_views():
+    document = SourceDocument(CONTENT)
+    assert document.normalized.startswith("photosynthesis is a process used by plants, algae")
+    assert "  " not in document.normalized and "\n" not in document.normalized
+    assert "plants algae  cyanobacteria" in document.clean
+    assert document.sentences[1] == "it converts light energy into chemical energy"
+    assert {"photosynthesis", "café"} <= document.words
+
+
+def test_spans_found_against_the_source_cover_the_original_fragment():
+    document = SourceDocument(CONTENT)
+    index = FingerprintIndex()
+    index.add_normalized(1, document.fingerprint_text)
+
+    text = "My notes say:   it CONVERTS light energy, into chemical energy. Nothing else here matches."
+    spans = index.find_spans(text)[1]
+    start = text.index("it CONVERTS")
+    end = text.index("energy.", start + 20) + len("energy.")
+    assert spans.covers(start, end)
+    assert spans.normalized_length(start, end) == len("itconvertslightenergyintochemicalenergy")
+    assert not spans.covers(text.index("Nothing"), len(text))
+
+
+def test_for_source_reuses_the_document_until_the_content_changes():
+    source = {'url': 'https://example.org', 'title': 'Example', 'content': CONTENT}
+    document = SourceDocument.for_source(source)
+    assert SourceDocument.for_source(source) is document
+    assert document.url == 'https://example.org'
+
+    source['content'] = "Different page text entirely."
+    rebuilt = SourceDocument.for_source(source)
+    assert rebuilt is not document
+    assert rebuilt.lower == "different page text entirely."
+
+
+def test_views_are_computed_once():
+    document = SourceDocument(CONTENT)
+    assert document.sentences is document.sentences
+    assert document.words is document.words
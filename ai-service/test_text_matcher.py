@@ -0,0 +1,30 @@
+"""
+Tests for TextMatcher's fingerprint-based exact match classification
+Run with: pytest test_text_matcher.py
+"""
+from text_matcher import TextMatcher
+
+SOURCE = ("The clinic hired the rapist who had been convicted last year, to everyone's surprise, "
+          "and the town was outraged by the decision made by the board.")
+
+
+def _matches(text):
+    return TextMatcher().find_matches(text, [{'url': 'http://x', 'title': 'X', 'content': SOURCE}])['matches']
+
+
+def test_copied_sentence_is_exact():
+    matches = _matches(SOURCE)
+    assert matches and matches[0]['match_type'] == 'exact'
+    assert matches[0]['similarity'] == 100.0
+
+
+def test_whitespace_and_punctuation_differences_are_near_exact():
+    matches = _matches(SOURCE.replace(',', '').replace(' the town', '  the   town'))
+    assert matches and matches[0]['match_type'] == 'exact'
+
+
+def test_different_word_boundaries_are_not_exact():
+    # Fingerprints ignore whitespace, so "therapist" shares every fingerprint with "the rapist"
+    matches = _matches(SOURCE.replace('the rapist', 'therapist'))
+    assert matches
+    assert all(match['match_type'] != 'exact' for match in matches)
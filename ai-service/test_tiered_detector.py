@@ -0,0 +1,107 @@
+"""
+Tests for the tiered detector's sentence signal and tier 1 decisions
+Run with: pytest test_tiered_detector.py
+"""
+from segmenter import RegexSegmenter
+from text_matcher import TextMatcher
+from tiered_detector import TieredPlagiarismDetector, source_signal
+
+LEAD = ("The mitochondrion is an organelle found in the cells of most eukaryotes. "
+        "Mitochondria generate most of the cell's supply of adenosine triphosphate. "
+        "They were first discovered by Albert von Kolliker in 1857.")
+# Copied sentences that all score under the default escalation threshold
+PLAIN = ("The mitochondrion is an organelle found in the cells of most eukaryotes. "
+         "It produces most of the chemical energy needed to power the cell.")
+PERSONAL = ("I think my weekend was really fun and relaxing for me. "
+            "We went to the park and I played with my dog for hours.")
+ARTICLE = {'url': 'https://en.wikipedia.org/wiki/Mitochondrion', 'title': 'Mitochondrion', 'content': LEAD}
+
+
+class _Detector(TieredPlagiarismDetector):
+    """Tiered detector without models or web search; tier 2 records what it was sent"""
+
+    def __init__(self, wikipedia_articles=None, web_search=True, **tiering):
+        self.segmenter = RegexSegmenter()
+        self.model = None
+        self.encoder_service = None
+        self.embedding_cache = None
+        self.reference_corpus = None
+        self.wikipedia_index = object() if wikipedia_articles is not None else None
+        self.wikipedia_articles = wikipedia_articles or []
+        self.web_searcher = object() if web_search else None
+        self.text_matcher = TextMatcher()
+        self.escalate_threshold = tiering.get('escalate_threshold', 0.25)
+        self.local_coverage = tiering.get('local_coverage', 50)
+        self.max_escalated = tiering.get('max_escalated', 8)
+        self.escalated = None
+
+    def _local_wikipedia_sources(self, text, max_articles):
+        return self.wikipedia_articles[:max_articles]
+
+    def _escalate(self, document, ai_detection, escalated, local_sources, corpus_hits):
+        self.escalated = escalated
+        return self._format_results(0.0, 0, 0.0, 100.0, [], ai_detection, document.text, document.sentences)
+
+
+def test_signal_ranks_source_text_above_personal_writing():
+    cited = "Mitochondria produce about 90% of the energy cells need (Smith et al., 2019)."
+    personal = "I think my weekend was really fun and relaxing for me and my family."
+    assert source_signal(cited) > source_signal(personal)
+    assert source_signal("Too short to rank.") == 0.0
+    assert 0.0 <= source_signal(cited) <= 1.0
+
+
+def test_without_local_index_every_check_escalates():
+    # Without an index a low signal is no evidence of originality
+    detector = _Detector()
+    assert all(source_signal(sentence) < detector.escalate_threshold for sentence in detector.analyze(PLAIN).sentences)
+    result = detector.detect_plagiarism(PLAIN)
+    assert result['tiering']['reason'] == 'web_search'
+    assert result['decided_by_tier'] == 2
+    assert detector.escalated == [0, 1]
+
+
+def test_without_local_index_escalates_strongest_sentences_first():
+    detector = _Detector(max_escalated=2)
+    document = detector.analyze(PERSONAL + " " + LEAD)
+    detector.detect_plagiarism(document.text)
+    signals = [source_signal(sentence) for sentence in document.sentences]
+    strongest = sorted(range(len(signals)), key=lambda i: -signals[i])[:2]
+    assert detector.escalated == sorted(strongest)
+
+
+def test_local_match_decides_in_tier_one():
+    detector = _Detector(wikipedia_articles=[ARTICLE])
+    result = detector.detect_plagiarism(LEAD)
+    assert result['tiering']['reason'] == 'local_match'
+    assert result['decided_by_tier'] == 1
+    assert detector.escalated is None
+    assert result['plagiarism_percentage'] > 50
+
+
+def test_no_signal_needs_a_local_lookup():
+    detector = _Detector(wikipedia_articles=[])
+    result = detector.detect_plagiarism(PERSONAL)
+    assert result['tiering']['reason'] == 'no_signal'
+    assert detector.escalated is None
+
+
+def test_web_search_unavailable_stays_in_tier_one():
+    detector = _Detector(web_search=False)
+    result = detector.detect_plagiarism(LEAD)
+    assert result['tiering']['reason'] == 'web_search_unavailable'
+    assert result['decided_by_tier'] == 1
+
+
+def test_covered_sentences_from_matches_and_corpus_hits():
+    detector = _Detector()
+    document = detector.analyze(PERSONAL + " " + LEAD)
+    first_lead = len(document.sentences) - 3
+    source = {'url': 'http://x', 'title': 'X', 'content': document.sentences[first_lead]}
+    local_results = detector.text_matcher.find_matches(document.text, [source])
+    assert detector._covered_sentences(document, local_results, None) == {first_lead}
+
+    corpus_hits = [[] for _ in document.sentences]
+    corpus_hits[0] = [(0.95, 7)]
+    corpus_hits[1] = [(0.5, 8)]
+    assert detector._covered_sentences(document, None, corpus_hits) == {0}
@@ -0,0 +1,108 @@
+"""
+Ingest-and-lookup tests for the offline Wikipedia index
+Run with: pytest test_wikipedia_index.py
+"""
+import json
+import os
+import random
+import shutil
+import tempfile
+
+import wikipedia_index
+from wikipedia_index import WikipediaIndex, ingest
+
+BOILERPLATE = ("This article needs additional citations for verification. Please help improve this article by "
+               "adding citations to reliable sources. Unsourced material may be challenged and removed.")
+
+
+def _articles(count=30, seed=3):
+    """Articles of random words; every third one starts with the same maintenance notice"""
+    rng = random.Random(seed)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+                  for _ in range(3000)]
+    articles = []
+    for i in range(count):
+        body = ' '.join(' '.join(rng.choice(vocabulary) for _ in range(15)) + '.' for _ in range(40))
+        articles.append({'title': f'Article {i}', 'text': (BOILERPLATE + ' ' if i % 3 == 0 else '') + body})
+    return articles
+
+
+def _build(articles):
+    directory = tempfile.mkdtemp()
+    dump = os.path.join(directory, 'dump.jsonl')
+    with open(dump, 'w', encoding='utf-8') as f:
+        for article in articles:
+            f.write(json.dumps(article) + '\n')
+    ingest(dump, os.path.join(directory, 'index'))
+    return directory, WikipediaIndex(os.path.join(directory, 'index'))
+
+
+def test_passage_finds_its_article_only():
+    articles = _articles()
+    directory, index = _build(articles)
+    try:
+        # The passage includes the notice it shares with every third article
+        candidates = index.candidates(articles[0]['text'][:1200])
+        assert [article_id for article_id, _, _ in candidates] == [0]
+        assert candidates[0][2] > 0.9
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_passage_from_two_articles_finds_both():
+    articles = _articles()
+    directory, index = _build(articles)
+    try:
+        text = articles[4]['text'][:800] + ' ' + articles[7]['text'][-800:]
+        assert sorted(article_id for article_id, _, _ in index.candidates(text)) == [4, 7]
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_unrelated_text_has_no_candidates():
+    directory, index = _build(_articles())
+    try:
+        assert index.candidates("My cat sleeps all day long on the couch in the living room.") == []
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_sources_carry_the_stored_article():
+    articles = _articles()
+    directory, index = _build(articles)
+    try:
+        assert len(index) == len(articles)
+        assert index.article(5)['text'] == articles[5]['text']
+        sources = index.sources(articles[5]['text'][:1000])
+        assert [source['title'] for source in sources] == ['Article 5']
+        assert sources[0]['content'] == articles[5]['text']
+        assert sources[0]['url'].endswith('Article_5')
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_documents_are_cached_per_index():
+    articles = _articles()
+    directory, index = _build(articles)
+    try:
+        other = WikipediaIndex(os.path.join(directory, 'index'))
+        document = index.document(2)
+        assert index.document(2) is document
+        assert other.document(2) is not document
+        assert document.content == articles[2]['text']
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_document_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(wikipedia_index, 'DOCUMENT_CACHE_SIZE', 2)
+    directory, index = _build(_articles())
+    try:
+        first = index.document(0)
+        index.document(1)
+        index.document(0)
+        index.document(2)
+        assert list(index._documents) == [0, 2]
+        assert index.document(0) is first
+    finally:
+        shutil.rmtree(directory)
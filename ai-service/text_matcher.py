@@ -1,24 +1,52 @@
 """
 Text matching module for finding exact and partial matches
 """
+import bisect
+import os
 import re
+import string
 from difflib import SequenceMatcher
 from collections import defaultdict
+from aho_corasick import AhoCorasick
+from fingerprint import FingerprintIndex, Fingerprinter
+from minhash import MinHasher
+from source_document import SourceDocument
+
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
 
 class TextMatcher:
     """Match text against sources to find exact and partial matches"""
     
-    def __init__(self):
+    def __init__(self, minhash_threshold=None, num_perm=None, lsh_bands=None, semantic_matcher=None):
+        """
+        Args:
+            minhash_threshold: Minimum estimated character-shingle Jaccard
+                similarity for a source sentence to be fuzzy-scored; 0 scores
+                every sentence (MATCH_MINHASH_THRESHOLD, default 0.2)
+            num_perm: MinHash signature length (MATCH_MINHASH_PERM, default 128)
+            lsh_bands: LSH bands; more bands raise recall (MATCH_LSH_BANDS, default 64)
+            semantic_matcher: Optional SemanticMatcher reporting 'paraphrase'
+                matches for sentences without a lexical match
+        """
         self.exact_threshold = 0.95  # 95% similarity = exact match
         self.partial_threshold = 0.70  # 70% similarity = partial match
+        self.fingerprinter = Fingerprinter(k=20, w=8)
+        
+        # Candidate filter in front of SequenceMatcher scoring
+        self.minhash_threshold = (minhash_threshold if minhash_threshold is not None
+                                  else float(os.getenv('MATCH_MINHASH_THRESHOLD', '0.2')))
+        self.minhasher = MinHasher(num_perm or int(os.getenv('MATCH_MINHASH_PERM', '128')))
+        self.lsh_bands = lsh_bands or int(os.getenv('MATCH_LSH_BANDS', '64'))
+        self.semantic_matcher = semantic_matcher
     
-    def find_matches(self, text, sources):
+    def find_matches(self, text, sources, prepared=None):
         """
         Find exact and partial matches in text against sources
         
         Args:
             text: Input text to check
             sources: List of source dictionaries with 'content' and 'url'
+            prepared: Optional output of prepare(text), reused instead of re-splitting
             
         Returns:
             Dictionary with matches, exact_match_percentage, partial_match_percentage
@@ -33,139 +61,268 @@ class TextMatcher:
             }
         
         # Split text into sentences and phrases
-        sentences = self._split_into_sentences(text)
-        phrases = self._extract_phrases(text)
+        sentences, phrases = prepared if prepared is not None else self.prepare(text)
         
         matches = []
-        exact_match_chars = 0
-        partial_match_chars = 0
-        total_chars = len(text)
         
         print(f"Matching {len(sentences)} sentences and {len(phrases)} phrases against {len(sources)} sources")
         
         # Check each sentence/phrase against sources
         for source_idx, source in enumerate(sources, 1):
-            source_content = source.get('content', '')
-            source_url = source.get('url', '')
-            source_title = source.get('title', 'Unknown')
+            matches.extend(self.match_source(text, sentences, phrases, source, matches, source_idx))
+        
+        return self.summarize(text, matches)
+    
+    def prepare(self, text, tokens=None):
+        """
+        Split text into the sentences and phrases that are matched against sources
+        
+        Both come from a single tokenization pass, so every fragment carries the
+        character offsets it was taken from.
+        
+        Args:
+            text: Input text
+            tokens: Optional (start, end) offsets of the whitespace-separated words of text
+        
+        Returns:
+            (sentences, phrases): a SentenceTable of (sentence, start, end)
+            tuples and a PhraseTable of (phrase, start, end) occurrences
+        """
+        if tokens is None:
+            tokens = self._tokenize(text)
+        return (SentenceTable(self._split_into_sentences(text, tokens)),
+                PhraseTable(self._extract_phrases(text, tokens=tokens)))
+    
+    def match_source(self, text, sentences, phrases, source, existing_matches=(), source_idx=1):
+        """
+        Match the sentences and phrases of text against a single source
+        
+        Args:
+            text: Input text being checked
+            sentences, phrases: Output of prepare(text); plain lists of
+                (fragment, start, end) tuples are accepted too
+            source: Source dictionary with 'content', 'url' and 'title'
+            existing_matches: Matches already found against earlier sources
+            source_idx: Position of the source, used for logging
             
-            if not source_content:
-                print(f"  Source {source_idx}: No content available, skipping")
+        Returns:
+            List of new match dictionaries for this source
+        """
+        source_content = source.get('content', '')
+        source_url = source.get('url', '')
+        source_title = source.get('title', 'Unknown')
+        
+        if not source_content:
+            print(f"  Source {source_idx}: No content available, skipping")
+            return []
+        
+        if not source_url:
+            print(f"  Source {source_idx}: No URL available")
+        
+        print(f"  Source {source_idx}: {source_title[:50]}... ({len(source_content)} chars)")
+        
+        # Normalized views and fingerprints are computed once per source page
+        document = SourceDocument.for_source(source)
+        
+        # Find every exact span the source shares with text
+        index = FingerprintIndex(self.fingerprinter)
+        index.add_normalized(source_idx, document.fingerprint_text,
+                             document.fingerprints(self.fingerprinter))
+        exact_spans = index.find_spans(text)[source_idx]
+        
+        matches = []
+        # Repeated fragments are scored against the source only once
+        scores = {}
+        
+        if not isinstance(sentences, SentenceTable):
+            sentences = SentenceTable(sentences)
+        matched_sentences = set()
+        
+        # Check sentences
+        for i, (sentence, start, end) in enumerate(sentences):
+            if len(sentence) < 10:
                 continue
             
-            if not source_url:
-                print(f"  Source {source_idx}: No URL available")
+            similarity, match_type = self._fingerprint_similarity(
+                sentence, start, end, exact_spans, document, scores
+            )
             
-            source_content_lower = source_content.lower()
-            print(f"  Source {source_idx}: {source_title[:50]}... ({len(source_content)} chars)")
+            if match_type in ['exact', 'partial']:
+                matched_sentences.add(i)
+                matches.append({
+                    'text': sentence,
+                    'similarity': similarity * 100,
+                    'match_type': match_type,
+                    'source': source_title,
+                    'url': source_url,
+                    'position': start,
+                    'end': end
+                })
+        
+        # Reworded sentences that share too few words for the lexical checks;
+        # URL-only results hold the search query rather than page text
+        if self.semantic_matcher is not None and not source.get('url_only'):
+            matches.extend(self._paraphrase_matches(
+                sentences, matched_sentences, document, source_title, source_url
+            ))
+        
+        # Text already covered by earlier matches
+        covered = _IntervalCover(
+            (match['position'], match_end(match))
+            for match in list(existing_matches) + matches
+            if match.get('position', -1) >= 0
+        )
+        
+        # Check phrases (for more granular matching)
+        if not isinstance(phrases, PhraseTable):
+            phrases = PhraseTable(phrases)
+        # One pass over the source finds every phrase it contains
+        phrase_hits = phrases.scan(document)
+        for phrase, start, end in phrases:
+            if len(phrase) < 15:
+                continue
             
-            # Check sentences
-            for sentence in sentences:
-                if len(sentence) < 10:
-                    continue
-                
-                similarity, match_type = self._check_similarity(sentence, source_content_lower)
-                
-                if match_type == 'exact':
-                    exact_match_chars += len(sentence)
-                    matches.append({
-                        'text': sentence,
-                        'similarity': similarity * 100,
-                        'match_type': 'exact',
-                        'source': source_title,
-                        'url': source_url,
-                        'position': text.find(sentence)
-                    })
-                elif match_type == 'partial':
-                    partial_match_chars += len(sentence) * similarity
+            similarity, match_type = self._phrase_similarity(
+                phrase, start, end, exact_spans, document, phrase_hits, scores
+            )
+            
+            if match_type in ['exact', 'partial']:
+                # Check if this occurrence is already covered by an earlier match
+                if not covered.covers(start, end):
+                    covered.add(start, end)
                     matches.append({
-                        'text': sentence,
+                        'text': phrase,
                         'similarity': similarity * 100,
-                        'match_type': 'partial',
+                        'match_type': match_type,
                         'source': source_title,
                         'url': source_url,
-                        'position': text.find(sentence)
+                        'position': start,
+                        'end': end
                     })
+        
+        return matches
+    
+    def _paraphrase_matches(self, sentences, matched_sentences, document, source_title, source_url):
+        """'paraphrase' matches for the sentences without a lexical match in the source"""
+        try:
+            paraphrases = self.semantic_matcher.match(sentences.embeddings(self.semantic_matcher), document)
+        except Exception as e:
+            print(f"Warning: semantic matching failed: {str(e)}")
+            return []
+        
+        matches = []
+        for i, similarity, _ in paraphrases:
+            if i in matched_sentences:
+                continue
+            sentence, start, end = sentences[i]
+            matches.append({
+                'text': sentence,
+                'similarity': similarity * 100,
+                'match_type': 'paraphrase',
+                'source': source_title,
+                'url': source_url,
+                'position': start,
+                'end': end
+            })
+        return matches
+    
+    def summarize(self, text, matches):
+        """
+        Resolve overlapping matches and compute coverage percentages
+        
+        Args:
+            text: Input text being checked
+            matches: All matches found so far (not modified)
             
-            # Check phrases (for more granular matching)
-            for phrase in phrases:
-                if len(phrase) < 15:
-                    continue
-                
-                similarity, match_type = self._check_similarity(phrase, source_content_lower)
-                
-                if match_type in ['exact', 'partial']:
-                    # Check if this phrase is already covered by a sentence match
-                    is_covered = any(
-                        phrase.lower() in match['text'].lower() 
-                        for match in matches 
-                        if match.get('position', -1) >= 0
-                    )
-                    
-                    if not is_covered:
-                        if match_type == 'exact':
-                            exact_match_chars += len(phrase)
-                        else:
-                            partial_match_chars += len(phrase) * similarity
-                        
-                        matches.append({
-                            'text': phrase,
-                            'similarity': similarity * 100,
-                            'match_type': match_type,
-                            'source': source_title,
-                            'url': source_url,
-                            'position': text.find(phrase)
-                        })
+        Returns:
+            Dictionary with matches, exact_match_percentage, partial_match_percentage
+        """
+        total_chars = len(text)
         
         # Remove overlapping matches (keep the one with higher similarity)
-        matches = self._remove_overlaps(matches)
+        matches = self._remove_overlaps(list(matches))
         
         # Calculate percentages based on actual matched characters
         # Only count each character once (avoid double counting)
-        matched_positions = set()
-        exact_positions = set()
-        partial_positions = set()
+        matched_intervals = []
+        exact_intervals = []
         
         for match in matches:
             pos = match.get('position', -1)
             if pos >= 0:
-                match_length = len(match['text'])
-                for i in range(pos, min(pos + match_length, len(text))):
-                    matched_positions.add(i)
-                    if match['match_type'] == 'exact':
-                        exact_positions.add(i)
-                    else:
-                        partial_positions.add(i)
+                interval = (pos, min(match_end(match), total_chars))
+                matched_intervals.append(interval)
+                if match['match_type'] == 'exact':
+                    exact_intervals.append(interval)
+        
+        exact_chars = _covered_length(exact_intervals)
+        # Partial and paraphrase matches that don't overlap with exact matches
+        partial_only_chars = _covered_length(matched_intervals) - exact_chars
         
         # Calculate percentages based on unique positions
-        exact_match_percentage = (len(exact_positions) / total_chars * 100) if total_chars > 0 else 0
-        # Partial matches that don't overlap with exact matches
-        partial_only_positions = partial_positions - exact_positions
-        partial_match_percentage = (len(partial_only_positions) / total_chars * 100) if total_chars > 0 else 0
+        exact_match_percentage = (exact_chars / total_chars * 100) if total_chars > 0 else 0
+        partial_match_percentage = (partial_only_chars / total_chars * 100) if total_chars > 0 else 0
         total_plagiarism = exact_match_percentage + partial_match_percentage
         
-        # Ensure percentages are reasonable
-        exact_match_percentage = min(exact_match_percentage, 100)
-        partial_match_percentage = min(partial_match_percentage, 100)
-        total_plagiarism = min(total_plagiarism, 100)
-        
         return {
             'matches': matches,
             'exact_match_percentage': min(exact_match_percentage, 100),
             'partial_match_percentage': min(partial_match_percentage, 100),
             'total_plagiarism': min(total_plagiarism, 100),
-            'unique_content_percentage': max(0, 100 - total_plagiarism)
+            'unique_content_percentage': max(0, 100 - min(total_plagiarism, 100))
         }
     
-    def _split_into_sentences(self, text):
-        """Split text into sentences"""
-        # Split by sentence endings
-        sentences = re.split(r'[.!?]+\s+', text)
-        return [s.strip() for s in sentences if len(s.strip()) > 10]
+    def _tokenize(self, text):
+        """Return the (start, end) offsets of every whitespace-separated word"""
+        return [(m.start(), m.end()) for m in re.finditer(r'\S+', text)]
+    
+    def _split_into_sentences(self, text, tokens=None):
+        """
+        Split text into sentences
+        
+        Sentences end at a run of . ! ? followed by whitespace, which is not
+        part of the sentence.
+        
+        Returns:
+            List of (sentence, start, end) tuples
+        """
+        if tokens is None:
+            tokens = self._tokenize(text)
+        
+        sentences = []
+        sentence_start = None
+        for start, end in tokens:
+            if sentence_start is None:
+                sentence_start = start
+            if end < len(text) and text[end - 1] in '.!?':
+                # Sentence ending: drop the terminal punctuation run
+                sentence_end = end
+                while sentence_end > start and text[sentence_end - 1] in '.!?':
+                    sentence_end -= 1
+                self._add_sentence(sentences, text, sentence_start, sentence_end)
+                sentence_start = None
+        if sentence_start is not None:
+            self._add_sentence(sentences, text, sentence_start, tokens[-1][1])
+        return sentences
+    
+    def _add_sentence(self, sentences, text, start, end):
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end - start > 10:
+            sentences.append((text[start:end], start, end))
     
-    def _extract_phrases(self, text, min_length=15, max_length=100):
-        """Extract phrases of various lengths"""
-        words = text.split()
+    def _extract_phrases(self, text, min_length=15, max_length=100, tokens=None):
+        """
+        Extract phrases of various lengths
+        
+        Every occurrence of a repeated phrase is kept with its own offsets.
+        
+        Returns:
+            List of (phrase, start, end) tuples
+        """
+        if tokens is None:
+            tokens = self._tokenize(text)
+        words = [text[start:end] for start, end in tokens]
         phrases = []
         
         # Extract 3-7 word phrases
@@ -173,63 +330,137 @@ class TextMatcher:
             for i in range(len(words) - length + 1):
                 phrase = ' '.join(words[i:i+length])
                 if min_length <= len(phrase) <= max_length:
-                    phrases.append(phrase)
+                    phrases.append((phrase, tokens[i][0], tokens[i + length - 1][1]))
         
-        # Remove duplicates
-        return list(set(phrases))
+        return phrases
     
-    def _check_similarity(self, text, source_content):
+    def _fingerprint_similarity(self, fragment, start, end, exact_spans, document, scores=None):
         """
-        Check similarity between text and source content
+        Classify a sentence or phrase of text using the source's fingerprint spans
+        
+        Fragments inside an exact span are exact matches once confirmed against
+        the whitespace-preserving views of the source: fingerprints ignore
+        whitespace, so "the rapist" and "therapist" share a span. Fragments long
+        enough that winnowing would have found them, but outside every span (or
+        not confirmed), skip the substring checks and go straight to fuzzy
+        matching.
+        
+        Args:
+            fragment: Sentence or phrase
+            start, end: Offsets of the fragment in the input text
+            exact_spans: SpanSet of the input text against the source
+            document: SourceDocument of the source
+            scores: Optional dictionary memoizing scores of repeated fragments
+        """
+        if exact_spans.covers(start, end):
+            fragment_lower = fragment.lower().strip()
+            if ' '.join(fragment_lower.split()) in document.normalized:
+                return 1.0, 'exact'
+            if ' '.join(fragment_lower.translate(_PUNCTUATION_TABLE).split()) in document.clean:
+                return 0.98, 'exact'
+            skip_exact = True
+        else:
+            skip_exact = exact_spans.normalized_length(start, end) >= self.fingerprinter.guarantee
+        if scores is None:
+            return self._check_similarity(fragment, document, skip_exact=skip_exact)
+        key = (fragment, skip_exact)
+        if key not in scores:
+            scores[key] = self._check_similarity(fragment, document, skip_exact=skip_exact)
+        return scores[key]
+    
+    def _phrase_similarity(self, phrase, start, end, exact_spans, document, phrase_hits, scores):
+        """
+        Classify a phrase like _fingerprint_similarity, answering the substring
+        checks from the PhraseTable scan of the source instead of searching it
+        """
+        phrase_lower = phrase.lower().strip()
+        # A covering span still needs confirming with whitespace, as in _fingerprint_similarity
+        covered = exact_spans.covers(start, end)
+        skip_exact = not covered and exact_spans.normalized_length(start, end) >= self.fingerprinter.guarantee
+        if not skip_exact:
+            if phrase_lower in phrase_hits.normalized:
+                return 1.0, 'exact'
+            if phrase_lower in phrase_hits.clean:
+                return 0.98, 'exact'
+        
+        # A shared 4-word run makes the phrase a partial match whatever its fuzzy score
+        if phrase_lower in phrase_hits.windowed:
+            return 0.90, 'partial'
+        
+        key = (phrase, skip_exact)
+        if key not in scores:
+            scores[key] = self._fuzzy_similarity(phrase_lower, document)
+        return scores[key]
+    
+    def _check_similarity(self, text, document, skip_exact=False):
+        """
+        Check similarity between text and a source
+        
+        Args:
+            text: Sentence or phrase to check
+            document: SourceDocument of the source
+            skip_exact: Skip the exact substring checks (already ruled out by fingerprinting)
         
         Returns:
             (similarity_score, match_type)
             match_type: 'exact', 'partial', or None
         """
         text_lower = text.lower().strip()
-        source_lower = source_content.lower()
         
-        # Check for exact substring match first (most common case)
-        # This is the most reliable for Wikipedia content
-        if text_lower in source_lower:
-            return 1.0, 'exact'
-        
-        # Also check with normalized whitespace (Wikipedia might have different spacing)
-        text_normalized = ' '.join(text_lower.split())
-        source_normalized = ' '.join(source_lower.split())
-        if text_normalized in source_normalized:
-            return 1.0, 'exact'
+        if not skip_exact:
+            # Check for exact substring match first (most common case)
+            # This is the most reliable for Wikipedia content
+            if text_lower in document.lower:
+                return 1.0, 'exact'
+            
+            # Also check with normalized whitespace (Wikipedia might have different spacing)
+            text_normalized = ' '.join(text_lower.split())
+            if text_normalized in document.normalized:
+                return 1.0, 'exact'
+            
+            # Check for near-exact match (allowing minor differences)
+            # Remove punctuation and extra spaces for comparison
+            text_clean = text_lower.translate(_PUNCTUATION_TABLE)
+            if text_clean in document.clean:
+                return 0.98, 'exact'
         
-        # Check for near-exact match (allowing minor differences)
-        # Remove punctuation and extra spaces for comparison
-        import string
-        text_clean = ''.join(c for c in text_lower if c not in string.punctuation)
-        source_clean = ''.join(c for c in source_lower if c not in string.punctuation)
+        return self._fuzzy_similarity(text_lower, document)
+    
+    def _fuzzy_similarity(self, text_lower, document):
+        """
+        Score partial matches with SequenceMatcher, word overlap and 4-word phrases
         
-        if text_clean in source_clean:
-            return 0.98, 'exact'
+        Only scores that reach partial_threshold are exact; lower scores of
+        non-matches are lower bounds, since hopeless source sentences are skipped.
+        """
+        # Check for partial matches (substrings of 4+ words)
+        words = text_lower.split()
+        if len(words) >= 4:
+            # Try matching 4-word combinations
+            for i in range(len(words) - 3):
+                phrase = ' '.join(words[i:i+4])
+                if phrase in document.lower:
+                    return 0.90, 'partial'
         
         # Check for similar phrases using SequenceMatcher
         best_similarity = 0
-        best_match = None
         
         # Try matching against sentences in source
-        source_sentences = re.split(r'[.!?]+\s+', source_lower)
-        for source_sentence in source_sentences:
-            if len(source_sentence) < 10:
+        for source_sentence in self._fuzzy_candidates(text_lower, document):
+            matcher = SequenceMatcher(None, text_lower, source_sentence)
+            # Cheap upper bounds first: skip sentences that cannot raise the score
+            floor = max(best_similarity, self.partial_threshold)
+            if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
                 continue
-            
-            similarity = SequenceMatcher(None, text_lower, source_sentence).ratio()
+            similarity = matcher.ratio()
             if similarity > best_similarity:
                 best_similarity = similarity
-                best_match = source_sentence
         
         # Also check word-by-word matching for partial matches
         text_words = set(text_lower.split())
-        source_words = set(source_lower.split())
         
         if len(text_words) > 0:
-            common_words = text_words.intersection(source_words)
+            common_words = text_words.intersection(document.words)
             word_overlap = len(common_words) / len(text_words)
             
             # If significant word overlap, it's likely a match
@@ -237,15 +468,6 @@ class TextMatcher:
                 # Use the higher similarity score
                 best_similarity = max(best_similarity, word_overlap * 0.9)
         
-        # Check for partial matches (substrings of 4+ words)
-        words = text_lower.split()
-        if len(words) >= 4:
-            # Try matching 4-word combinations
-            for i in range(len(words) - 3):
-                phrase = ' '.join(words[i:i+4])
-                if phrase in source_lower:
-                    return 0.90, 'partial'
-        
         # Determine match type based on similarity
         if best_similarity >= self.exact_threshold:
             return best_similarity, 'exact'
@@ -254,35 +476,208 @@ class TextMatcher:
         else:
             return best_similarity, None
     
+    def _fuzzy_candidates(self, text_lower, document):
+        """Source sentences worth fuzzy scoring, found through the source's LSH index"""
+        if self.minhash_threshold <= 0:
+            return document.sentences
+        signature = self.minhasher.signature(text_lower)
+        index = document.sentence_index(self.minhasher, self.lsh_bands)
+        sentences = document.sentences
+        return [sentences[i] for i in index.query(signature, self.minhash_threshold)]
+    
     def _remove_overlaps(self, matches):
-        """Remove overlapping matches, keeping the one with higher similarity"""
+        """
+        Remove overlapping matches, keeping the one with higher similarity
+        
+        Single sweep over the matches in position order: kept matches never
+        overlap each other, so a new match can only overlap the last kept one.
+        """
         if not matches:
             return []
         
         # Sort by position
-        matches.sort(key=lambda x: x.get('position', 0))
+        matches = sorted(matches, key=lambda x: x.get('position', 0))
         
         filtered = []
+        last_end = None
         for match in matches:
-            is_overlapping = False
-            match_start = match.get('position', 0)
-            match_end = match_start + len(match['text'])
+            start = match.get('position', 0)
+            end = match_end(match)
             
-            for existing in filtered:
-                existing_start = existing.get('position', 0)
-                existing_end = existing_start + len(existing['text'])
-                
-                # Check if overlaps
-                if not (match_end <= existing_start or match_start >= existing_end):
-                    is_overlapping = True
-                    # Keep the one with higher similarity
-                    if match['similarity'] > existing['similarity']:
-                        filtered.remove(existing)
-                        filtered.append(match)
-                    break
+            if filtered and start < last_end and end > filtered[-1].get('position', 0):
+                # Overlaps the last kept match: keep the one with higher similarity
+                if match['similarity'] > filtered[-1]['similarity']:
+                    filtered[-1] = match
+                    last_end = end
+                continue
             
-            if not is_overlapping:
-                filtered.append(match)
+            filtered.append(match)
+            last_end = end
         
         return filtered
 
+
+def match_end(match):
+    """End offset of a match in the input text"""
+    return match.get('end', match.get('position', 0) + len(match['text']))
+
+
+def _covered_length(intervals):
+    """Total length covered by (start, end) intervals, counting overlaps once"""
+    covered = 0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = start, end
+        elif end > current_end:
+            current_end = end
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered
+
+
+class SentenceTable:
+    """Sentence occurrences of one input text, with embeddings computed on first use"""
+    
+    def __init__(self, occurrences):
+        self.occurrences = list(occurrences)
+        self._embeddings = {}
+    
+    def __iter__(self):
+        return iter(self.occurrences)
+    
+    def __len__(self):
+        return len(self.occurrences)
+    
+    def __getitem__(self, index):
+        return self.occurrences[index]
+    
+    def embeddings(self, semantic_matcher):
+        """Normalized embeddings of every sentence, encoded once per matcher"""
+        if semantic_matcher.key not in self._embeddings:
+            self._embeddings[semantic_matcher.key] = semantic_matcher.encode(
+                [sentence for sentence, _, _ in self.occurrences]
+            )
+        return self._embeddings[semantic_matcher.key]
+
+
+class PhraseTable:
+    """
+    Phrase occurrences of one input text
+    
+    The distinct phrases are compiled once into Aho-Corasick automata that
+    are reused for every source of the request.
+    """
+    
+    def __init__(self, occurrences):
+        self.occurrences = list(occurrences)
+        self._automata = None
+    
+    def __iter__(self):
+        return iter(self.occurrences)
+    
+    def __len__(self):
+        return len(self.occurrences)
+    
+    def _build(self):
+        if self._automata is None:
+            phrases = list(dict.fromkeys(
+                ' '.join(phrase.lower().split()) for phrase, _, _ in self.occurrences
+            ))
+            
+            clean = defaultdict(list)
+            windows = defaultdict(list)
+            for phrase in phrases:
+                clean[phrase.translate(_PUNCTUATION_TABLE)].append(phrase)
+                words = phrase.split()
+                for i in range(len(words) - 3):
+                    windows[' '.join(words[i:i+4])].append(phrase)
+            # The empty string is a substring of every source
+            always_clean = clean.pop('', [])
+            
+            self._automata = (
+                phrases, AhoCorasick(phrases),
+                clean, AhoCorasick(clean), always_clean,
+                windows, AhoCorasick(windows),
+            )
+        return self._automata
+    
+    def scan(self, document):
+        """Return the _PhraseHits of a SourceDocument (each view is scanned on first use)"""
+        return _PhraseHits(self, document)
+
+
+class _PhraseHits:
+    """Lowercased phrases of a PhraseTable found in one source"""
+    
+    def __init__(self, table, document):
+        self._table = table
+        self._document = document
+        self._normalized = None
+        self._clean = None
+        self._windowed = None
+    
+    @property
+    def normalized(self):
+        """Phrases occurring in the whitespace-normalized source"""
+        if self._normalized is None:
+            phrases, automaton = self._table._build()[:2]
+            self._normalized = {phrases[i] for i in automaton.find_present(self._document.normalized)}
+        return self._normalized
+    
+    @property
+    def clean(self):
+        """Phrases whose punctuation-free form occurs in the punctuation-free source"""
+        if self._clean is None:
+            _, _, clean, automaton, always_clean = self._table._build()[:5]
+            patterns = list(clean)
+            self._clean = set(always_clean)
+            for i in automaton.find_present(self._document.clean):
+                self._clean.update(clean[patterns[i]])
+        return self._clean
+    
+    @property
+    def windowed(self):
+        """Phrases sharing a 4-word run with the source"""
+        if self._windowed is None:
+            windows, automaton = self._table._build()[5:]
+            patterns = list(windows)
+            self._windowed = set()
+            for i in automaton.find_present(self._document.lower):
+                self._windowed.update(windows[patterns[i]])
+        return self._windowed
+
+
+class _IntervalCover:
+    """
+    Matched [start, end) intervals, answering "is this range inside one of them"
+    
+    Intervals contained in another are dropped, so the kept ones are sorted by
+    both start and end and a lookup is a single bisection.
+    """
+    
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+        for start, end in intervals:
+            self.add(start, end)
+    
+    def covers(self, start, end):
+        """True if [start, end) lies inside a single interval"""
+        i = bisect.bisect_right(self._starts, start) - 1
+        return i >= 0 and self._ends[i] >= end
+    
+    def add(self, start, end):
+        """Add [start, end), dropping the intervals it contains"""
+        if self.covers(start, end):
+            return
+        lo = bisect.bisect_left(self._starts, start)
+        hi = lo
+        while hi < len(self._ends) and self._ends[hi] <= end:
+            hi += 1
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
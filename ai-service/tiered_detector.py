@@ -0,0 +1,223 @@
+"""
+Tiered plagiarism detection (DETECTOR_MODE=tiered).
+Tier 1 scores the text locally, in milliseconds. It uses the offline
+Wikipedia index and the reference corpus when they are configured, plus a
+heuristic estimate of how much each sentence reads like published source
+material. Only sentences that tier 1 cannot settle, and whose signal passes
+the escalation threshold, go to tier 2, the Enhanced detector's web search.
+"""
+import os
+import re
+
+from enhanced_plagiarism_detector import EnhancedPlagiarismDetector
+
+_PERSONAL = re.compile(r"\b(i|i'm|i've|me|my|mine|we|our|us|you|your)\b", re.I)
+_OPINION = re.compile(r"\b(i think|i believe|i feel|in my opinion|personally)\b", re.I)
+_CITATION = re.compile(r"\[\d+\]|\([A-Z][A-Za-z-]+(?: et al\.)?,? \d{4}\)|\bet al\.")
+_NUMBER = re.compile(r"\b\d[\d,.]*\b")
+
+
+def source_signal(sentence):
+    """
+    Heuristic 0-1 estimate of how much a sentence reads like published source text
+
+    Encyclopedic sentences are long and impersonal, name entities, carry
+    numbers or dates, and cite sources. Personal and opinion writing is rarely
+    copied from the web. This only ranks sentences for escalation; it is not
+    evidence of plagiarism, and it only filters sentences out when an offline
+    index has also been checked.
+    """
+    words = sentence.split()
+    if len(words) < 8:
+        return 0.0
+
+    score = 0.1
+    if _NUMBER.search(sentence):
+        score += 0.2
+    capitalized = sum(1 for word in words[1:] if word[:1].isupper())
+    if capitalized / (len(words) - 1) >= 0.1:
+        score += 0.25
+    if _CITATION.search(sentence):
+        score += 0.3
+    if len(words) >= 15:
+        score += 0.15
+    if sum(len(word) for word in words) / len(words) >= 5.5:
+        score += 0.15
+    if _PERSONAL.search(sentence):
+        score *= 0.5
+    if _OPINION.search(sentence):
+        score *= 0.5
+    return min(score, 1.0)
+
+
+class TieredPlagiarismDetector(EnhancedPlagiarismDetector):
+    """Local first tier, escalating to web search only where its signal justifies it"""
+
+    def __init__(self, model_name='all-MiniLM-L6-v2', encoder_backend=None,
+                 escalate_threshold=None, local_coverage=None, max_escalated=None):
+        """
+        Args:
+            model_name: Name of the Sentence-Transformer model to use
+            encoder_backend: 'torch', 'onnx' or 'int8' (ENCODER_BACKEND, default 'torch')
+            escalate_threshold: Minimum source_signal of a sentence sent to
+                web search (TIER_ESCALATE_THRESHOLD, default 0.25)
+            local_coverage: Plagiarism percentage found locally at which tier 1
+                decides without web search (TIER_LOCAL_COVERAGE, default 50)
+            max_escalated: Most sentences used to build web queries
+                (TIER_MAX_ESCALATED, default 8)
+        """
+        super().__init__(model_name, encoder_backend)
+        self.escalate_threshold = (escalate_threshold if escalate_threshold is not None
+                                   else float(os.getenv('TIER_ESCALATE_THRESHOLD', '0.25')))
+        self.local_coverage = (local_coverage if local_coverage is not None
+                               else float(os.getenv('TIER_LOCAL_COVERAGE', '50')))
+        self.max_escalated = max_escalated or int(os.getenv('TIER_MAX_ESCALATED', '8'))
+
+    def detect_plagiarism(self, text, document=None):
+        """
+        Tiered plagiarism detection
+
+        The result has the usual shape plus 'decided_by_tier' (1 or 2) and a
+        'tiering' summary of the decision.
+        """
+        if document is None:
+            document = self.analyze(text)
+        sentences = document.sentences
+        with document.timed('ai_detection'):
+            ai_detection = self.detect_ai_generated(text, sentences)
+
+        with document.timed('tier1'):
+            local_sources, local_results, corpus_hits = self._local_evidence(document)
+            covered = self._covered_sentences(document, local_results, corpus_hits)
+            signals = [source_signal(sentence) for sentence in sentences]
+        local_score = max(
+            local_results['total_plagiarism'] if local_results else 0.0,
+            self._corpus_score(sentences, corpus_hits),
+        )
+        # Without an offline index tier 1 has no evidence, so only the heuristic
+        # ranks sentences and every check escalates
+        local_lookup = self.wikipedia_index is not None or self.reference_corpus is not None
+        candidates = [i for i, signal in enumerate(signals)
+                      if i not in covered and (signal >= self.escalate_threshold or not local_lookup)]
+
+        if local_lookup and local_score >= self.local_coverage:
+            reason = 'local_match'
+        elif not candidates:
+            reason = 'no_signal'
+        elif not self.web_searcher or not self.text_matcher:
+            reason = 'web_search_unavailable'
+        else:
+            reason = None
+
+        if reason is not None:
+            print(f"Tier 1 decided ({reason}): local score {local_score:.1f}%")
+            result = self._local_result(document, ai_detection, local_sources, local_results, corpus_hits)
+            escalated = []
+        else:
+            # Strongest signals first, queried in text order
+            escalated = sorted(sorted(candidates, key=lambda i: -signals[i])[:self.max_escalated])
+            print(f"Tier 2: escalating {len(escalated)} of {len(sentences)} sentences to web search")
+            result = self._escalate(document, ai_detection, escalated, local_sources, corpus_hits)
+            reason = 'web_search'
+
+        print(f"Timings: {document.timing_summary()}")
+        result['decided_by_tier'] = 1 if reason != 'web_search' else 2
+        result['tiering'] = {
+            'reason': reason,
+            'local_score': float(local_score),
+            'covered_sentences': len(covered),
+            'escalated_sentences': len(escalated),
+            'sentence_count': len(sentences),
+        }
+        return result
+
+    def iter_detect_plagiarism(self, text):
+        """Tiered checks are reported as a single summary event"""
+        yield {'event': 'summary', 'result': self.detect_plagiarism(text)}
+
+    def _local_evidence(self, document):
+        """
+        Look the text up in the offline sources
+
+        Returns:
+            (wikipedia_sources, TextMatcher results or None, reference corpus hits or None)
+        """
+        local_sources = []
+        local_results = None
+        if self.wikipedia_index is not None:
+            local_sources = self._local_wikipedia_sources(document.text, 3)
+        if local_sources and self.text_matcher:
+            local_results = self.text_matcher.find_matches(
+                document.text, local_sources, document.matcher_tables(self.text_matcher)
+            )
+
+        corpus_hits = None
+        if self.reference_corpus is not None and document.sentences:
+            corpus_hits = self._reference_corpus_hits(document.embeddings)
+        return local_sources, local_results, corpus_hits
+
+    def _corpus_threshold(self):
+        return float(os.getenv('REFERENCE_MATCH_THRESHOLD', '0.80'))
+
+    def _corpus_score(self, sentences, corpus_hits):
+        """Share of the text (by characters) matched in the reference corpus"""
+        if not corpus_hits:
+            return 0.0
+        threshold = self._corpus_threshold()
+        total = sum(len(sentence) for sentence in sentences)
+        matched = sum(len(sentence) for sentence, hits in zip(sentences, corpus_hits)
+                      if hits and hits[0][0] >= threshold)
+        return matched / total * 100 if total else 0.0
+
+    def _covered_sentences(self, document, local_results, corpus_hits):
+        """Indexes of sentences already explained by local evidence"""
+        covered = set()
+        if corpus_hits:
+            threshold = self._corpus_threshold()
+            covered.update(i for i, hits in enumerate(corpus_hits) if hits and hits[0][0] >= threshold)
+
+        if local_results and local_results['matches']:
+            intervals = [(match['position'], match.get('end', match['position'] + len(match['text'])))
+                         for match in local_results['matches'] if match.get('position', -1) >= 0]
+            for i, (start, end) in enumerate(document.sentence_spans):
+                if start < 0 or end <= start:
+                    continue
+                overlap = sum(max(0, min(end, match_end) - max(start, match_start))
+                              for match_start, match_end in intervals)
+                # Overlapping matches can double count; half the sentence is enough either way
+                if overlap >= (end - start) / 2:
+                    covered.add(i)
+        return covered
+
+    def _local_result(self, document, ai_detection, local_sources, local_results, corpus_hits):
+        """Result from tier 1 evidence alone"""
+        text, sentences = document.text, document.sentences
+        if local_results and local_results['matches']:
+            return self._results_from_matches(text, sentences, ai_detection, local_results, local_sources)
+        if corpus_hits:
+            score, matches = self._reference_corpus_check(sentences, neighbours=corpus_hits)
+            if matches:
+                return self._format_results(score, 0, score, 100 - score, matches,
+                                            ai_detection, text, sentences)
+        return self._format_results(0.0, 0, 0.0, 100.0, [], ai_detection, text, sentences)
+
+    def _escalate(self, document, ai_detection, escalated, local_sources, corpus_hits):
+        """Web search built from the escalated sentences; every source is matched against the whole text"""
+        selected = [document.sentences[i] for i in escalated]
+        query_document = self.analyze(' '.join(selected), selected)
+        # The offline Wikipedia lookup already ran in tier 1
+        plan = [strategy for strategy in self._strategy_plan(query_document) if not strategy.get('local')]
+        with document.timed('search'):
+            sources = self.search_scheduler.run(plan)
+
+        unique_sources = self._unique_sources(local_sources + sources)
+        print(f"\nTotal unique sources found: {len(unique_sources)}")
+        if not unique_sources:
+            return self._local_result(document, ai_detection, [], None, corpus_hits)
+
+        prepared = document.matcher_tables(self.text_matcher)
+        with document.timed('match'):
+            match_results = self.text_matcher.find_matches(document.text, unique_sources, prepared)
+        return self._results_from_matches(
+            document.text, document.sentences, ai_detection, match_results, unique_sources
+        )
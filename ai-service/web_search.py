@@ -2,49 +2,132 @@
 Web search module for finding similar content online
 """
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urlparse
+import os
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from page_cache import PageCache
+from rate_limiter import create_rate_limiter
+from query_cache import QueryCache
+from query_planner import QueryPlanner
+from source_document import SourceDocument
 
 class WebSearcher:
     """Search for similar content on the web"""
     
-    def __init__(self):
+    def __init__(self, page_cache=None, rate_limiter=None, query_cache=None, query_planner=None):
+        """
+        Initialize the web searcher
+        
+        Args:
+            page_cache: Optional PageCache; by default one is created unless
+                PAGE_CACHE=off
+            rate_limiter: Optional TokenBucket for outbound search queries;
+                by default one is created from the SEARCH_RATE* env vars
+            query_cache: Optional QueryCache; by default one is created unless
+                QUERY_CACHE=off
+            query_planner: Optional QueryPlanner choosing which sentences and
+                phrases are searched
+        """
+        if page_cache is None and os.getenv('PAGE_CACHE', 'on').lower() != 'off':
+            try:
+                page_cache = PageCache()
+            except Exception as e:
+                print(f"Warning: page cache unavailable: {str(e)}")
+        self.page_cache = page_cache
+        if query_cache is None and os.getenv('QUERY_CACHE', 'on').lower() != 'off':
+            try:
+                query_cache = QueryCache()
+            except Exception as e:
+                print(f"Warning: query cache unavailable: {str(e)}")
+        self.query_cache = query_cache
+        self.query_planner = query_planner or QueryPlanner()
+        # Every outbound Google query draws from this (cross-process) token bucket
+        self.rate_limiter = rate_limiter or create_rate_limiter()
+        # Short cap: the search scheduler decides what to skip before the deadline
+        self.rate_limit_max_wait = float(os.getenv('SEARCH_RATE_MAX_WAIT', '5'))
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        
+        # Concurrent page fetching over one keep-alive connection pool
+        self.fetch_workers = int(os.getenv('FETCH_WORKERS', '8'))
+        self.per_host_limit = int(os.getenv('FETCH_PER_HOST', '2'))
+        self.fetch_deadline = float(os.getenv('FETCH_DEADLINE', '20'))
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=self.fetch_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._fetch_pool = ThreadPoolExecutor(max_workers=self.fetch_workers,
+                                              thread_name_prefix='page-fetch')
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
+        # Per-thread memo of queries and pages shared by the documents of one batch
+        self._batch = threading.local()
     
-    def search_queries(self, text, max_results=5):
+    @contextmanager
+    def batch_scope(self, memo=None):
+        """
+        Share search results and fetched pages between all checks run inside
+        this block on the current thread, so duplicate queries and URLs across
+        the documents of a batch are only searched and fetched once
+        
+        Args:
+            memo: Memo returned by current_batch_memo() on another thread, to
+                join that thread's batch instead of starting a new one
+        """
+        if getattr(self._batch, 'memo', None) is not None:
+            # Nested scope: reuse the outer memo
+            yield
+            return
+        
+        owner = memo is None
+        self._batch.memo = {'queries': {}, 'pages': {}} if owner else memo
+        try:
+            yield
+        finally:
+            memo = self._batch.memo
+            self._batch.memo = None
+            if owner:
+                print(f"Batch search memo: {len(memo['queries'])} unique queries, "
+                      f"{len(memo['pages'])} unique pages")
+    
+    def current_batch_memo(self):
+        """Return the batch memo active on this thread, or None"""
+        return getattr(self._batch, 'memo', None)
+    
+    def _batch_memo(self, kind):
+        """Return the active batch memo dictionary of the given kind, if any"""
+        memo = getattr(self._batch, 'memo', None)
+        return memo[kind] if memo is not None else None
+    
+    def search_queries(self, text, max_results=5, document=None):
         """
         Extract search queries from text and search for similar content
         
         Args:
             text: Input text to check
             max_results: Maximum number of results to return
+            document: Optional AnalyzedDocument of text, whose query fragments are reused
             
         Returns:
             List of search results with URLs and snippets
         """
-        # Extract key phrases from text (sentences and important phrases)
-        sentences = re.split(r'[.!?]+', text)
-        queries = []
-        
-        # Use first few sentences and key phrases as search queries
-        for sentence in sentences[:5]:  # Use first 5 sentences
-            sentence = sentence.strip()
-            if len(sentence) > 20 and len(sentence) < 200:
-                queries.append(sentence)
-        
-        # Also extract key phrases (3-5 word combinations)
-        words = text.split()
-        for i in range(len(words) - 3):
-            phrase = ' '.join(words[i:i+4])
-            if len(phrase) > 15 and len(phrase) < 100:
-                queries.append(phrase)
-        
-        # Remove duplicates and limit
-        queries = list(set(queries))[:10]
+        # Queries are cut at terminal punctuation, independent of the detector's
+        # segmenter, so query strings (and their query cache keys) stay stable
+        if document is not None:
+            sentences = document.query_fragments
+        else:
+            sentences = re.split(r'[.!?]+', text)
+        
+        # Fewest sentences and 4-word phrases covering the document's rarest terms
+        queries = self.query_planner.plan(sentences, max_queries=10, phrase_words=(4, 4), phrase_chars=(16, 99))
         
         results = []
         print(f"Processing {len(queries)} search queries...")
@@ -57,7 +140,6 @@ class WebSearcher:
                     results.extend(search_results)
                 else:
                     print(f"    No results found")
-                time.sleep(1)  # Rate limiting - increased to avoid blocking
             except Exception as e:
                 print(f"    Search error: {str(e)}")
                 continue
@@ -87,100 +169,239 @@ class WebSearcher:
         Returns:
             List of search results
         """
+        memo = self._batch_memo('queries')
+        memo_key = (query, max_results)
+        if memo is not None and memo_key in memo:
+            print(f"      Reusing batch results for query")
+            return [dict(result) for result in memo[memo_key]]
+        
+        results = self._search_google_uncached(query, max_results)
+        if memo is not None:
+            memo[memo_key] = [dict(result) for result in results]
+        return results
+    
+    def _search_google_uncached(self, query, max_results=3):
+        """Look up the result URLs of a query and fetch the content of each result"""
+        urls = self.query_cache.get(query, max_results) if self.query_cache else None
+        if urls is not None:
+            print(f"      Using cached search results ({len(urls)} URLs)")
+        else:
+            urls = self._google_urls(query, max_results)
+            if urls is None:
+                return []
+            if self.query_cache:
+                self.query_cache.set(query, max_results, urls)
+        
+        return self._results_for_urls(urls, query)
+    
+    def is_query_cached(self, query, max_results=3):
+        """True if the query can be answered without an outbound search"""
+        return bool(self.query_cache) and self.query_cache.contains(query, max_results)
+    
+    def _google_urls(self, query, max_results):
+        """
+        Run a rate-limited Google search
+        
+        Returns:
+            List of result URLs, or None if the search could not be performed
+        """
+        if not self.rate_limiter.acquire(timeout=self.rate_limit_max_wait):
+            print(f"      Search rate limit wait exceeded {self.rate_limit_max_wait:.0f}s, skipping query")
+            return None
+        
         try:
             from googlesearch import search
-            results = []
             print(f"      Executing Google search...")
             search_iter = search(query, num_results=max_results, lang='en', sleep_interval=1)
-            
-            for url in search_iter:
-                try:
-                    print(f"      Fetching content from: {url[:60]}...")
-                    # Try to get page content
-                    content = self._fetch_page_content(url)
-                    if content and len(content) > 100:
-                        results.append({
-                            'url': url,
-                            'title': self._extract_title(url, content),
-                            'snippet': content[:500] if content else query,
-                            'content': content
-                        })
-                        print(f"        ✓ Content fetched ({len(content)} chars)")
-                    else:
-                        # If we can't fetch content, still include the URL
-                        # Use query as content for basic matching
-                        results.append({
-                            'url': url,
-                            'title': self._extract_title_from_url(url),
-                            'snippet': query,
-                            'content': query.lower()  # Use query as content for matching
-                        })
-                        print(f"        ⚠ Using URL only (content fetch failed)")
-                except Exception as e:
-                    # Always include URL even if content fetch fails
-                    print(f"        ⚠ Error fetching content: {str(e)}")
-                    results.append({
-                        'url': url,
-                        'title': self._extract_title_from_url(url),
-                        'snippet': query,
-                        'content': query.lower()  # Use query as content for basic matching
-                    })
-                if len(results) >= max_results:
-                    break
-            return results
+            return list(dict.fromkeys(search_iter))[:max_results]
         except ImportError:
             print(f"      ERROR: googlesearch library not installed!")
             print(f"      Install with: pip install googlesearch-python")
             # Fallback: return empty results to trigger fallback
-            return []
+            return None
         except Exception as e:
             print(f"      Google search error: {str(e)}")
             import traceback
             traceback.print_exc()
-            return []
+            return None
     
-    def _fetch_page_content(self, url, timeout=10):
-        """Fetch content from a URL"""
+    def _results_for_urls(self, urls, query):
+        """Fetch result URLs concurrently and build search results in completion order"""
+        results = []
+        pending = set(urls)
+        for url, content in self.fetch_pages(urls):
+            pending.discard(url)
+            if content and len(content) > 100:
+                title = self._extract_title(url, content)
+                results.append({
+                    'url': url,
+                    'title': title,
+                    'snippet': content[:500] if content else query,
+                    'content': content,
+                    'document': self._source_document(url, content, title)
+                })
+                print(f"        ✓ Content fetched from {url[:60]} ({len(content)} chars)")
+            else:
+                # If we can't fetch content, still include the URL
+                results.append(self._url_only_result(url, query))
+                print(f"        ⚠ Using URL only (content fetch failed): {url[:60]}")
+        
+        # Always include URLs whose fetch missed the deadline
+        for url in urls:
+            if url in pending:
+                results.append(self._url_only_result(url, query))
+                print(f"        ⚠ Using URL only (fetch deadline exceeded): {url[:60]}")
+        
+        return results
+    
+    def _source_document(self, url, content, title):
+        """SourceDocument for a page, shared through the page cache's memory tier"""
+        factory = lambda: SourceDocument(content, url, title)
+        if self.page_cache:
+            return self.page_cache.document(url, content, factory)
+        return factory()
+    
+    def _url_only_result(self, url, query):
+        """Search result for a URL whose content could not be fetched"""
+        return {
+            'url': url,
+            'title': self._extract_title_from_url(url),
+            'snippet': query,
+            'content': query.lower(),  # Use query as content for basic matching
+            'url_only': True
+        }
+    
+    def fetch_pages(self, urls, timeout=10, deadline=None):
+        """
+        Fetch several pages concurrently on the shared session
+        
+        Args:
+            urls: URLs to fetch
+            timeout: Per-request timeout in seconds
+            deadline: Seconds until all fetches must finish (FETCH_DEADLINE by default)
+            
+        Yields:
+            (url, content) tuples in completion order; URLs still in flight when
+            the deadline expires are not yielded
+        """
+        deadline = deadline if deadline is not None else self.fetch_deadline
+        end_time = time.time() + deadline
+        memo = self._batch_memo('pages')
+        
+        futures = {}
+        for url in dict.fromkeys(urls):
+            if memo is not None and url in memo:
+                yield url, memo[url]
+                continue
+            futures[self._fetch_pool.submit(self._fetch_with_host_limit, url, timeout, end_time)] = url
+        
+        if not futures:
+            return
+        
+        try:
+            for future in as_completed(futures, timeout=max(0, end_time - time.time())):
+                url = futures[future]
+                try:
+                    content = future.result()
+                except Exception as e:
+                    print(f"        Error fetching {url}: {str(e)}")
+                    content = None
+                if memo is not None:
+                    memo[url] = content
+                yield url, content
+        except FuturesTimeoutError:
+            print(f"        Fetch deadline of {deadline}s exceeded, skipping slow pages")
+            for future in futures:
+                future.cancel()
+    
+    def _fetch_with_host_limit(self, url, timeout, end_time):
+        """Fetch a page while holding a per-host concurrency slot"""
+        host = urlparse(url).netloc.lower()
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+        
+        remaining = end_time - time.time()
+        if remaining <= 0 or not slot.acquire(timeout=remaining):
+            return None
+        try:
+            return self._fetch_page_content_uncached(url, min(timeout, max(end_time - time.time(), 0.1)))
+        finally:
+            slot.release()
+    
+    def _fetch_page_content_uncached(self, url, timeout=10):
+        """Return the readable text of a URL, using the page cache when possible"""
+        entry = self.page_cache.get(url) if self.page_cache else None
+        if entry and self.page_cache.is_fresh(entry):
+            self.page_cache.record_hit()
+            return entry['content']
+        
+        headers = dict(self.headers)
+        if entry:
+            # Revalidate the stale copy with a conditional GET
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        elif self.page_cache:
+            self.page_cache.record_miss()
+        
         try:
-            response = requests.get(url, headers=self.headers, timeout=timeout, allow_redirects=True)
+            response = self.session.get(url, headers=headers, timeout=timeout, allow_redirects=True)
+            if response.status_code == 304 and entry:
+                self.page_cache.touch(url)
+                return entry['content']
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Special handling for Wikipedia pages
-                if 'wikipedia.org' in url.lower():
-                    # Wikipedia has main content in specific divs
-                    content_div = soup.find('div', {'id': 'mw-content-text'}) or soup.find('div', {'class': 'mw-parser-output'})
-                    if content_div:
-                        # Remove unwanted elements
-                        for element in content_div.find_all(['script', 'style', 'nav', 'footer', 'header', 'table', 'div', 'span'], 
-                                                          class_=lambda x: x and ('navbox' in x.lower() or 'infobox' in x.lower() or 'reference' in x.lower())):
-                            element.decompose()
-                        # Get text from Wikipedia content area
-                        text = content_div.get_text(separator=' ', strip=True)
-                        # Clean up whitespace
-                        lines = (line.strip() for line in text.splitlines())
-                        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                        text = ' '.join(chunk for chunk in chunks if chunk)
-                        if len(text) > 100:
-                            return text[:10000]  # Wikipedia articles can be long, allow more content
-                
-                # For other sites, use general extraction
-                # Remove script and style elements
-                for script in soup(["script", "style", "nav", "footer", "header"]):
-                    script.decompose()
-                # Get text content
-                text = soup.get_text()
-                # Clean up whitespace
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                text = ' '.join(chunk for chunk in chunks if chunk)
-                # Return meaningful content (at least 100 chars)
-                if len(text) > 100:
-                    return text[:5000]  # Limit to 5000 characters for non-Wikipedia
+                text = self._extract_text(url, response.content)
+                if text and self.page_cache:
+                    self.page_cache.put(url, text,
+                                        etag=response.headers.get('ETag'),
+                                        last_modified=response.headers.get('Last-Modified'))
+                return text
         except requests.exceptions.Timeout:
             print(f"        Timeout fetching {url}")
         except Exception as e:
             print(f"        Error fetching {url}: {str(e)}")
+        
+        # Serve the stale copy rather than nothing if revalidation failed
+        return entry['content'] if entry else None
+    
+    def _extract_text(self, url, html):
+        """Extract whitespace-normalized readable text from an HTML page"""
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Special handling for Wikipedia pages
+        if 'wikipedia.org' in url.lower():
+            # Wikipedia has main content in specific divs
+            content_div = soup.find('div', {'id': 'mw-content-text'}) or soup.find('div', {'class': 'mw-parser-output'})
+            if content_div:
+                # Remove unwanted elements
+                for element in content_div.find_all(['script', 'style', 'nav', 'footer', 'header', 'table', 'div', 'span'], 
+                                                  class_=lambda x: x and ('navbox' in x.lower() or 'infobox' in x.lower() or 'reference' in x.lower())):
+                    element.decompose()
+                # Get text from Wikipedia content area
+                text = content_div.get_text(separator=' ', strip=True)
+                # Clean up whitespace
+                text = ' '.join(text.split())
+                if len(text) > 100:
+                    return text[:10000]  # Wikipedia articles can be long, allow more content
+        
+        # For other sites, use general extraction
+        # Remove script and style elements
+        for script in soup(["script", "style", "nav", "footer", "header"]):
+            script.decompose()
+        # Get text content
+        text = soup.get_text()
+        # Clean up whitespace
+        lines = (line.strip() for line in text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        text = ' '.join(chunk for chunk in chunks if chunk)
+        text = ' '.join(text.split())
+        # Return meaningful content (at least 100 chars)
+        if len(text) > 100:
+            return text[:5000]  # Limit to 5000 characters for non-Wikipedia
         return None
     
     def _extract_title(self, url, content):
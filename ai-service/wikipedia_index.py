@@ -0,0 +1,367 @@
+"""
+Offline Wikipedia index for the Enhanced detector's Strategy 0.
+A MediaWiki XML dump (or a JSONL export with title/url/text per line) is
+streamed into a plain-text article store and an inverted index from winnowed
+shingle hashes (see fingerprint.py) to article ids. At check time the text's
+own fingerprints vote for candidate articles, so Wikipedia sources are found
+locally, without search queries or page fetches.
+
+Usage:
+    python wikipedia_index.py ingest <dump.xml[.bz2|.gz] | dump.jsonl> [--output wikipedia_index]
+                                     [--limit N] [--max-postings 1000]
+
+Serve it by setting WIKIPEDIA_INDEX_PATH to the output directory.
+"""
+import argparse
+import bz2
+import gzip
+import html
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+from xml.etree import ElementTree
+
+import numpy as np
+
+from fingerprint import Fingerprinter, normalize_with_offsets
+from source_document import SourceDocument
+
+META_FILE = 'meta.json'
+ARTICLES_FILE = 'articles.jsonl'
+ARTICLE_OFFSETS_FILE = 'article_offsets.npy'
+HASHES_FILE = 'hashes.npy'
+POSTING_OFFSETS_FILE = 'posting_offsets.npy'
+POSTINGS_FILE = 'postings.u32'
+
+# Hash buckets spilled to disk while ingesting, each sorted in memory afterwards
+BUCKET_BITS = 8
+SPILL_ENTRIES = 1 << 22
+
+DEFAULT_BASE_URL = 'https://en.wikipedia.org/wiki/'
+
+# SourceDocuments kept per open index for repeated checks against an article
+DOCUMENT_CACHE_SIZE = 256
+
+
+def _open_dump(path):
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def strip_wikitext(text):
+    """Reduce MediaWiki markup to plain article text"""
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.S)
+    text = re.sub(r'<ref[^>/]*/>', '', text)
+    text = re.sub(r'<ref[^>]*>.*?</ref>', '', text, flags=re.S)
+    # Templates and tables nest, so strip innermost first
+    for pattern in (r'\{\{[^{}]*\}\}', r'\{\|[^{}]*?\|\}'):
+        previous = None
+        while previous != text:
+            previous = text
+            text = re.sub(pattern, '', text, flags=re.S)
+    text = re.sub(r'\[\[(?:File|Image|Category):(?:[^\[\]]|\[\[[^\]]*\]\])*\]\]', '', text, flags=re.I)
+    text = re.sub(r'\[\[(?:[^\]|]*\|)?([^\]]*)\]\]', r'\1', text)
+    text = re.sub(r'\[https?://\S+ ([^\]]*)\]', r'\1', text)
+    text = re.sub(r'\[https?://\S+\]', '', text)
+    text = re.sub(r"'{2,}", '', text)
+    text = re.sub(r'^=+\s*(.*?)\s*=+\s*$', r'\1', text, flags=re.M)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = html.unescape(text)
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _iter_xml(path, base_url):
+    with _open_dump(path) as f:
+        context = ElementTree.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event != 'end' or elem.tag.rsplit('}', 1)[-1] != 'page':
+                continue
+            fields = {child.tag.rsplit('}', 1)[-1]: child for child in elem.iter()}
+            namespace = fields['ns'].text if 'ns' in fields else '0'
+            if namespace == '0' and 'redirect' not in fields and 'text' in fields:
+                title = fields['title'].text or ''
+                yield {
+                    'title': title,
+                    'url': base_url + quote(title.replace(' ', '_')),
+                    'text': strip_wikitext(fields['text'].text or ''),
+                }
+            # Drop parsed pages so memory stays flat on full dumps
+            root.clear()
+
+
+def _iter_jsonl(path, base_url):
+    with _open_dump(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"Warning: skipping invalid JSON in {path}:{line_number}")
+                continue
+            title = record.get('title', '')
+            yield {
+                'title': title,
+                'url': record.get('url') or base_url + quote(title.replace(' ', '_')),
+                'text': record.get('text', ''),
+            }
+
+
+def iter_articles(path, base_url=DEFAULT_BASE_URL):
+    """Yield {'title', 'url', 'text'} for every article of a dump"""
+    name = re.sub(r'\.(bz2|gz)$', '', path)
+    if name.endswith('.jsonl') or name.endswith('.json'):
+        return _iter_jsonl(path, base_url)
+    return _iter_xml(path, base_url)
+
+
+def _article_hashes(fingerprinter, text):
+    """Distinct winnowed fingerprint hashes of an article"""
+    normalized = normalize_with_offsets(text)[0]
+    return np.unique(np.array([h for h, _ in fingerprinter.winnow(fingerprinter.kgram_hashes(normalized))],
+                              dtype=np.uint64))
+
+
+def ingest(dump_path, output_dir, k=20, w=16, max_postings=1000, min_length=200,
+           limit=None, base_url=DEFAULT_BASE_URL):
+    """Build the article store and shingle index of a dump at output_dir"""
+    fingerprinter = Fingerprinter(k, w)
+    spill_dir = os.path.join(output_dir, 'spill')
+    os.makedirs(spill_dir, exist_ok=True)
+    buckets = 1 << BUCKET_BITS
+    spill_files = [open(os.path.join(spill_dir, f'{b:03d}.u64'), 'wb') for b in range(buckets)]
+    pending = []
+    pending_entries = 0
+
+    def spill():
+        packed = np.concatenate(pending)
+        bucket_of = packed >> np.uint64(64 - BUCKET_BITS)
+        order = np.argsort(bucket_of, kind='stable')
+        packed, bucket_of = packed[order], bucket_of[order]
+        bounds = np.searchsorted(bucket_of, np.arange(buckets + 1, dtype=np.uint64))
+        for b in range(buckets):
+            if bounds[b] < bounds[b + 1]:
+                packed[bounds[b]:bounds[b + 1]].tofile(spill_files[b])
+        pending.clear()
+
+    started = time.time()
+    offsets = [0]
+    with open(os.path.join(output_dir, ARTICLES_FILE), 'wb') as store:
+        for article in iter_articles(dump_path, base_url):
+            if len(article['text']) < min_length:
+                continue
+            article_id = len(offsets) - 1
+            line = (json.dumps(article, ensure_ascii=False) + '\n').encode('utf-8')
+            store.write(line)
+            offsets.append(offsets[-1] + len(line))
+
+            # (hash << 32 | article id) sorts postings by hash, then article
+            hashes = _article_hashes(fingerprinter, article['text'])
+            pending.append((hashes << np.uint64(32)) | np.uint64(article_id))
+            pending_entries += len(hashes)
+            if pending_entries >= SPILL_ENTRIES:
+                spill()
+                pending_entries = 0
+            if article_id % 10000 == 0:
+                print(f"  {article_id} articles ({time.time() - started:.0f}s)", end='\r')
+            if limit and article_id + 1 >= limit:
+                break
+    if pending:
+        spill()
+    for spill_file in spill_files:
+        spill_file.close()
+    article_count = len(offsets) - 1
+    print(f"\nStored {article_count} articles, building index...")
+
+    all_hashes = []
+    all_counts = []
+    dropped = 0
+    with open(os.path.join(output_dir, POSTINGS_FILE), 'wb') as postings:
+        for b in range(buckets):
+            packed = np.fromfile(os.path.join(spill_dir, f'{b:03d}.u64'), dtype=np.uint64)
+            if not len(packed):
+                continue
+            packed.sort()
+            hashes = (packed >> np.uint64(32)).astype(np.uint32)
+            unique, counts = np.unique(hashes, return_counts=True)
+            # Hashes shared by very many articles are boilerplate, not evidence
+            keep = counts <= max_postings
+            dropped += int((~keep).sum())
+            (packed[np.repeat(keep, counts)] & np.uint64(0xffffffff)).astype(np.uint32).tofile(postings)
+            all_hashes.append(unique[keep])
+            all_counts.append(counts[keep])
+    shutil.rmtree(spill_dir)
+
+    hashes = np.concatenate(all_hashes) if all_hashes else np.zeros(0, dtype=np.uint32)
+    counts = np.concatenate(all_counts) if all_counts else np.zeros(0, dtype=np.int64)
+    np.save(os.path.join(output_dir, HASHES_FILE), hashes)
+    np.save(os.path.join(output_dir, POSTING_OFFSETS_FILE),
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64))
+    np.save(os.path.join(output_dir, ARTICLE_OFFSETS_FILE), np.array(offsets, dtype=np.int64))
+
+    meta = {
+        'articles': article_count,
+        'hashes': int(len(hashes)),
+        'postings': int(counts.sum()),
+        'dropped_hashes': dropped,
+        'k': k,
+        'w': w,
+        'max_postings': max_postings,
+    }
+    with open(os.path.join(output_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(f"Wikipedia index written to {output_dir}: {meta['hashes']} hashes, "
+          f"{meta['postings']} postings ({time.time() - started:.0f}s)")
+    return meta
+
+
+class WikipediaIndex:
+    """Memory-mapped shingle index and article store built by `wikipedia_index.py ingest`"""
+
+    def __init__(self, path, min_hits=None, relative_cutoff=None):
+        """
+        Open an index
+
+        Args:
+            path: Index directory
+            min_hits: Shared fingerprints an article needs to be a candidate
+                (WIKIPEDIA_MIN_HITS, default 3)
+            relative_cutoff: Share of the best candidate's score another
+                candidate needs (WIKIPEDIA_RELATIVE_CUTOFF, default 0.3)
+        """
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.fingerprinter = Fingerprinter(self.meta['k'], self.meta['w'])
+        self.min_hits = min_hits or int(os.getenv('WIKIPEDIA_MIN_HITS', '3'))
+        self.relative_cutoff = (relative_cutoff if relative_cutoff is not None
+                                else float(os.getenv('WIKIPEDIA_RELATIVE_CUTOFF', '0.3')))
+
+        self._hashes = np.load(os.path.join(path, HASHES_FILE), mmap_mode='r')
+        self._posting_offsets = np.load(os.path.join(path, POSTING_OFFSETS_FILE), mmap_mode='r')
+        self._article_offsets = np.load(os.path.join(path, ARTICLE_OFFSETS_FILE), mmap_mode='r')
+        postings_path = os.path.join(path, POSTINGS_FILE)
+        self._postings = (np.memmap(postings_path, dtype=np.uint32, mode='r')
+                          if os.path.getsize(postings_path) else np.zeros(0, dtype=np.uint32))
+
+        self._articles_file = open(os.path.join(path, ARTICLES_FILE), 'rb')
+        self._read_lock = threading.Lock()
+        self._documents = OrderedDict()  # article id -> SourceDocument, least recently used first
+        self._documents_lock = threading.Lock()
+
+    def __len__(self):
+        return self.meta['articles']
+
+    def candidates(self, text, max_articles=3):
+        """
+        Articles sharing the most fingerprints with text
+
+        An article's score is the share of the text's fingerprints it contains.
+        Articles scoring under relative_cutoff times the best score are
+        dropped: a few shared boilerplate sentences ("This article needs
+        additional citations...") would otherwise each cost a full match pass.
+
+        Returns:
+            List of (article_id, shared_fingerprints, score), best first
+        """
+        hashes = _article_hashes(self.fingerprinter, text).astype(np.uint32)
+        if not len(hashes) or not len(self._hashes):
+            return []
+        rows = np.minimum(np.searchsorted(self._hashes, hashes), len(self._hashes) - 1)
+        rows = rows[self._hashes[rows] == hashes]
+        if not len(rows):
+            return []
+
+        ids = np.concatenate([self._postings[self._posting_offsets[row]:self._posting_offsets[row + 1]]
+                              for row in rows])
+        articles, hits = np.unique(ids, return_counts=True)
+        scores = hits / len(hashes)
+        cutoff = scores.max() * self.relative_cutoff
+        order = np.argsort(-scores, kind='stable')[:max_articles]
+        return [(int(articles[i]), int(hits[i]), float(scores[i])) for i in order
+                if hits[i] >= self.min_hits and scores[i] >= cutoff]
+
+    def article(self, article_id):
+        """Return {'title', 'url', 'text'} of an article"""
+        start = int(self._article_offsets[article_id])
+        end = int(self._article_offsets[article_id + 1])
+        with self._read_lock:
+            self._articles_file.seek(start)
+            return json.loads(self._articles_file.read(end - start))
+
+    def document(self, article_id):
+        """SourceDocument of an article, kept for repeated checks against it"""
+        with self._documents_lock:
+            document = self._documents.get(article_id)
+            if document is not None:
+                self._documents.move_to_end(article_id)
+                return document
+
+        article = self.article(article_id)
+        document = SourceDocument(article['text'], article['url'], article['title'])
+        with self._documents_lock:
+            # Another thread may have built it meanwhile; keep the first one
+            document = self._documents.setdefault(article_id, document)
+            self._documents.move_to_end(article_id)
+            while len(self._documents) > DOCUMENT_CACHE_SIZE:
+                self._documents.popitem(last=False)
+        return document
+
+    def sources(self, text, max_articles=3):
+        """Candidate articles of text as search-result style source dictionaries"""
+        sources = []
+        for article_id, _, _ in self.candidates(text, max_articles):
+            document = self.document(article_id)
+            sources.append({
+                'url': document.url,
+                'title': document.title,
+                'snippet': document.content[:500],
+                'content': document.content,
+                'document': document,
+            })
+        return sources
+
+    def stats(self):
+        return {
+            'articles': len(self),
+            'hashes': self.meta['hashes'],
+            'postings': self.meta['postings'],
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the offline Wikipedia index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help='Index a MediaWiki XML or JSONL dump')
+    ingest_parser.add_argument('dump', help='pages-articles XML or JSONL dump, optionally .bz2/.gz')
+    ingest_parser.add_argument('--output', default='wikipedia_index', help='Index directory (default: wikipedia_index)')
+    ingest_parser.add_argument('--limit', type=int, help='Stop after this many articles')
+    ingest_parser.add_argument('--max-postings', type=int, default=1000,
+                               help='Drop hashes found in more articles than this (default: 1000)')
+    ingest_parser.add_argument('--min-length', type=int, default=200,
+                               help='Skip articles shorter than this many characters (default: 200)')
+    ingest_parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='Article URL prefix for XML dumps')
+    args = parser.parse_args(argv)
+
+    try:
+        ingest(args.dump, args.output, max_postings=args.max_postings, min_length=args.min_length,
+               limit=args.limit, base_url=args.base_url)
+    except (OSError, ValueError, ElementTree.ParseError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
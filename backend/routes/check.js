@@ -21,8 +21,9 @@ router.post('/', async (req, res) => {
     // Call Python AI service
     let aiResponse;
     try {
+      // Send the text exactly as the client holds it: match spans are offsets into it
       aiResponse = await axios.post(`${AI_SERVICE_URL}/check`, {
-        text: text.trim(),
+        text,
       }, {
         timeout: 30000, // 30 seconds timeout
       });
@@ -7,6 +7,17 @@ const findTextPosition = (text, searchText) => {
   return textLower.indexOf(searchLower);
 };
 
+// Whether text[start:end] is the matched text (the AI service collapses whitespace in match.text)
+const spanMatchesText = (text, span, matchText) => {
+  if (!Array.isArray(span) || span.length !== 2) return false;
+  const [start, end] = span;
+  if (!Number.isInteger(start) || !Number.isInteger(end) || start < 0 || end > text.length || start >= end) {
+    return false;
+  }
+  const collapse = (value) => value.replace(/\s+/g, ' ').trim().toLowerCase();
+  return collapse(text.slice(start, end)) === collapse(matchText);
+};
+
 const HighlightedText = ({ text, matches, similarityScore }) => {
   // Calculate word and character counts
   const wordCount = text.trim().split(/\s+/).filter(word => word.length > 0).length;
@@ -27,6 +38,17 @@ const HighlightedText = ({ text, matches, similarityScore }) => {
       const matchText = match.text.trim();
       if (!matchText) return;
       
+      // Use the character offsets reported by the AI service when they point at the matched text
+      if (spanMatchesText(text, match.span, matchText)) {
+        plagiarizedRanges.push({
+          start: match.span[0],
+          end: match.span[1],
+          similarity: match.similarity,
+          match_type: match.match_type || 'partial'
+        });
+        return;
+      }
+      
       // Try multiple strategies to find the text
       let startIndex = findTextPosition(text, matchText);
       